@@ -0,0 +1,370 @@
+import os
+import sys
+import heapq
+from collections import deque
+import numpy as np
+from RoutingGraph import RoutingGraph
+
+INF = float('inf')
+MAX_QUERY_EXCLUSIONS = 64 # above this many excluded edges a query goes straight to the plain engine
+MAX_INCREMENTAL_CHANGES = 256 # above this many changed edges the whole hierarchy is customized again
+
+
+def HierarchyPath(map_path) -> str:
+    """Path of the contraction hierarchy stored next to a map file (map.json -> map.ch.npz)."""
+    return os.path.splitext(map_path)[0] + '.ch.npz'
+
+
+class ContractionHierarchy:
+    """Customizable contraction hierarchy over a RoutingGraph.
+
+    Preprocessing only decides the contraction order (minimum degree) and inserts every fill-in shortcut,
+    without witness searches. The hierarchy is therefore valid for any edge weights: the shortcut weights
+    are filled in by customize() for the current congestion multipliers, and when a single edge changes only
+    the shortcuts built on top of it are updated.
+
+    Roadblocks are not part of the weights. A query gets the excluded edges and its answer is only used if the
+    unpacked path avoids all of them, since excluding edges can only make the real shortest path longer.
+    Otherwise (or when too many edges are excluded) Query returns None and the caller uses the plain engine.
+    """
+    def __init__(self, graph: RoutingGraph, rank, up_offsets, up_targets, arc_edge, base_weight=None, base_mid=None):
+        self.graph = graph
+        self.GV = None
+        self.rank = list(rank)
+        n = graph.num_nodes
+
+        # Upward arcs: arc ids up_offsets[v]..up_offsets[v + 1] go from v to higher ranked nodes
+        self.up_offsets = list(up_offsets)
+        self.up_targets = list(up_targets)
+        self.arc_edge = list(arc_edge) # original edge id of the arc, or -1 for a pure shortcut
+        self.up_index = [dict() for _ in range(n)] # v -> {higher node: arc id}
+        self.down = [[] for _ in range(n)] # w -> [(lower node, arc id)]
+        for v in range(n):
+            for arc in range(self.up_offsets[v], self.up_offsets[v + 1]):
+                w = self.up_targets[arc]
+                self.up_index[v][w] = arc
+                self.down[w].append((v, arc))
+        self.arc_low = [0] * len(self.up_targets)
+        for v in range(n):
+            for arc in range(self.up_offsets[v], self.up_offsets[v + 1]):
+                self.arc_low[arc] = v
+        self.order = sorted(range(n), key=lambda v: self.rank[v])
+
+        self.pending = set() # original edge ids changed since the last customization
+        self.needs_full_customization = False
+        self.queries = 0
+        self.fallbacks = 0
+
+        if base_weight is not None:
+            self.weight = list(base_weight)
+            self.mid = list(base_mid)
+        else:
+            self.customize()
+        self.base_weight = list(self.weight)
+        self.base_mid = list(self.mid)
+
+    @classmethod
+    def Build(cls, graph: RoutingGraph) -> 'ContractionHierarchy':
+        """Computes a minimum degree contraction order and the resulting shortcuts over the base weights."""
+        n = graph.num_nodes
+        adjacency = [set() for _ in range(n)]
+        for u, v in zip(graph.edge_u.tolist(), graph.edge_v.tolist()):
+            if u != v:
+                adjacency[u].add(v)
+                adjacency[v].add(u)
+
+        rank = [-1] * n
+        upward = [None] * n
+        priority_queue = [(len(adjacency[v]), v) for v in range(n)]
+        heapq.heapify(priority_queue)
+        next_rank = 0
+        while priority_queue:
+            degree, v = heapq.heappop(priority_queue)
+            if rank[v] != -1 or degree != len(adjacency[v]):
+                continue
+            rank[v] = next_rank
+            next_rank += 1
+            neighbors = adjacency[v]
+            upward[v] = sorted(neighbors)
+            for u in neighbors:
+                adjacency[u].discard(v)
+            # Remaining neighbors become a clique (fill-in shortcuts)
+            for u in neighbors:
+                for w in neighbors:
+                    if u < w and w not in adjacency[u]:
+                        adjacency[u].add(w)
+                        adjacency[w].add(u)
+            for u in neighbors:
+                heapq.heappush(priority_queue, (len(adjacency[u]), u))
+
+        edge_lookup = {}
+        for edge_id, (u, v) in enumerate(zip(graph.edge_u.tolist(), graph.edge_v.tolist())):
+            edge_lookup[(u, v)] = edge_id
+            edge_lookup[(v, u)] = edge_id
+
+        up_offsets = [0]
+        up_targets, arc_edge = [], []
+        for v in range(n):
+            for w in upward[v]:
+                up_targets.append(w)
+                arc_edge.append(edge_lookup.get((v, w), -1))
+            up_offsets.append(len(up_targets))
+        return cls(graph, rank, up_offsets, up_targets, arc_edge)
+
+    def Save(self, path):
+        np.savez_compressed(path,
+                            fingerprint=np.array(self.graph.fingerprint()),
+                            rank=np.asarray(self.rank, dtype=np.int32),
+                            up_offsets=np.asarray(self.up_offsets, dtype=np.int64),
+                            up_targets=np.asarray(self.up_targets, dtype=np.int32),
+                            arc_edge=np.asarray(self.arc_edge, dtype=np.int32),
+                            base_weight=np.asarray(self.base_weight, dtype=np.float64),
+                            base_mid=np.asarray(self.base_mid, dtype=np.int32))
+
+    @classmethod
+    def Load(cls, path, graph: RoutingGraph) -> 'ContractionHierarchy | None':
+        """Loads a saved hierarchy. Returns None if it was built for a different graph."""
+        with np.load(path) as data:
+            if str(data['fingerprint']) != graph.fingerprint():
+                return None
+            return cls(graph, data['rank'].tolist(), data['up_offsets'].tolist(), data['up_targets'].tolist(),
+                       data['arc_edge'].tolist(), data['base_weight'].tolist(), data['base_mid'].tolist())
+
+    def Attach(self, GV):
+        """Customizes the hierarchy with the congestion multipliers of a GraphVisualizer from now on."""
+        self.GV = GV
+        self.needs_full_customization = True
+
+    def edge_cost(self, edge_id) -> float:
+        if self.GV is None:
+            return self.graph.edge_weights_list[edge_id]
+        return self.GV.GetRoutingCost(edge_id)
+
+    def customize(self):
+        """Computes every arc weight bottom up: an arc is the cheaper of its own edge and all lower triangles."""
+        arc_edge = self.arc_edge
+        weight = [self.edge_cost(e) if e != -1 else INF for e in arc_edge]
+        mid = [-1] * len(arc_edge)
+        up_offsets = self.up_offsets
+        up_targets = self.up_targets
+        up_index = self.up_index
+        rank = self.rank
+        for x in self.order:
+            start, stop = up_offsets[x], up_offsets[x + 1]
+            for i in range(start, stop):
+                first = weight[i]
+                if first == INF:
+                    continue
+                u = up_targets[i]
+                for j in range(i + 1, stop):
+                    c = first + weight[j]
+                    w = up_targets[j]
+                    top = up_index[u][w] if rank[u] < rank[w] else up_index[w][u]
+                    if c < weight[top]:
+                        weight[top] = c
+                        mid[top] = x
+        self.weight = weight
+        self.mid = mid
+        self.pending.clear()
+        self.needs_full_customization = False
+
+    def recompute_arc(self, arc) -> bool:
+        """Recomputes one arc from its edge and lower triangles. Returns whether its weight changed."""
+        low = self.arc_low[arc]
+        high = self.up_targets[arc]
+        edge_id = self.arc_edge[arc]
+        best = self.edge_cost(edge_id) if edge_id != -1 else INF
+        best_mid = -1
+        weight = self.weight
+        up_index = self.up_index
+        for x, arc_x_low in self.down[low]:
+            arc_x_high = up_index[x].get(high)
+            if arc_x_high is not None:
+                c = weight[arc_x_low] + weight[arc_x_high]
+                if c < best:
+                    best = c
+                    best_mid = x
+        self.mid[arc] = best_mid
+        if best != weight[arc]:
+            weight[arc] = best
+            return True
+        return False
+
+    def apply_changes(self):
+        """Brings the arc weights up to date with the edges changed since the last customization."""
+        if self.needs_full_customization or len(self.pending) > MAX_INCREMENTAL_CHANGES:
+            self.customize()
+            return
+        if not self.pending:
+            return
+        graph = self.graph
+        rank = self.rank
+        up_index = self.up_index
+        # Arcs are processed by the rank of their lower node, so every arc is final before arcs above it use it
+        queue = []
+        queued = set()
+        for edge_id in self.pending:
+            u, v = int(graph.edge_u[edge_id]), int(graph.edge_v[edge_id])
+            low, high = (u, v) if rank[u] < rank[v] else (v, u)
+            arc = up_index[low][high]
+            queued.add(arc)
+            heapq.heappush(queue, (rank[low], arc))
+        self.pending.clear()
+
+        while queue:
+            _, arc = heapq.heappop(queue)
+            queued.discard(arc)
+            if not self.recompute_arc(arc):
+                continue
+            low = self.arc_low[arc]
+            high = self.up_targets[arc]
+            # arc (low, high) is a lower side of every triangle {low, high, z} with z above low
+            for z in up_index[low]:
+                if z == high:
+                    continue
+                top_low, top_high = (high, z) if rank[high] < rank[z] else (z, high)
+                top = up_index[top_low][top_high]
+                if top not in queued:
+                    queued.add(top)
+                    heapq.heappush(queue, (rank[top_low], top))
+
+    def MarkEdgeChanged(self, edge_id):
+        self.pending.add(edge_id)
+
+    def Reset(self):
+        self.needs_full_customization = True
+
+    def upward_search(self, source: int) -> tuple[dict, dict]:
+        """Dijkstra over upward arcs only. Returns (dist, parent arc) for every reached node."""
+        up_offsets = self.up_offsets
+        up_targets = self.up_targets
+        weight = self.weight
+        dist = {source: 0}
+        parent = {source: -1}
+        settled = set()
+        priority_queue = [(0, source)]
+        while priority_queue:
+            d, v = heapq.heappop(priority_queue)
+            if v in settled:
+                continue
+            settled.add(v)
+            for arc in range(up_offsets[v], up_offsets[v + 1]):
+                nd = d + weight[arc]
+                w = up_targets[arc]
+                if nd < dist.get(w, INF):
+                    dist[w] = nd
+                    parent[w] = arc
+                    heapq.heappush(priority_queue, (nd, w))
+        return dist, parent
+
+    def unpack_arc(self, arc, reverse: bool) -> list:
+        """Returns the original nodes strictly after the start of an arc, in travel order.
+
+        reverse=False travels low -> high, reverse=True travels high -> low.
+        """
+        nodes = []
+        stack = [(arc, reverse)]
+        up_index = self.up_index
+        rank = self.rank
+        while stack:
+            current, backwards = stack.pop()
+            low = self.arc_low[current]
+            high = self.up_targets[current]
+            middle = self.mid[current]
+            if middle == -1:
+                nodes.append(low if backwards else high)
+                continue
+            # low -> middle -> high, where both parts are arcs out of middle (the lowest of the three)
+            arc_mid_low = up_index[middle][low]
+            arc_mid_high = up_index[middle][high]
+            if backwards:
+                # high -> middle, then middle -> low
+                stack.append((arc_mid_low, False))
+                stack.append((arc_mid_high, True))
+            else:
+                # low -> middle, then middle -> high
+                stack.append((arc_mid_high, False))
+                stack.append((arc_mid_low, True))
+        return nodes
+
+    def Query(self, start_node, end_node, excluded_edges: set = None) -> deque | None:
+        """Returns the shortest path like Djikstra, or None if the caller has to fall back to the plain engine."""
+        self.queries += 1
+        if excluded_edges and len(excluded_edges) > MAX_QUERY_EXCLUSIONS:
+            self.fallbacks += 1
+            return None
+        self.apply_changes()
+
+        graph = self.graph
+        source = graph.index_of[start_node]
+        target = graph.index_of[end_node]
+        if source == target:
+            return deque([start_node])
+
+        forward_dist, forward_parent = self.upward_search(source)
+        backward_dist, backward_parent = self.upward_search(target)
+        best, meeting = INF, -1
+        for v, d in forward_dist.items():
+            other = backward_dist.get(v)
+            if other is not None and d + other < best:
+                best, meeting = d + other, v
+        if meeting == -1:
+            return deque([end_node])
+
+        # source -> meeting: collect the upward arcs and unpack them in travel order
+        forward_arcs = []
+        v = meeting
+        while forward_parent[v] != -1:
+            forward_arcs.append(forward_parent[v])
+            v = self.arc_low[forward_parent[v]]
+        path = [source]
+        for arc in reversed(forward_arcs):
+            path.extend(self.unpack_arc(arc, False))
+        # meeting -> target: walk the backward parents down towards the target
+        v = meeting
+        while backward_parent[v] != -1:
+            arc = backward_parent[v]
+            path.extend(self.unpack_arc(arc, True))
+            v = self.arc_low[arc]
+
+        if excluded_edges:
+            lookup = graph.edge_lookup
+            nodes = graph.node_ids
+            for i in range(len(path) - 1):
+                if lookup[(nodes[path[i]], nodes[path[i + 1]])] in excluded_edges:
+                    self.fallbacks += 1
+                    return None
+        return deque(graph.node_ids[v] for v in path)
+
+
+def LoadContractionHierarchy(map_path, GV) -> ContractionHierarchy | None:
+    """Loads the hierarchy stored next to the map if there is one that matches the loaded graph."""
+    path = HierarchyPath(map_path)
+    if not os.path.exists(path):
+        return None
+    hierarchy = ContractionHierarchy.Load(path, GV.routing_graph)
+    if hierarchy is None:
+        print(f"Warning: '{path}' was built for a different map and is ignored. Rebuild it with ContractionHierarchy.py")
+        return None
+    hierarchy.Attach(GV)
+    return hierarchy
+
+
+def main(argv):
+    """Usage: python ContractionHierarchy.py <map.json> [...]. Builds and saves map.ch.npz next to each map."""
+    from GraphVisualizer import LoadGraph
+    if not argv:
+        print(main.__doc__)
+        return 1
+    for map_path in argv:
+        graph = RoutingGraph(LoadGraph(map_path))
+        hierarchy = ContractionHierarchy.Build(graph)
+        shortcuts = sum(1 for e in hierarchy.arc_edge if e == -1)
+        out_path = HierarchyPath(map_path)
+        hierarchy.Save(out_path)
+        print(f"{map_path}: {graph.num_nodes} nodes, {graph.num_edges} edges, {shortcuts} shortcuts -> {out_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
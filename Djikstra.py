@@ -1,71 +1,40 @@
-import heapq
 from collections import deque
 from GraphVisualizer import GraphVisualizer
+from settings_utils import ROUTING_ASTAR
+
+def BlockedEdges(GV: GraphVisualizer, player_known_roadblocks: set = None, player_avoid_roads: set = None, includeReportedRoadblocks: bool = False) -> set:
+    """Collects every edge id a search is not allowed to use."""
+    blocked_edges = set()
+    if player_known_roadblocks is not None:
+        blocked_edges |= player_known_roadblocks
+    if player_avoid_roads is not None:
+        blocked_edges |= player_avoid_roads
+    if includeReportedRoadblocks:
+        blocked_edges |= GV.reported_roadblocks
+    return blocked_edges
 
 def Djikstra(start_node: int, end_node: int, GV: GraphVisualizer, player_known_roadblocks: set = None, player_avoid_roads: set = None, includeReportedRoadblocks: bool = False) -> deque:
-    reported_roadblocks = GV.reported_roadblocks
-    distances = {node: float('inf') for node in GV.G.nodes()}
-    distances[start_node] = 0
-    previous_nodes = {node: None for node in GV.G.nodes()}
-    priority_queue = [(0, start_node)]  # (distance, node)
-
-    visited = set()
-
-    # Precompute conditions to avoid redundant checks
-    check_player_known_roadblocks = player_known_roadblocks is not None
-    check_player_avoid_roads = player_avoid_roads is not None
-
-    while priority_queue:
-        # Get the node with the smallest tentative distance
-        current_distance, current_node = heapq.heappop(priority_queue)
-
-        # If we reach the destination node, break out of the loop
-        if current_node == end_node:
-            break
-
-        if current_node in visited:
-            continue
-        
-        visited.add(current_node)
-
-        for neighbor in GV.G.neighbors(current_node):
-            if neighbor in visited:                
-                continue
-
-            if check_player_known_roadblocks:
-                if (current_node, neighbor) in player_known_roadblocks or (neighbor, current_node) in player_known_roadblocks:
-                    continue
-
-            if check_player_avoid_roads:
-                if (current_node, neighbor) in player_avoid_roads or (neighbor, current_node) in player_avoid_roads:
-                    continue
-
-            if includeReportedRoadblocks:
-                if (current_node, neighbor) in reported_roadblocks or (neighbor, current_node) in reported_roadblocks:
-                    continue
-
-            weight = GV.G[current_node][neighbor]['weight']
-            
-            # If there are players or a congestion weight on an edge, get the multipler
-            congestion_factor = GV.GetCongestion(current_node, neighbor)
-            weight_mult = GV.GetCongestionMultiplier(congestion_factor)
-
-            # Adjust the weight by multiplying it with the distance multiplier
-            adjusted_weight = weight * weight_mult
-
-            # Calculate the new tentative distance
-            new_distance = current_distance + adjusted_weight
-
-            if new_distance < distances[neighbor]:
-                distances[neighbor] = new_distance
-                previous_nodes[neighbor] = current_node
-                heapq.heappush(priority_queue, (new_distance, neighbor))
-
-    path = deque()
-    current_node = end_node
-    # reverses from end to start and stores inside path deque
-    while current_node is not None:
-        path.appendleft(current_node)  # Add to the left of the deque
-        current_node = previous_nodes[current_node] # follow the previous_nodes chain back to the beginning
-
-    return path
\ No newline at end of file
+    # Reuse the route if nothing relevant changed since the same query was last made
+    cache_key = (start_node, end_node,
+                 frozenset(player_known_roadblocks or ()),
+                 frozenset(player_avoid_roads or ()),
+                 includeReportedRoadblocks)
+    path = GV.route_cache.get(cache_key)
+    if path is not None:
+        return path
+
+    blocked_edges = BlockedEdges(GV, player_known_roadblocks, player_avoid_roads, includeReportedRoadblocks)
+    path = None
+    if GV.contraction_hierarchy is not None:
+        # None when the hierarchy's route crosses a blocked edge or too many edges are blocked
+        path = GV.contraction_hierarchy.Query(start_node, end_node, blocked_edges)
+    if path is None:
+        # If there are players or a congestion weight on an edge, its entry in edge_cost_view already includes the multiplier
+        if GV.routing_mode == ROUTING_ASTAR:
+            # Goal directed search, finds a path of the same length. Uses the landmark lower bounds too if tables were loaded
+            path = GV.router.shortest_path_astar(start_node, end_node, blocked_edges, GV.edge_cost_view, GV.GetMinCongestionMultiplier(), GV.landmarks)
+        else:
+            path = GV.router.shortest_path(start_node, end_node, blocked_edges, GV.edge_cost_view)
+
+    GV.route_cache.put(cache_key, path, [GV.GetEdgeId(path[i], path[i + 1]) for i in range(len(path) - 1)])
+    return path
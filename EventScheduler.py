@@ -0,0 +1,245 @@
+import math
+import heapq
+import asyncio
+import numpy as np
+from SimClock import SimClock, TICK_MS
+
+# Event kinds
+START = 0 # first navigation decision of a player
+SPOT = 1 # player is close enough to the end of its edge to spot a roadblock
+ARRIVE = 2 # player reached the end of its current movement (node, or back at the node after a roadblock)
+RESUME = 3 # report time penalty ended
+
+EPSILON = 1e-9 # absorbs rounding when converting times to ticks
+ROUNDING = 1e-12 # progress this close to a threshold is replayed frame by frame, see Leg.reach_tick
+PROGRESS_CHUNK = 64 # least number of frames Leg.extend sums at once
+
+
+class Leg:
+    """One straight movement of a player at constant speed.
+
+    Starting with tick begin, t grows by delta_t per tick from t_start, the same progress Player.update makes per frame.
+    """
+    __slots__ = ('begin', 't_start', 'delta_t', 'orig_pos', 'dest_pos', 'edge_id', 'sums')
+
+    def __init__(self, begin, t_start, delta_t, orig_pos, dest_pos, edge_id):
+        self.begin = begin
+        self.t_start = t_start
+        self.delta_t = delta_t
+        self.orig_pos = orig_pos
+        self.dest_pos = dest_pos
+        self.edge_id = edge_id # edge whose congestion sets the speed, None when returning from a roadblock
+        self.sums = None # sums[k]: t after k ticks of the leg, see extend
+
+    def extend(self, frames):
+        """Makes sums cover at least frames ticks, or all ticks until t reaches 1. Positions and return legs depend on
+        the exact value of t, so it is summed frame by frame like Player.update: np.cumsum adds sequentially and each
+        chunk continues from the last sum. Chunks at least double in size, the sums are only made as far as asked."""
+        sums = self.sums
+        if sums is None:
+            sums = np.array([self.t_start])
+        while len(sums) <= frames and sums[-1] < 1:
+            steps = np.full(max(frames + 1 - len(sums), len(sums), PROGRESS_CHUNK) + 1, self.delta_t)
+            steps[0] = sums[-1]
+            # once the sum reached 1 it stays there, like min(t + delta_t, 1) in Player.update
+            sums = np.concatenate([sums, np.minimum(np.cumsum(steps)[1:], 1)])
+        self.sums = sums
+        return sums
+
+    def progress(self, tick) -> float:
+        """t at the end of a tick."""
+        frames = tick - self.begin + 1
+        if frames <= 0:
+            return self.t_start
+        sums = self.extend(frames)
+        return float(sums[frames]) if frames < len(sums) else 1.0
+
+    def reach_tick(self, t) -> int:
+        """First tick at the end of which the progress is at least t. begin - 1 if it already was when the leg began."""
+        if self.t_start >= t:
+            return self.begin - 1
+        steps = math.ceil((t - self.t_start) / self.delta_t)
+        # Player.update adds delta_t once per frame. If the exact sum lands on the threshold (a return from a roadblock
+        # always has delta_t = 1 / frames), the rounding of that sum decides the frame, so it is replayed.
+        if (abs(self.t_start + steps * self.delta_t - t) < ROUNDING
+                or abs(self.t_start + (steps - 1) * self.delta_t - t) < ROUNDING):
+            steps = self.replay(t)
+        return self.begin + steps - 1
+
+    def replay(self, t) -> int:
+        """Number of frames Player.update needs to reach t."""
+        sums = self.extend(0)
+        while sums[-1] < t:
+            sums = self.extend(2 * len(sums))
+        return int(np.searchsorted(sums, t)) # first frame whose sum is at least t
+
+
+class EventScheduler:
+    """Discrete event engine for headless runs (headless.py --engine event).
+
+    Player.update moves every player a little on every frame. Between two decisions a player just moves along a
+    straight line at a speed set by the congestion of its edge, so the frame at which it reaches the spotting point
+    or the end of the edge can be computed up front. The scheduler keeps a priority queue of these events and only
+    runs player logic when one is due, so the cost per simulated second grows with the number of events instead of
+    the number of players.
+
+    Time is counted in frames (ticks of tick_ms) so a run matches the frame based headless loop. Within a tick, events
+    run in player order like the players inside one frame. Players whose edge changes congestion (another player
+    entered or left it) get their events recomputed from their current progress.
+    Reports with a time lag are SimClock sleeps, the clock is advanced to their due time like to any other event.
+    Positions are only updated at events.
+    """
+    def __init__(self, game_manager, clock: SimClock, tick_ms: float = TICK_MS):
+        self.GM = game_manager
+        self.GV = game_manager.GV
+        self.clock = clock
+        self.tick_ms = tick_ms
+        self.tick = 0
+        self.queue = [] # (tick, player id, sequence, kind, player)
+        self.sequence = 0
+        self.current_id = -1 # id of the player whose event is running
+        self.pending = {} # player id -> sequence of its only valid event, older entries in queue are skipped
+        self.legs = {} # player id -> Leg while the player is moving
+        self.on_edge = {} # edge id -> ids of moving players whose speed depends on that edge
+        self.players = {player.id: player for player in game_manager.players}
+        self.events_processed = 0
+        self.handlers = {
+            START: self.OnStart,
+            SPOT: self.OnSpot,
+            ARRIVE: self.OnArrive,
+            RESUME: self.OnResume,
+        }
+        self.GV.edge_occupancy_listeners.append(self.OnEdgeOccupancyChanged)
+
+    def schedule(self, player, tick: int, kind: int):
+        self.sequence += 1
+        heapq.heappush(self.queue, (tick, player.id, self.sequence, kind, player))
+        self.pending[player.id] = self.sequence
+
+    def schedule_leg_event(self, player, leg: Leg):
+        if not player.CheckedRoadblockOnCurrentRoute:
+            self.schedule(player, leg.reach_tick(player.roadblock_spotting_position), SPOT)
+        else:
+            # Player.update handles the arrival one frame after t reached 1
+            self.schedule(player, leg.reach_tick(1) + 1, ARRIVE)
+
+    def attach(self, player, leg: Leg):
+        self.legs[player.id] = leg
+        if leg.edge_id is not None:
+            self.on_edge.setdefault(leg.edge_id, set()).add(player.id)
+
+    def detach(self, player) -> Leg | None:
+        leg = self.legs.pop(player.id, None)
+        if leg is not None and leg.edge_id is not None:
+            self.on_edge[leg.edge_id].discard(player.id)
+        return leg
+
+    def start_leg(self, player, begin: int):
+        orig_pos, dest_pos = player.GetLegPositions()
+        player.set_direction(player.GetLegRotation())
+        leg = Leg(begin, player.t, player.GetProgressPerTick(orig_pos, dest_pos), orig_pos, dest_pos,
+                  self.GV.GetEdgeId(player.curr_node_id, player.dest_node))
+        self.attach(player, leg)
+        self.schedule_leg_event(player, leg)
+
+    def tick_of(self, ms: float) -> int:
+        """First tick whose clock time is at least ms."""
+        tick = math.ceil(ms / self.tick_ms - EPSILON)
+        while tick * self.tick_ms < ms:
+            tick += 1
+        return tick
+
+    def finish(self, player):
+        self.pending.pop(player.id, None)
+        self.GM.RecordPlayerResult(player)
+        self.GM.CheckGameOver()
+
+    def OnStart(self, player):
+        if player.StartInitialRoute():
+            self.finish(player)
+            return
+        self.start_leg(player, self.tick)
+
+    def OnSpot(self, player):
+        leg = self.detach(player)
+        player.MoveTo(leg.progress(self.tick), leg.orig_pos, leg.dest_pos)
+        was_returning = player.RoadblockOnPrevRoute
+        player.CheckForRoadblock()
+        turned_around = player.RoadblockOnPrevRoute and not was_returning
+
+        if player.moveTimeout > self.clock.get_ticks():
+            # Frozen until the penalty ends, Player.update skips every frame before that. get_ticks() is whole milliseconds
+            self.schedule(player, max(self.tick_of(math.ceil(player.moveTimeout)), self.tick + 1), RESUME)
+        elif turned_around:
+            self.start_leg(player, self.tick + 1)
+        else:
+            self.attach(player, leg)
+            self.schedule_leg_event(player, leg)
+
+    def OnResume(self, player):
+        player.isPlayerTimedOut() # clears the penalty and logs that it ended
+        self.start_leg(player, self.tick)
+
+    def OnArrive(self, player):
+        leg = self.detach(player)
+        player.MoveTo(1, leg.orig_pos, leg.dest_pos)
+        if player.ArriveAtNode():
+            self.finish(player)
+            return
+        self.start_leg(player, self.tick)
+
+    def OnEdgeOccupancyChanged(self, edge_id):
+        """Recomputes the events of players moving on an edge whose congestion (and so their speed) may have changed."""
+        player_ids = self.on_edge.get(edge_id)
+        if not player_ids:
+            return
+        for player_id in list(player_ids):
+            leg = self.legs[player_id]
+            player = self.players[player_id]
+            delta_t = player.GetProgressPerTick(leg.orig_pos, leg.dest_pos)
+            if delta_t == leg.delta_t:
+                continue
+            # Players before the current one already moved this tick at the old speed, the ones after it move at the new speed
+            begin = self.tick + 1 if player_id < self.current_id else self.tick
+            if leg.begin >= begin:
+                new_leg = Leg(leg.begin, leg.t_start, delta_t, leg.orig_pos, leg.dest_pos, leg.edge_id)
+            else:
+                new_leg = Leg(begin, leg.progress(begin - 1), delta_t, leg.orig_pos, leg.dest_pos, leg.edge_id)
+            self.legs[player_id] = new_leg
+            self.schedule_leg_event(player, new_leg)
+
+    def next_tick(self) -> int | None:
+        """Tick of the next player event or due report, whichever comes first."""
+        tick = self.queue[0][0] if self.queue else None
+        due = self.clock.next_timer()
+        if due is not None:
+            timer_tick = max(self.tick_of(due), self.tick)
+            tick = timer_tick if tick is None else min(tick, timer_tick)
+        return tick
+
+    async def Run(self, max_ticks: int):
+        """Runs until every player finished or failed, or until max_ticks."""
+        for player in self.GM.players:
+            self.schedule(player, 0, START)
+
+        queue = self.queue
+        pending = self.pending
+        while self.GM.running:
+            tick = self.next_tick()
+            if tick is None or tick > max_ticks:
+                break
+            self.tick = tick
+            self.clock.advance_to(tick * self.tick_ms)
+            # let reports whose time lag just ended finish before the players act, like between two frames
+            await asyncio.sleep(0)
+
+            while queue and queue[0][0] == tick and self.GM.running:
+                _, _, sequence, kind, player = heapq.heappop(queue)
+                if pending.get(player.id) != sequence:
+                    continue # rescheduled or finished
+                del pending[player.id]
+                self.current_id = player.id
+                self.handlers[kind](player)
+                self.events_processed += 1
+            # reports created by this tick's events start their time lag now, not at the next event
+            await asyncio.sleep(0)
@@ -3,6 +3,82 @@ import csv
 import numpy as np
 from congestion import Congestion
 from GraphVisualizer import GraphVisualizer
+from NavHistory import NavHistory
+from settings_utils import ROUTING_DJIKSTRA
+
+DECISION_CHUNK = 1024 # decisions generated at a time by a DecisionStream, seeding a chunk costs more than drawing it
+# First entry of the spawn keys of the decision streams
+PLAYER_STREAMS = 0 # (PLAYER_STREAMS, player id, stream, chunk)
+GLOBAL_STREAMS = 1 # (GLOBAL_STREAMS, stream, chunk)
+EXPORT_CHUNK_ROWS = 65536 # Decision.csv rows formatted at a time
+BOOL_TEXT = ('False', 'True')
+
+
+def combination_rows(columns: int, prefix='', suffix='') -> list:
+    """CSV text of every combination of `columns` bools, indexed by combination_codes of those bools."""
+    return [prefix + ','.join(BOOL_TEXT[(code >> (columns - 1 - k)) & 1] for k in range(columns)) + suffix
+            for code in range(2 ** columns)]
+
+
+def combination_codes(*columns) -> np.ndarray:
+    """The bool columns read as binary numbers, first column highest bit."""
+    codes = np.zeros(len(columns[0]), dtype=np.intp)
+    for column in columns:
+        codes = codes * 2 + column
+    return codes
+
+
+def decision_csv_rows(columns, times, start, end) -> str:
+    """Decision.csv rows start to end: five bool columns, the random time and one more bool column."""
+    heads = combination_rows(5, suffix=',')
+    tails = combination_rows(1, prefix=',', suffix='\r\n')
+    head_codes = combination_codes(*(column[start:end] for column in columns[:5]))
+    tail_codes = columns[5][start:end].astype(np.intp)
+    return ''.join(map(''.join, zip(map(heads.__getitem__, head_codes.tolist()),
+                                    map(repr, times[start:end].tolist()),
+                                    map(tails.__getitem__, tail_codes.tolist()))))
+
+
+class DecisionStream:
+    """Endless sequence of random decisions (True with the given probability), generated in chunks when needed.
+
+    Chunk k is drawn from SeedSequence(entropy, spawn_key=key + (k,)), the child SeedSequence.spawn gives in that
+    position of the tree. So every chunk can be generated on its own: the sequence is the same for a given seed no
+    matter in which order or how far streams are read, and it does not end.
+    """
+    def __init__(self, entropy, key: tuple, probability: float):
+        self.entropy = entropy
+        self.key = key
+        self.probability = probability
+        self.idx = 0 # position of the next decision
+        self.chunk_idx = -1
+        self.chunk = None
+
+    def get_chunk(self, chunk_idx) -> np.ndarray:
+        seed = np.random.SeedSequence(self.entropy, spawn_key=self.key + (chunk_idx,))
+        return np.random.default_rng(seed).random(DECISION_CHUNK) < self.probability
+
+    def Peek(self) -> bool:
+        """Next decision, without using it up."""
+        chunk_idx, i = divmod(self.idx, DECISION_CHUNK)
+        if chunk_idx != self.chunk_idx:
+            self.chunk = self.get_chunk(chunk_idx)
+            self.chunk_idx = chunk_idx
+        return bool(self.chunk[i])
+
+    def Next(self) -> bool:
+        result = self.Peek()
+        self.idx += 1
+        return result
+
+    def Values(self, count) -> np.ndarray:
+        """The first count decisions, for the logs. The position of the stream is not changed."""
+        chunks = -(-count // DECISION_CHUNK)
+        return np.concatenate([self.get_chunk(k) for k in range(chunks)] or [np.zeros(0, dtype=bool)])[:count]
+
+    def Reset(self):
+        self.idx = 0
+
 
 class GameGenerator:
     def __init__(self, settings, start_end_json):
@@ -10,7 +86,12 @@ class GameGenerator:
         self.settings = settings
         self.n = settings['n']
         self.seed = settings['Seed']
+        # PlayerDecisions.csv only lists the decisions the players used instead of all n
+        self.LogUsedDecisionsOnly = settings.get('LogUsedDecisionsOnly', False)
+        # Search used by Djikstra when a route is not cached, see settings_utils.ROUTING_MODES
+        self.RoutingMode = settings.get('RoutingMode', ROUTING_DJIKSTRA)
         self.rng = np.random.default_rng(self.seed)
+        self.entropy = np.random.SeedSequence(self.seed).entropy # root of the decision streams
         self.num_players = len(start_end_json["start_end_indices"])
 
         # Player Probability Setup
@@ -24,20 +105,18 @@ class GameGenerator:
         self.players_report_if_no_roadblock_probabilities = self.generate_probabilities_array(
             "ProbPlayerReportIfNoRoadblock", self.num_players
         )
+        self.NavHistory = NavHistory() # route updates of all players
+        self.nav_trace = None # TraceWriter that also gets every NavHistory entry, see StartNavTrace
         self.Players = []
         for i in range(self.num_players):
             player_data = {
-                "follows_navigation": self.generate_array_by_probability(self.players_follow_navigation_probabilities[i]), 
-                "follows_navigation_idx": 0,
-                "reports_roadblock_if_roadblock": self.generate_array_by_probability(self.players_report_if_roadblock_probabilities[i]),
-                "reports_roadblock_if_roadblock_idx": 0,
-                "reports_roadblock_no_roadblock": self.generate_array_by_probability(self.players_report_if_no_roadblock_probabilities[i]),
-                "reports_roadblock_no_roadblock_idx": 0,
+                "follows_navigation": self.generate_player_stream(i, 0, self.players_follow_navigation_probabilities[i]),
+                "reports_roadblock_if_roadblock": self.generate_player_stream(i, 1, self.players_report_if_roadblock_probabilities[i]),
+                "reports_roadblock_no_roadblock": self.generate_player_stream(i, 2, self.players_report_if_no_roadblock_probabilities[i]),
                 "follow_navigation_prob": self.players_follow_navigation_probabilities[i],
                 "report_roadblock_prob": self.players_report_if_roadblock_probabilities[i],
                 "false_report_no_roadblock_prob": self.players_report_if_no_roadblock_probabilities[i],
                 "timelag_idx" : 0,
-                "NavHistory": [],
             }
             self.Players.append(player_data)
         self.ResetAllPlayerIndices()
@@ -47,14 +126,14 @@ class GameGenerator:
         if settings['TimeLagActivated']:
             self.ArrTimeLagValues = self.generate_players_timelag_values(self.num_players)
         else:
-            self.ArrTimeLagValues = [0] * self.n
+            self.ArrTimeLagValues = [0] * self.num_players
 
         # Report Time Setup
         self.ReportTimePenaltyActivated = settings['ReportTimePenaltyActivated']
         if settings['ReportTimePenaltyActivated']:
             self.ReportTimePenalties = self.generate_players_reporttime_penalties(self.num_players)
         else:
-            self.ReportTimePenalties = [0] * self.n
+            self.ReportTimePenalties = [0] * self.num_players
 
         self.IsAIControlled = settings['IsAIControlled']
 
@@ -62,17 +141,17 @@ class GameGenerator:
         self.PartipicationAmount = settings['ParticipationAmount']
         self.random_time_sequences = self.generate_poisson_times(self.PartipicationAmount)
 
-        self.ArrIsNextNode = self.generate_bool_array('ProbOfNextNode')
-        self.ArrIsCorrectNextRoadblock = self.generate_bool_array(
-            'ProbCorrectReportIfRoadblock')
-        self.ArrIsCorrectAdjRoadblock = self.generate_bool_array(
-            'ProbCorrectReportIfRoadblock')
-        self.ArrIsWrongNextNoRoadblock = self.generate_bool_array(
-            'ProbWrongReportIfNoRoadblock')
-        self.ArrIsWrongAdjNoRoadblock = self.generate_bool_array(
-            'ProbWrongReportIfNoRoadblock')
-        self.ArrIsCorrectRandomReport = self.generate_bool_array(
-            'ProbCorrectRandomReport')
+        self.ArrIsNextNode = self.generate_bool_stream(0, 'ProbOfNextNode')
+        self.ArrIsCorrectNextRoadblock = self.generate_bool_stream(
+            1, 'ProbCorrectReportIfRoadblock')
+        self.ArrIsCorrectAdjRoadblock = self.generate_bool_stream(
+            2, 'ProbCorrectReportIfRoadblock')
+        self.ArrIsWrongNextNoRoadblock = self.generate_bool_stream(
+            3, 'ProbWrongReportIfNoRoadblock')
+        self.ArrIsWrongAdjNoRoadblock = self.generate_bool_stream(
+            4, 'ProbWrongReportIfNoRoadblock')
+        self.ArrIsCorrectRandomReport = self.generate_bool_stream(
+            5, 'ProbCorrectRandomReport')
         self.start_end_json = start_end_json
 
     def generate_players_timelag_values(self, num_players):
@@ -80,14 +159,12 @@ class GameGenerator:
         std_dev = self.settings['TimeLag']['std_dev']
         return np.round(self.rng.normal(loc=mean, scale=std_dev, size=num_players).tolist(), 2)
 
-    def generate_array_by_probability(self, probability) -> list:
-        bool_array = self.rng.random(self.n) < probability
-        return bool_array
+    def generate_player_stream(self, id, stream, probability) -> DecisionStream:
+        return DecisionStream(self.entropy, (PLAYER_STREAMS, id, stream), probability)
 
-    def generate_bool_array(self, setting_name) -> list:
-        """ Generates a deterministic array of size n bool values based on a given probabibility within self.settings."""
-        bool_array = self.rng.random(self.n) < self.settings[setting_name]
-        return bool_array.tolist()  # Convert to list
+    def generate_bool_stream(self, stream, setting_name) -> DecisionStream:
+        """ Generates a deterministic stream of bool values based on a given probabibility within self.settings."""
+        return DecisionStream(self.entropy, (GLOBAL_STREAMS, stream), self.settings[setting_name])
     
     def generate_poisson_times(self, partipicationAmt) -> list:
         lmbda = partipicationAmt
@@ -118,13 +195,15 @@ class GameGenerator:
         return probabilities.tolist()
     
     def add_to_nav_history(self, id, time, reason, current_waypoint, route):
-        entry = {
-            "time": time,
-            "reason": reason,
-            "current_waypoint": current_waypoint,
-            "updateRoute": list(route)
-        }
-        self.Players[id]["NavHistory"].append(entry)
+        self.NavHistory.Add(id, time, reason, current_waypoint, route)
+        if self.nav_trace is not None:
+            self.nav_trace.LogRoute(id, reason, current_waypoint, route)
+
+    def StartNavTrace(self, trace):
+        """Writes the NavHistory entries to a TraceWriter as well. The ones made before (initial routes) are at time 0."""
+        self.nav_trace = trace
+        for id, _, reason, current_waypoint, route in self.NavHistory.Entries():
+            trace.LogRoute(id, reason, current_waypoint, route, 0)
 
 
     def SaveSetupCsv(self, time: str):
@@ -206,15 +285,17 @@ class GameGenerator:
                         ])
 
 
-            for i in range(self.n):
-                w.writerow([self.ArrIsNextNode[i],
-                            self.ArrIsCorrectNextRoadblock[i],
-                            self.ArrIsCorrectAdjRoadblock[i],
-                            self.ArrIsWrongNextNoRoadblock[i],
-                            self.ArrIsWrongAdjNoRoadblock[i],
-                            self.random_time_sequences[i],
-                            self.ArrIsCorrectRandomReport[i],
-                            ])
+            # Formatted in chunks from lookup tables of the bool combinations, writing n rows one by one is too slow
+            columns = [self.ArrIsNextNode.Values(self.n),
+                       self.ArrIsCorrectNextRoadblock.Values(self.n),
+                       self.ArrIsCorrectAdjRoadblock.Values(self.n),
+                       self.ArrIsWrongNextNoRoadblock.Values(self.n),
+                       self.ArrIsWrongAdjNoRoadblock.Values(self.n),
+                       self.ArrIsCorrectRandomReport.Values(self.n),
+                       ]
+            times = np.asarray(self.random_time_sequences, dtype=float)
+            for chunk_start in range(0, self.n, EXPORT_CHUNK_ROWS):
+                file.write(decision_csv_rows(columns, times, chunk_start, min(chunk_start + EXPORT_CHUNK_ROWS, self.n)))
 
     def SavePlayerDecisionCsv(self, time):
         directory = os.path.join('logs', time)
@@ -248,14 +329,12 @@ class GameGenerator:
                         'ProbReportIfNoRoadblock',
                         ])
             for i, player in enumerate(self.Players):
-                for j in range(self.n):
-                    w.writerow([i,
-                                ' ', # spacing
-                                player['follows_navigation'][j],
-                                player['reports_roadblock_if_roadblock'][j],
-                                player['reports_roadblock_no_roadblock'][j]
-                                ])
-    
+                streams = (player['follows_navigation'], player['reports_roadblock_if_roadblock'], player['reports_roadblock_no_roadblock'])
+                count = max(stream.idx for stream in streams) if self.LogUsedDecisionsOnly else self.n
+                # One string per player from a lookup table of the 8 rows it can have
+                rows = combination_rows(3, prefix=f'{i}, ,', suffix='\r\n')
+                codes = combination_codes(*(stream.Values(count) for stream in streams))
+                file.write(''.join(map(rows.__getitem__, codes.tolist())))
 
     def SaveNavHistory(self, time):
         directory = os.path.join('logs', time)
@@ -269,14 +348,13 @@ class GameGenerator:
                         'CurrentWaypoint',
                         'UpdatedRoute',
                         ])
-            for i, player in enumerate(self.Players):
-                for entry in player['NavHistory']:
-                    w.writerow([i,
-                                entry['time'],
-                                entry['reason'],
-                                entry['current_waypoint'],
-                                entry['updateRoute']
-                                ])    
+            for i, time, reason, current_waypoint, route in self.NavHistory.Entries():
+                w.writerow([i,
+                            time,
+                            reason,
+                            current_waypoint,
+                            route
+                            ])
     
     def SaveCongestion(self, time, congestion: list[Congestion], GV: GraphVisualizer):
         'Given a list, save the Congestion to a CSV file'
@@ -303,22 +381,13 @@ class GameGenerator:
 
 
     def GetNextFollowNavigation(self, id) -> bool:
-        idx = self.Players[id]["follows_navigation_idx"]
-        result = self.Players[id]["follows_navigation"][idx]
-        self.Players[id]["follows_navigation_idx"] += 1
-        return result
+        return self.Players[id]["follows_navigation"].Next()
 
     def GetNextReportsRoadblockIfRoadblock(self, id) -> bool:
-        idx = self.Players[id]["reports_roadblock_if_roadblock_idx"]
-        result = self.Players[id]["reports_roadblock_if_roadblock"][idx]
-        self.Players[id]["reports_roadblock_if_roadblock_idx"] += 1
-        return result
+        return self.Players[id]["reports_roadblock_if_roadblock"].Next()
 
     def GetNextReportsRoadblockIfNoRoadblock(self, id) -> bool:
-        idx = self.Players[id]["reports_roadblock_no_roadblock_idx"]
-        result = self.Players[id]["reports_roadblock_no_roadblock"][idx]
-        self.Players[id]["reports_roadblock_no_roadblock_idx"] += 1
-        return result
+        return self.Players[id]["reports_roadblock_no_roadblock"].Next()
     
     def GetNextTimeLag(self, id) -> bool:
         return self.ArrTimeLagValues[id]
@@ -326,7 +395,7 @@ class GameGenerator:
 
     def ResetAllPlayerIndices(self):
         for player in self.Players:
-            player["reports_roadblock_no_roadblock_idx"] = 0
-            player["reports_roadblock_if_roadblock_idx"] = 0
-            player["follows_navigation_idx"] = 0
+            player["reports_roadblock_no_roadblock"].Reset()
+            player["reports_roadblock_if_roadblock"].Reset()
+            player["follows_navigation"].Reset()
     
\ No newline at end of file
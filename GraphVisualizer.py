@@ -2,10 +2,20 @@ import json
 import pygame
 import networkx as nx
 import math
-from datetime import datetime
+import weakref
+import numpy as np
+from itertools import islice
 from roadblock import Roadblock
 from ReportManager import ReportManager
-import asyncio
+from RoutingGraph import RoutingGraph, RouteEngine
+from RouteCache import RouteCache
+from RouteTrees import RouteTrees
+from ContractionHierarchy import LoadContractionHierarchy
+from Landmarks import LoadLandmarks
+from SimClock import RealClock
+from SpatialGrid import SpatialGrid
+from settings_utils import ROUTING_DJIKSTRA
+from logger import event_fields
 
 
 # Constants
@@ -25,6 +35,20 @@ ROADBLOCK_FAKE_SELECTED_PLAYER_IMAGE_PATH = 'src/imgs/roadblock_fake_reported_fo
 ROADBLOCK_REPORTED_IMAGE_PATH = 'src/imgs/roadblock_reported.png'
 ROADBLOCK_IMAGE_SIZE = 35
 PLAYER_IMAGE_SIZE = 35
+ROUTE_CACHE_SIZE = 4096
+EDGE_CHANGE_LOG_SIZE = 4096 # entries kept for incremental planners, see TrimEdgeChangeLog
+ROTATION_STEP = 5 # degrees, player sprites are rotated to the nearest multiple
+PLAYER_IMAGES = ('p_default', 'p_done', 'p_deviate', 'p_failed')
+MIN_ZOOM = 0.5
+MAX_ZOOM = 64
+# Level of detail: node circles and labels are only drawn if a typical edge is at least this long on screen (px)
+NODE_LOD_PX = 2 * NODE_SIZE
+LABEL_LOD_PX = 4 * NODE_SIZE
+PLAYER_GRID_CELL = 64 # px, cells of the index of drawn players used for picking
+PLAYER_CLUSTER_PX = 32 # px, without node circles players in the same square of this size are drawn as one marker...
+PLAYER_CLUSTER_MIN = 3 # ...if there are at least this many
+PLAYER_CLUSTER_RADIUS = 12
+PLAYER_CLUSTER_COLOR = (200, 40, 40)
 
 def congestion_color(congestion):
     """
@@ -65,27 +89,135 @@ def congestion_color(congestion):
         return (255, 0, 0)
 
 
+def SpriteRotation(orig_pos, dest_pos) -> float:
+    """Angle (degrees) to rotate a player image, which points upwards, so it faces from orig_pos to dest_pos."""
+    x1, y1 = orig_pos
+    x2, y2 = dest_pos
+
+    angle_radians = math.atan2(y2 - y1, x2 - x1)
+    angle_degrees = math.degrees(angle_radians)
+
+    # adjust the angle to be positive
+    rotation_angle = angle_degrees
+    if rotation_angle < 0:
+        rotation_angle += 360
+
+    # Adjust so that the image's 0 degrees is upwards
+    return (450 - rotation_angle) % 360
+
+
+def BuildEdgeGeometry(G: nx.Graph) -> dict:
+    """Static geometry of every edge in both directions: (node_a, node_b) -> (length, unit_x, unit_y, rotation).
+    unit_x/unit_y point from node_a to node_b and rotation is the SpriteRotation of a player moving that way."""
+    geometry = {}
+    for node_a, node_b in G.edges():
+        for orig, dest in ((node_a, node_b), (node_b, node_a)):
+            x1, y1 = G.nodes[orig]['pos']
+            x2, y2 = G.nodes[dest]['pos']
+            # same formula as the edge weights in LoadGraph
+            length = math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+            unit_x, unit_y = ((x2 - x1) / length, (y2 - y1) / length) if length > 0 else (0.0, 0.0)
+            geometry[(orig, dest)] = (length, unit_x, unit_y, SpriteRotation((x1, y1), (x2, y2)))
+    return geometry
+
+
+def LoadGraph(file_path) -> nx.Graph:
+    """Load the graph from a JSON file. Node positions are rotated and edges weighted by Euclidean distance."""
+    try:
+        with open(file_path, 'r') as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        print(f"Error: File '{file_path}' not found.")
+        exit()
+    except json.JSONDecodeError:
+        print("Error: Invalid JSON format.")
+        exit()
+
+    G = nx.Graph()
+
+    # Add nodes to the graph
+    for i, node in enumerate(data['nodes']):
+        rotated_x = node['y']
+        rotated_y = -node['x']
+        G.add_node(i, pos=(rotated_x, rotated_y))
+
+    # Add edges between nodes
+    for conn in data['connections']:
+        node1 = conn['nodeIndex1']
+        node2 = conn['nodeIndex2']
+        
+        x1, y1 = G.nodes[node1]['pos']
+        x2, y2 = G.nodes[node2]['pos']
+
+        # Euclid Distance
+        distance = math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+        
+        G.add_edge(node1, node2, weight=distance)
+    return G
+
+
 class GraphVisualizer:
-    def __init__(self, file_path, RM : ReportManager):
+    def __init__(self, file_path, RM : ReportManager, clock=None, headless=False):
         self.G = None
         self.pos = None
         self.load_graph(file_path)
-        self.font = pygame.font.SysFont('Tahoma', 14, bold=True)
-        self.none_font = pygame.font.Font(None, 24)
+        # Source of timestamps, tick counts and sleeps. Headless runs pass a SimClock
+        self.clock = clock if clock is not None else RealClock()
+        self.headless = headless
+        # Every per-edge map and set below is keyed by the edge id from GetEdgeId
         self.roadblocks = []
         self.reported_roadblocks = set()
-        self.player_rects = []
+        self.player_grid = SpatialGrid(PLAYER_GRID_CELL) # indices into player_hits of the players drawn last frame
+        self.player_hits = [] # (screen rect, player) in drawing order
         self.num_players_on_edge = {}
         self.roadblock_map = {}
         self.fake_roadblock_map = {}
         
+        self.congestion_map = {}
         self.congestion_weights = {}
+        self.player_congestion = {}
+
+        self.route_cache = RouteCache(ROUTE_CACHE_SIZE)
+        self.routing_mode = ROUTING_DJIKSTRA # see SetRoutingMode
+        self.route_trees = RouteTrees(self)
+        self.edge_change_log = [] # edge ids whose routing cost changed, read by incremental planners
+        self.edge_change_start = 0 # number of changes dropped from the front of edge_change_log
+        self.edge_change_epoch = 0 # bumped when the whole routing state is reset
+        self.planners = weakref.WeakSet() # live incremental planners, the changes are only logged for them
+        self.edge_occupancy_listeners = [] # callables(edge_id) run when the number of players on an edge changed
 
         self.players = []
+        self.route_index = {} # edge id -> ids of players whose current path uses the edge, kept up to date by Player.path
 
         self.enable_color_congestion = False
         self.RM = RM
 
+        # Camera, see ZoomMap and PanMap. camera_center is the map point shown in the middle of the map area, None for
+        # the middle of the graph
+        self.zoom = 1.0
+        self.camera_center = None
+
+        # Drawing caches, see get_map_view and build_map_layers
+        self.map_view_key = None # map area and camera the caches were made for
+        self.map_view_rect = None
+        self.map_transform = None
+        self.screen_pos = [] # node -> screen position
+        self.map_layers_valid = False
+        self.map_layer = None
+        self.node_index = None # SpatialGrid of the nodes and edges in map coordinates, see build_map_index
+        self.edge_index = None
+        self.node_labels = {} # node -> rendered label
+        self.show_nodes = True # level of detail of the map layers
+        self.rotated_images = {} # (image key, rotation step) -> rotated player image
+        self.count_glyphs = {} # times_reported -> rendered text
+
+        # Fonts and images need a pygame display, headless runs never draw
+        if not headless:
+            self.load_images()
+
+    def load_images(self):
+        self.font = pygame.font.SysFont('Tahoma', 14, bold=True)
+        self.none_font = pygame.font.Font(None, 24)
         self.images = {
             'roadblock_real': pygame.image.load(ROADBLOCK_REAL_IMAGE_PATH).convert_alpha(),
             'roadblock_reported': pygame.image.load(ROADBLOCK_REPORTED_IMAGE_PATH).convert_alpha(),
@@ -106,46 +238,42 @@ class GraphVisualizer:
         self.images['p_deviate'] = pygame.transform.scale(self.images['p_deviate'], (PLAYER_IMAGE_SIZE, PLAYER_IMAGE_SIZE))
         self.images['p_failed'] = pygame.transform.scale(self.images['p_failed'], (PLAYER_IMAGE_SIZE, PLAYER_IMAGE_SIZE))
 
-        for key in ['p_default', 'p_done', 'p_deviate', 'p_failed']:
+        for key in PLAYER_IMAGES:
             transparency = pygame.Surface(self.images[key].get_size(), pygame.SRCALPHA)
             transparency.fill((255, 255, 255, 200))  # 200 out of 255 for some transparency
             self.images[key].blit(transparency, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
 
     def load_graph(self, file_path):
         """Load the graph from a JSON file."""
-        try:
-            with open(file_path, 'r') as file:
-                data = json.load(file)
-        except FileNotFoundError:
-            print(f"Error: File '{file_path}' not found.")
-            exit()
-        except json.JSONDecodeError:
-            print("Error: Invalid JSON format.")
-            exit()
-
-        self.G = nx.Graph()
-
-        # Add nodes to the graph
-        for i, node in enumerate(data['nodes']):
-            rotated_x = node['y']
-            rotated_y = -node['x']
-            self.G.add_node(i, pos=(rotated_x, rotated_y))
-
-        # Add edges between nodes
-        for conn in data['connections']:
-            node1 = conn['nodeIndex1']
-            node2 = conn['nodeIndex2']
-            
-            x1, y1 = self.G.nodes[node1]['pos']
-            x2, y2 = self.G.nodes[node2]['pos']
-
-            # Euclid Distance
-            distance = math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
-            
-            self.G.add_edge(node1, node2, weight=distance)
+        self.G = LoadGraph(file_path)
 
         # Get node positions
         self.pos = nx.get_node_attributes(self.G, 'pos')
+        xs = [pos[0] for pos in self.pos.values()]
+        ys = [pos[1] for pos in self.pos.values()]
+        self.pos_bounds = (min(xs), max(xs), min(ys), max(ys))
+        # Length, direction and sprite rotation of every edge in both directions, see BuildEdgeGeometry
+        self.edge_geometry = BuildEdgeGeometry(self.G)
+
+        # Compiled CSR copy of the graph used by the routing engine
+        self.routing_graph = RoutingGraph(self.G)
+        self.router = RouteEngine(self.routing_graph)
+        # Node positions by node id, for drawing
+        self.node_xs = np.array(self.routing_graph.xs)
+        self.node_ys = np.array(self.routing_graph.ys)
+        # Effective routing cost (base weight x congestion multiplier) per edge id. Only rewritten by UpdateEdgeCost
+        # and RebuildEdgeCosts when an edge's congestion state changes; the search loops read it through edge_cost_view.
+        self.edge_costs = np.array(self.routing_graph.edge_weights, dtype=np.float64)
+        self.edge_cost_view = memoryview(self.edge_costs)
+        # Congestion factor (see GetEdgeCongestion) per edge id, kept in step with edge_costs for the movement kernel
+        # in PlayerState.py. The extra last entry (index no_edge) is the congestion of a player turning back from a roadblock.
+        self.no_edge = self.routing_graph.num_edges
+        self.edge_congestion = np.ones(self.routing_graph.num_edges + 1)
+
+        # Optional contraction hierarchy built ahead of time with ContractionHierarchy.py
+        self.contraction_hierarchy = LoadContractionHierarchy(file_path, self)
+        # Optional ALT landmark tables built ahead of time with Landmarks.py, used by the AStar routing mode (see Djikstra)
+        self.landmarks = LoadLandmarks(file_path, self)
 
     def get_pos(self, node_id):
         """Get the position of a node. Returns a tuple"""
@@ -171,89 +299,131 @@ class GraphVisualizer:
     def is_valid_connection(self, node_a, node_b):
         """ Check if there is a connection between two nodes"""
         return self.G.has_edge(node_a, node_b)
+
+    def GetEdgeId(self, node_a, node_b) -> int | None:
+        """Returns the canonical id of the edge between two nodes (in either direction), or None if there is no edge."""
+        return self.routing_graph.edge_lookup.get((node_a, node_b))
+
+    def GetEdgeNodes(self, edge_id) -> tuple:
+        """Returns the (node_a, node_b) pair of an edge id."""
+        graph = self.routing_graph
+        return (graph.node_ids[graph.edge_u[edge_id]], graph.node_ids[graph.edge_v[edge_id]])
     
     def InitRoadblockMap(self, mp):
-        """ Called Once during setup. Maps pair of nodes to bool value if exists"""
+        """ Called Once during setup. Maps edge id to its Roadblock if exists"""
         self.roadblock_map = mp
         self.fake_roadblock_map = {}
     
     def InitRoadblocks(self, roadblock: list):
         self.roadblocks = roadblock # creates reference to roadblocks list
         self.reported_roadblocks = set()
+        self.ResetRoutingState()
 
     def HasRoadblock(self, node_a, node_b, mp=None) -> tuple[Roadblock | None, bool]:
         """Check if there is a roadblock between two nodes (bidirectional) inside of provided map"""
         if mp is None:
             mp = self.roadblock_map
-        roadblock = mp.get((node_a, node_b)) or mp.get((node_b, node_a))
+        roadblock = mp.get(self.GetEdgeId(node_a, node_b))
         return (roadblock, roadblock is not None)
 
     async def ReportRoadblock(self, id: int, node_a, node_b, logger, timelag: float = None):
         """ Called when a player or AI requests report a roadblock to others"""
         roadblock, exists = self.HasRoadblock(node_a, node_b, self.roadblock_map)
         if timelag is not None:
-            await asyncio.sleep(timelag)
-            print(f"TimeLag done at {datetime.now().strftime('%H:%M:%S.%f')[:-3]} (will not print in logger)")
+            await self.clock.sleep(timelag)
+            if not self.headless:
+                print(f"TimeLag done at {self.clock.now().strftime('%H:%M:%S.%f')[:-3]} (will not print in logger)")
         if not exists:
             roadblock, exists = self.HasRoadblock(node_a, node_b, self.fake_roadblock_map)
             if not exists:
                 roadblock = Roadblock(node_a, node_b, self, False)
-                self.fake_roadblock_map[(node_a, node_b)] = roadblock
+                self.fake_roadblock_map[roadblock.edge_id] = roadblock
                 self.roadblocks.append(roadblock)
 
         roadblock.reported = True
         roadblock.times_reported += 1
         
         # collect players only after the timelag has (possibly) occured to capture players affected when a report has been processed / communicated
-        affected_players = self.GetPlayersAffectedByRoadblock(node_a, node_b, self.players)
+        affected_players = self.GetPlayersAffectedByRoadblock(roadblock.edge_id)
         affected_player_data = [
             {"player_id": player.id, "path": list(player.path)} for player in affected_players
         ]
         state = "Real" if roadblock.real else "Fake"
-        logger.info(f"Players affected by {state} Roadblock Report between ({node_a}, {node_b}) {roadblock.id}: {affected_player_data}")
-        self.RM.add_to_report_history(id, roadblock.id, datetime.now().strftime('%H:%M:%S.%f')[:-3], roadblock.real, node_a, node_b, affected_player_data)
-        self.reported_roadblocks.add((node_a, node_b))
-
-    def GetPlayersAffectedByRoadblock(self, node_a, node_b, players: list) -> list:
+        logger.info("Players affected by %s Roadblock Report between (%s, %s) %s: %s", state, node_a, node_b, roadblock.id, affected_player_data,
+                    extra=event_fields('affected', id, roadblock.edge_id))
+        self.RM.add_to_report_history(id, roadblock.id, self.clock.now().strftime('%H:%M:%S.%f')[:-3], roadblock.real, node_a, node_b, affected_player_data)
+        self.reported_roadblocks.add(roadblock.edge_id)
+        # A reported edge can only make routes longer
+        self.MarkEdgeCostChanged(roadblock.edge_id, True)
+
+    def GetPlayersAffectedByRoadblock(self, edge_id) -> list:
+        """Players whose current path uses the edge, in player id order."""
         if self.players is None:
             print("ERROR. Players is None!")
             exit(1)
-        affected_players = []
-        for player in players:
-            if player.is_player_affected_by_roadblock((node_a, node_b)):
-                affected_players.append(player)
-        return affected_players
+        return [self.players[player_id] for player_id in sorted(self.route_index.get(edge_id, ()))]
+
+    def IndexPlayerRoute(self, player_id, old_path, new_path):
+        """Moves a player in route_index from the edges of its old path to the edges of its new path."""
+        if old_path:
+            for node_a, node_b in zip(old_path, islice(old_path, 1, None)):
+                self.RemovePlayerRouteEdge(player_id, self.GetEdgeId(node_a, node_b))
+        if new_path:
+            for node_a, node_b in zip(new_path, islice(new_path, 1, None)):
+                self.route_index.setdefault(self.GetEdgeId(node_a, node_b), set()).add(player_id)
+
+    def RemovePlayerRouteEdge(self, player_id, edge_id):
+        """Removes one edge from a player's entries in route_index, e.g. the edge it just finished."""
+        player_ids = self.route_index.get(edge_id)
+        if player_ids is not None:
+            player_ids.discard(player_id)
+            if not player_ids:
+                del self.route_index[edge_id]
         
     def EnableColorCongestion(self, enable):
         """ Enable or Disable Color Congestion"""
         self.enable_color_congestion = enable
+        self.map_layers_valid = False
+
+    def InitCongestionMaps(self, congestion_map, congestion_weights, player_congestion):
+        """Called once during setup with all three congestion maps, so the edge costs are only rebuilt once."""
+        self.congestion_map = congestion_map
+        self.congestion_weights = congestion_weights
+        self.player_congestion = player_congestion
+        self.RebuildEdgeCosts()
+        self.ResetRoutingState()
 
     def InitCongestionMap(self, mp):
-        """ Called Once during setup. Maps pair of nodes to bool value if exists"""
-        self.congestion_map = {}
-        self.congestion_map = mp
+        """ Called Once during setup. Maps edge id to its congestion value if exists"""
+        self.InitCongestionMaps(mp, self.congestion_weights, self.player_congestion)
 
     def InitCongestionWeightMap(self, mp):
-        self.congestion_weights = {}
-        self.congestion_weights = mp
+        self.InitCongestionMaps(self.congestion_map, mp, self.player_congestion)
 
     def InitPlayerCongestionMap(self, mp):
-        self.player_congestion = {}
-        self.player_congestion = mp
+        self.InitCongestionMaps(self.congestion_map, self.congestion_weights, mp)
 
 
     def InitPlayerReferences(self, players):
         self.players = players
+        # Players index their paths when they are created, rebuild so players of a previous game are dropped
+        self.route_index = {}
+        for player in players:
+            self.IndexPlayerRoute(player.id, None, player.path)
     
     def GetCongestion(self, node_a, node_b) -> float:
+        """Returns the congestion factor (0-1) between two nodes. See GetEdgeCongestion."""
+        return self.GetEdgeCongestion(self.GetEdgeId(node_a, node_b))
+
+    def GetEdgeCongestion(self, edge_id) -> float:
         """Returns the congestion factor (0-1) if congestion exists, otherwise returns 1 (no slowdown).
             If PlayerCongestion exists, this takes higher priority and return that congestion factor instead."""
         if self.congestion_map:
-            road_congestion_factor = self.congestion_map.get((node_a, node_b), self.congestion_map.get((node_b, node_a), 1.0))
+            road_congestion_factor = self.congestion_map.get(edge_id, 1.0)
             if self.player_congestion is None:
                 return road_congestion_factor
-            # get the number of players on node_a, node_b edge
-            num_players = self.num_players_on_edge.get((node_a, node_b), self.num_players_on_edge.get((node_b, node_a), 0))
+            # get the number of players on the edge
+            num_players = self.num_players_on_edge.get(edge_id, 0)
             # if there is no value, return road_congestion_factor
             # if there is a value, multiply with the road_congestion_factor       
             return self.player_congestion.get(num_players, 1.0) * road_congestion_factor
@@ -262,33 +432,101 @@ class GraphVisualizer:
     
     def ChangePlayerEdgeLocation(self, new_edge = None , prev_edge = None):
         ''' 
-        If edge is provided, add player as present on that edge.
-        If prev_edge is provided, remove the player from that previous edge
+        If edge id is provided, add player as present on that edge.
+        If prev_edge id is provided, remove the player from that previous edge
         '''
         # Remove the player from the previous edge
         if prev_edge is not None:
-            prev_node_a, prev_node_b = prev_edge
-            prev_edge_a_b = (prev_node_a, prev_node_b)
-            prev_edge_b_a = (prev_node_b, prev_node_a)
-            if self.num_players_on_edge.get(prev_edge_a_b, 0) > 0:
-                self.num_players_on_edge[prev_edge_a_b] -= 1
-            elif self.num_players_on_edge.get(prev_edge_b_a, 0) > 0:
-                self.num_players_on_edge[prev_edge_b_a] -= 1
+            if self.num_players_on_edge.get(prev_edge, 0) > 0:
+                self.num_players_on_edge[prev_edge] -= 1
             else:
-                print(f"Error: Attempted to remove from an edge with zero players! ({prev_node_a}, {prev_node_b})")
+                print(f"Error: Attempted to remove from an edge with zero players! {self.GetEdgeNodes(prev_edge)}")
                 exit(1)
+            self.UpdateEdgeCost(prev_edge)
+            for listener in self.edge_occupancy_listeners:
+                listener(prev_edge)
         # Add the player to the current edge
-        # if the edge is (b, a) and exists, increment that, otherwise increment (a, b)
         if new_edge is not None:
-            node_a, node_b = new_edge
-            edge_a_b = (node_a, node_b)
-            edge_b_a = (node_b, node_a)
-            if edge_b_a in self.num_players_on_edge:
-                self.num_players_on_edge[edge_b_a] += 1
-            else:
-                self.num_players_on_edge[edge_a_b] = self.num_players_on_edge.get(edge_a_b, 0) + 1
+            self.num_players_on_edge[new_edge] = self.num_players_on_edge.get(new_edge, 0) + 1
+            self.UpdateEdgeCost(new_edge)
+            for listener in self.edge_occupancy_listeners:
+                listener(new_edge)
+
+    def UpdateEdgeCost(self, edge_id):
+        '''Recomputes the congestion and routing cost of one edge after its congestion state changed.'''
+        congestion = self.GetEdgeCongestion(edge_id)
+        self.edge_congestion[edge_id] = congestion
+        prev_cost = self.edge_cost_view[edge_id]
+        cost = self.routing_graph.edge_weights_list[edge_id] * self.GetCongestionMultiplier(congestion)
+        if cost == prev_cost:
+            return
+        self.edge_costs[edge_id] = cost
+        self.MarkEdgeCostChanged(edge_id, cost > prev_cost)
+
+    def RebuildEdgeCosts(self):
+        '''Recomputes the congestion and routing cost of every edge, used when congestion maps are (re)loaded.'''
+        base = self.routing_graph.edge_weights_list
+        congestions = [self.GetEdgeCongestion(edge_id) for edge_id in range(len(base))]
+        self.edge_costs[:] = [weight * self.GetCongestionMultiplier(congestion) for weight, congestion in zip(base, congestions)]
+        self.edge_congestion[:] = congestions + [self.GetEdgeCongestion(None)]
+
+    def MarkEdgeCostChanged(self, edge_id, increased: bool):
+        '''
+        Propagates a routing cost change of a single edge.
+        If the edge became more expensive (or blocked), only cached routes crossing it can be stale.
+        If it became cheaper, any route could now be improved so every cached route is invalidated.
+        '''
+        if increased:
+            self.route_cache.invalidate_edge(edge_id)
+        else:
+            self.route_cache.bump_version()
+        self.route_trees.invalidate_edge(edge_id, increased)
+        if self.contraction_hierarchy is not None:
+            self.contraction_hierarchy.MarkEdgeChanged(edge_id)
+        if self.planners:
+            self.edge_change_log.append(edge_id)
+            if len(self.edge_change_log) > EDGE_CHANGE_LOG_SIZE:
+                self.TrimEdgeChangeLog()
+
+    def TrimEdgeChangeLog(self):
+        '''
+        Drops the changes every planner has read. Planners lagging more than half of EDGE_CHANGE_LOG_SIZE changes
+        behind (e.g. of players that stopped rerouting) are reset, they search from scratch on their next Replan.
+        '''
+        end = self.edge_change_start + len(self.edge_change_log)
+        keep_from = end - EDGE_CHANGE_LOG_SIZE // 2
+        for planner in list(self.planners):
+            if planner.log_cursor < keep_from:
+                planner.reset()
+        keep_from = min((planner.log_cursor for planner in self.planners), default=end)
+        del self.edge_change_log[:keep_from - self.edge_change_start]
+        self.edge_change_start = keep_from
+
+    def ResetRoutingState(self):
+        '''Invalidates every cached route and incremental planner, used when congestion or roadblock maps are (re)loaded.'''
+        self.route_cache.bump_version()
+        self.route_trees.clear()
+        if self.contraction_hierarchy is not None:
+            self.contraction_hierarchy.Reset()
+        self.edge_change_log = []
+        self.edge_change_start = 0
+        self.edge_change_epoch += 1
+
+    def SetRoutingMode(self, routing_mode):
+        '''Selects the search Djikstra falls back to (settings_utils.ROUTING_MODES). Routes found with the other search
+        can differ between paths of equal length, so the cached ones are dropped.'''
+        if routing_mode != self.routing_mode:
+            self.routing_mode = routing_mode
+            self.route_cache.bump_version()
+
+    def GetEdgeMultiplier(self, edge_id) -> float:
+        """Returns the routing distance multiplier of an edge given its current congestion."""
+        return self.GetCongestionMultiplier(self.GetEdgeCongestion(edge_id))
+
+    def GetRoutingCost(self, edge_id) -> float:
+        """Returns the weight of an edge adjusted by its congestion multiplier."""
+        return self.edge_cost_view[edge_id]
 
-    
     def GetCongestionMultiplier(self, congestion_factor):
         """Given a congestion factor (0-1), return the distance multipler."""
         for (low, high), multiplier in self.congestion_weights.items():
@@ -297,6 +535,10 @@ class GraphVisualizer:
         return 1 # There was no multiplier found
 
 
+    def GetMinCongestionMultiplier(self) -> float:
+        """Smallest multiplier any edge can have. Used to keep straight-line heuristics admissible."""
+        return min([1] + list(self.congestion_weights.values()))
+
     def transform_position(self, x, y, scale, offset_x, offset_y, min_x, min_y):
         """Transforms the position based on scaling and offset."""
         return (
@@ -305,73 +547,265 @@ class GraphVisualizer:
         )
 
     def calculate_scaling_and_offset(self, map_rect):
-        """Calculate the scaling and offset values for drawing map."""
-        min_x = min(self.pos[node][0] for node in self.pos)
-        max_x = max(self.pos[node][0] for node in self.pos)
-        min_y = min(self.pos[node][1] for node in self.pos)
-        max_y = max(self.pos[node][1] for node in self.pos)
+        """Calculate the scaling and offset values for drawing map. At zoom 1 and without a camera_center the whole
+        graph fits into map_rect."""
+        min_x, max_x, min_y, max_y = self.pos_bounds
 
         scale_x = (map_rect.width - PADDING) / (max_x - min_x)
         scale_y = (map_rect.height - PADDING) / (max_y - min_y)
-        scale = min(scale_x, scale_y)
+        scale = min(scale_x, scale_y) * self.zoom
 
-        offset_x = (map_rect.width - (max_x - min_x) * scale) / 2 + map_rect.x
-        offset_y = (map_rect.height - (max_y - min_y) * scale) / 2 + map_rect.y
+        # distance of the point in the middle of map_rect from min_x, min_y
+        if self.camera_center is None:
+            half_x, half_y = (max_x - min_x) / 2, (max_y - min_y) / 2
+        else:
+            half_x, half_y = self.camera_center[0] - min_x, self.camera_center[1] - min_y
+        offset_x = map_rect.width / 2 - half_x * scale + map_rect.x
+        offset_y = map_rect.height / 2 - half_y * scale + map_rect.y
 
         return scale, offset_x, offset_y, min_x, min_y
 
+    def screen_to_map(self, x, y):
+        """Map position drawn at screen position x, y (with the transform of the last frame)."""
+        scale, offset_x, offset_y, min_x, min_y = self.map_transform
+        return (x - offset_x) / scale + min_x, (y - offset_y) / scale + min_y
+
+    def get_camera_center(self):
+        if self.camera_center is not None:
+            return self.camera_center
+        min_x, max_x, min_y, max_y = self.pos_bounds
+        return (min_x + max_x) / 2, (min_y + max_y) / 2
+
+    def ZoomMap(self, factor, screen_point=None):
+        """Zooms the map by factor (within MIN_ZOOM and MAX_ZOOM). The map point at screen_point, by default the
+        middle of the map area, stays where it is."""
+        if self.map_transform is None:
+            return
+        map_rect = pygame.Rect(self.map_view_rect)
+        self.get_map_view(map_rect) # the camera may have changed since the last frame
+        if screen_point is None:
+            screen_point = map_rect.center
+        map_x, map_y = self.screen_to_map(*screen_point)
+        zoom = min(max(self.zoom * factor, MIN_ZOOM), MAX_ZOOM)
+        scale = self.map_transform[0] / self.zoom * zoom
+        self.zoom = zoom
+        self.camera_center = (map_x - (screen_point[0] - map_rect.x - map_rect.width / 2) / scale,
+                              map_y - (screen_point[1] - map_rect.y - map_rect.height / 2) / scale)
+
+    def PanMap(self, dx, dy):
+        """Moves the map by dx, dy screen pixels."""
+        if self.map_transform is None:
+            return
+        scale = self.get_map_view(pygame.Rect(self.map_view_rect))[0]
+        center_x, center_y = self.get_camera_center()
+        self.camera_center = (center_x - dx / scale, center_y - dy / scale)
+
+    def ResetCamera(self):
+        """Shows the whole graph again."""
+        self.zoom = 1.0
+        self.camera_center = None
+
+    def build_map_index(self):
+        """Spatial grids of the nodes and of the edges (their bounding boxes) in map coordinates, made on the first draw."""
+        min_x, max_x, min_y, max_y = self.pos_bounds
+        # about one node per cell on an evenly spread map
+        cell_size = max(max_x - min_x, max_y - min_y, 1) / max(1, math.isqrt(len(self.pos)))
+        self.node_index = SpatialGrid(cell_size)
+        for node, (x, y) in self.pos.items():
+            self.node_index.Insert(node, x, y, x, y)
+        self.edge_index = SpatialGrid(cell_size)
+        for edge_id in range(self.routing_graph.num_edges):
+            node1, node2 = self.GetEdgeNodes(edge_id)
+            (x1, y1), (x2, y2) = self.pos[node1], self.pos[node2]
+            self.edge_index.Insert(edge_id, min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        # typical edge length, decides the level of detail (see build_map_layers)
+        self.edge_length = float(np.median(self.routing_graph.edge_weights)) if self.routing_graph.num_edges else 0
+
+    def get_map_view(self, map_rect):
+        """Scaling and offset for map_rect (see calculate_scaling_and_offset). The transform, the screen positions of
+        the nodes and the map layers are only made again when the map area (window resized) or the camera changes."""
+        key = (tuple(map_rect), self.zoom, self.camera_center)
+        if key != self.map_view_key:
+            self.map_view_key = key
+            self.map_view_rect = tuple(map_rect)
+            self.map_transform = scale, offset_x, offset_y, min_x, min_y = self.calculate_scaling_and_offset(map_rect)
+            # same as transform_position for every node
+            self.screen_pos = list(zip(((self.node_xs - min_x) * scale + offset_x).astype(np.int64).tolist(),
+                                       ((self.node_ys - min_y) * scale + offset_y).astype(np.int64).tolist()))
+            self.map_layers_valid = False
+            self.last_path = None # the selected player's path has to be drawn again as well
+        return self.map_transform
+
+    def build_map_layers(self, map_rect):
+        """Draws the map once: the edges (in their current colors) on edge_layer, nodes and labels on node_layer, and
+        both together on map_layer, the one blitted each frame. The layers cover the map area plus room for the nodes
+        at its border, they are transparent elsewhere so the selected player's path below stays visible.
+        Only the nodes and edges within the layers are drawn (found with the spatial grids). When zoomed out so far
+        that edges are shorter than LABEL_LOD_PX (NODE_LOD_PX) on screen, node labels (and circles) are left out."""
+        if self.node_index is None:
+            self.build_map_index()
+        self.layer_rect = map_rect.inflate(2 * NODE_SIZE, 2 * NODE_SIZE)
+        origin_x, origin_y = self.layer_rect.topleft
+        view = (*self.screen_to_map(*self.layer_rect.topleft), *self.screen_to_map(*self.layer_rect.bottomright))
+        # the surfaces are kept while the map area keeps its size (zooming and panning)
+        if self.map_layer is None or self.map_layer.get_size() != self.layer_rect.size:
+            self.edge_layer = pygame.Surface(self.layer_rect.size, pygame.SRCALPHA).convert_alpha()
+            self.node_layer = pygame.Surface(self.layer_rect.size, pygame.SRCALPHA).convert_alpha()
+            self.map_layer = pygame.Surface(self.layer_rect.size, pygame.SRCALPHA).convert_alpha()
+        self.edge_layer.fill((0, 0, 0, 0))
+        self.node_layer.fill((0, 0, 0, 0))
+
+        self.visible_edges = np.array(sorted(self.edge_index.Query(*view)), dtype=np.int64)
+        self.edge_screen_pos = {}
+        for edge_id in self.visible_edges.tolist():
+            node1, node2 = self.GetEdgeNodes(edge_id)
+            x1, y1 = self.screen_pos[node1]
+            x2, y2 = self.screen_pos[node2]
+            self.edge_screen_pos[edge_id] = ((x1 - origin_x, y1 - origin_y), (x2 - origin_x, y2 - origin_y))
+        self.edge_colors = {}
+        # Congestion the edge colors were drawn for, NaN forces every edge to be drawn
+        self.drawn_congestion = np.full(self.routing_graph.num_edges, np.nan)
+
+        edge_px = self.edge_length * self.map_transform[0]
+        self.show_nodes = edge_px >= NODE_LOD_PX
+        show_labels = edge_px >= LABEL_LOD_PX
+        for node in sorted(self.node_index.Query(*view)) if self.show_nodes else []:
+            x, y = self.screen_pos[node]
+            x, y = x - origin_x, y - origin_y
+            pygame.draw.circle(self.node_layer, NODE_COLOR, (x, y), NODE_SIZE)
+            if show_labels:
+                label = self.node_labels.get(node)
+                if label is None:
+                    label = self.node_labels[node] = self.font.render(str(node), True, (0, 0, 0))
+                self.node_layer.blit(label, label.get_rect(center=(x, y)))
+
+        self.update_edge_layer(full=True)
+        self.map_layers_valid = True
+
+    def update_edge_layer(self, full=False):
+        """Draws the edges whose congestion color changed since they were drawn, and puts the nodes back on top of them
+        in map_layer (only within the changed area, unless full)."""
+        edges = self.visible_edges
+        congestion = self.edge_congestion[edges]
+        changed = congestion != self.drawn_congestion[edges]
+        dirty = []
+        for edge_id, edge_congestion in zip(edges[changed].tolist(), congestion[changed].tolist()):
+            edge_color = EDGE_DEFAULT_COLOR
+            if self.enable_color_congestion:
+                edge_color = congestion_color(edge_congestion)
+            if edge_color != self.edge_colors.get(edge_id):
+                self.edge_colors[edge_id] = edge_color
+                dirty.append(pygame.draw.line(self.edge_layer, edge_color, *self.edge_screen_pos[edge_id], LINE_THICKNESS))
+        self.drawn_congestion[edges[changed]] = congestion[changed]
+
+        if full:
+            dirty = [self.map_layer.get_rect()]
+        for rect in dirty:
+            self.map_layer.fill((0, 0, 0, 0), rect)
+            self.map_layer.blit(self.edge_layer, rect, rect)
+            self.map_layer.blit(self.node_layer, rect, rect)
+
     def draw_graph(self, screen, map_rect):
         """Draw the graph on the given Pygame screen.
         If congestion is enabled, change the road color to orange
+        The map is drawn once into layers (see build_map_layers), each frame only edges that changed color are drawn again.
         """
-        scale, offset_x, offset_y, min_x, min_y = self.calculate_scaling_and_offset(map_rect)
+        self.get_map_view(map_rect)
+        if not self.map_layers_valid:
+            self.build_map_layers(map_rect)
+        elif self.enable_color_congestion:
+            self.update_edge_layer()
+        screen.blit(self.map_layer, self.layer_rect)
+
+    def rotated_image(self, key, direction):
+        """Player image key rotated by direction, rounded to ROTATION_STEP. The rotations are made once and cached."""
+        step = round(direction / ROTATION_STEP) % (360 // ROTATION_STEP)
+        image = self.rotated_images.get((key, step))
+        if image is None:
+            image = self.rotated_images[(key, step)] = pygame.transform.rotate(self.images[key], step * ROTATION_STEP)
+        return image
+
+    def count_glyph(self, count):
+        """Rendered times_reported count of a roadblock, cached per count."""
+        glyph = self.count_glyphs.get(count)
+        if glyph is None:
+            glyph = self.count_glyphs[count] = self.none_font.render(str(count), True, (255, 255, 255)) # White color
+        return glyph
 
-        for node1, node2 in self.G.edges():
-            x1, y1 = self.transform_position(*self.pos[node1], scale, offset_x, offset_y, min_x, min_y)
-            x2, y2 = self.transform_position(*self.pos[node2], scale, offset_x, offset_y, min_x, min_y)
-            edge_color = EDGE_DEFAULT_COLOR
-            if self.enable_color_congestion:
-                congestion_value = self.GetCongestion(node1, node2)
-                edge_color = congestion_color(congestion_value)
-            pygame.draw.line(screen, edge_color, (x1, y1), (x2, y2), LINE_THICKNESS)
+    def draw_players(self, screen, players, map_rect):
+        """Draw the players on the Pygame screen. Only players within the map area are drawn. When node circles are
+        left out (zoomed out, see build_map_layers), players close to each other are drawn as one marker with their count.
+        The drawn players are put into player_grid for PickPlayer."""
+        scale, offset_x, offset_y, min_x, min_y = self.get_map_view(map_rect)
+        self.player_grid = SpatialGrid(PLAYER_GRID_CELL)
+        self.player_hits = []
+        if not players:
+            return
+        # same as transform_position, for every player at once
+        state = players[0].state
+        ids = np.fromiter((player.id for player in players), dtype=np.int64, count=len(players))
+        xs = ((state.pos_x[ids] - min_x) * scale + offset_x).astype(np.int64)
+        ys = ((state.pos_y[ids] - min_y) * scale + offset_y).astype(np.int64)
+        view = map_rect.inflate(2 * PLAYER_IMAGE_SIZE, 2 * PLAYER_IMAGE_SIZE)
+        visible = np.flatnonzero((xs >= view.left) & (xs < view.right) & (ys >= view.top) & (ys < view.bottom))
+
+        sprites = []
+        if not self.show_nodes and len(visible):
+            # square of every visible player, numbered row by row within view
+            visible_x, visible_y = xs[visible], ys[visible]
+            columns = view.width // PLAYER_CLUSTER_PX + 1
+            cells = (visible_y - view.top) // PLAYER_CLUSTER_PX * columns + (visible_x - view.left) // PLAYER_CLUSTER_PX
+            _, first, cell_of, counts = np.unique(cells, return_index=True, return_inverse=True, return_counts=True)
+            cell_of = cell_of.reshape(-1)
+            centers_x = np.bincount(cell_of, weights=visible_x) / counts
+            centers_y = np.bincount(cell_of, weights=visible_y) / counts
+            clustered = counts[cell_of] >= PLAYER_CLUSTER_MIN
+            for cell in np.flatnonzero(counts >= PLAYER_CLUSTER_MIN).tolist():
+                center = (int(centers_x[cell]), int(centers_y[cell]))
+                rect = pygame.draw.circle(screen, PLAYER_CLUSTER_COLOR, center, PLAYER_CLUSTER_RADIUS)
+                glyph = self.count_glyph(int(counts[cell]))
+                sprites.append((glyph, glyph.get_rect(center=center)))
+                self.add_player_hit(rect, players[visible[first[cell]]])
+            visible = visible[~clustered]
+
+        for i, x, y in zip(visible.tolist(), xs[visible].tolist(), ys[visible].tolist()):
+            player = players[i]
+            if hasattr(player, 'finished') and player.finished:
+                key = 'p_done'
+            elif hasattr(player, 'failed') and player.failed:
+                key = 'p_failed'
+            elif player.deviates:
+                key = 'p_deviate'
+            else:
+                key = 'p_default'
 
-        for node in self.G.nodes():
-            x, y = self.transform_position(*self.pos[node], scale, offset_x, offset_y, min_x, min_y)
-            pygame.draw.circle(screen, NODE_COLOR, (x, y), NODE_SIZE)
-            label = self.font.render(str(node), True, (0, 0, 0))
-            screen.blit(label, label.get_rect(center=(x, y)))
+            rotated_image = self.rotated_image(key, player.direction)
 
-    def draw_players(self, screen, players, map_rect):
-        """Draw the players on the Pygame screen."""
-        scale, offset_x, offset_y, min_x, min_y = self.calculate_scaling_and_offset(map_rect)
-        self.player_rects = []
-        for player in players:
-            pos = player.pos
-            if pos:
-                x, y = self.transform_position(pos[0], pos[1], scale, offset_x, offset_y, min_x, min_y)
-                
-                if hasattr(player, 'finished') and player.finished:
-                    player_image = self.images['p_done']
-                elif hasattr(player, 'failed') and player.failed:
-                    player_image = self.images['p_failed']
-                elif player.deviates:
-                    player_image = self.images['p_deviate']
-                else:
-                    player_image = self.images['p_default']
+            # Get the rect for the rotated image and set its position
+            rotated_rect = rotated_image.get_rect(center=(x, y))
 
-                # Rotate the image for each player (if needed)
-                rotated_image = pygame.transform.rotate(player_image, player.direction)
+            self.add_player_hit(rotated_rect, player)
+            sprites.append((rotated_image, rotated_rect))
 
-                # Get the rect for the rotated image and set its position
-                rotated_rect = rotated_image.get_rect(center=(x, y))
+        # Draw all players in one call
+        screen.blits(sprites, doreturn=False)
 
-                self.player_rects.append((rotated_rect, player))
+    def add_player_hit(self, rect, player):
+        self.player_grid.Insert(len(self.player_hits), rect.left, rect.top, rect.right - 1, rect.bottom - 1)
+        self.player_hits.append((rect, player))
 
-                # Draw the rotated image at the player's position
-                screen.blit(rotated_image, rotated_rect)
+    def PickPlayer(self, screen_point):
+        """Player drawn at screen_point in the last frame (the first drawn if several overlap), or None. A marker of
+        several players picks the first of them."""
+        for i in sorted(self.player_grid.QueryPoint(*screen_point)):
+            rect, player = self.player_hits[i]
+            if rect.collidepoint(screen_point):
+                return player
+        return None
 
     def draw_player_path(self, screen, selected_player, map_rect):
         """Draw the player's path as a light blue line on the screen. If they are deviated, purple line."""
+        self.get_map_view(map_rect)
         if not hasattr(self, 'path_surface'):
             # Create a surface for the path if it doesn't exist
             self.path_surface = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
@@ -395,11 +829,9 @@ class GraphVisualizer:
             # Clear the path surface
             self.path_surface.fill((0, 0, 0, 0))  # Fill with transparent color
 
-            scale, offset_x, offset_y, min_x, min_y = self.calculate_scaling_and_offset(map_rect)
-
             for i in range(len(path) - 1):
-                x1, y1 = self.transform_position(*self.pos[path[i]], scale, offset_x, offset_y, min_x, min_y)
-                x2, y2 = self.transform_position(*self.pos[path[i + 1]], scale, offset_x, offset_y, min_x, min_y)
+                x1, y1 = self.screen_pos[path[i]]
+                x2, y2 = self.screen_pos[path[i + 1]]
 
                 pygame.draw.line(self.path_surface, line_color, (x1, y1), (x2, y2), 5)
 
@@ -407,11 +839,14 @@ class GraphVisualizer:
          
     def draw_roadblocks(self, screen, roadblocks: list[Roadblock], map_rect, selected_player=None):
         """Draw the roadblocks on the Pygame screen. If selected_player exists, any reported roadblocks will turn purple."""
-        scale, offset_x, offset_y, min_x, min_y = self.calculate_scaling_and_offset(map_rect)
-
+        scale, offset_x, offset_y, min_x, min_y = self.get_map_view(map_rect)
+        view = map_rect.inflate(2 * ROADBLOCK_IMAGE_SIZE, 2 * ROADBLOCK_IMAGE_SIZE)
+        sprites = []
         for roadblock in roadblocks:
             pos = roadblock.pos
             x, y = self.transform_position(pos[0], pos[1], scale, offset_x, offset_y, min_x, min_y)
+            if not view.collidepoint(x, y):
+                continue
 
             if roadblock.real:
                 if roadblock.reported:
@@ -419,19 +854,16 @@ class GraphVisualizer:
                 else:
                     roadblock_img = self.images['roadblock_real']
             else:
-                if selected_player is not None and (
-                    (roadblock.node_a, roadblock.node_b) in selected_player.false_roadblocks or 
-                    (roadblock.node_b, roadblock.node_a) in selected_player.false_roadblocks
-                ):
+                if selected_player is not None and roadblock.edge_id in selected_player.false_roadblocks:
                     roadblock_img = self.images['roadblock_fake_selected']
                 else:
                     roadblock_img = self.images['roadblock_fake']
 
-            roadblock_rect = roadblock_img.get_rect(center=(x, y))
-            screen.blit(roadblock_img, roadblock_rect)
+            sprites.append((roadblock_img, roadblock_img.get_rect(center=(x, y))))
 
             # Display times_reported if it's greater than 1
             if roadblock.times_reported > 1:
-                text_surface = self.none_font.render(str(roadblock.times_reported), True, (255, 255, 255))  # White color
-                text_rect = text_surface.get_rect(center=(x + 8, y + 8))  # Adjust the position as needed
-                screen.blit(text_surface, text_rect)
\ No newline at end of file
+                text_surface = self.count_glyph(roadblock.times_reported)
+                sprites.append((text_surface, text_surface.get_rect(center=(x + 8, y + 8)))) # Adjust the position as needed
+
+        screen.blits(sprites, doreturn=False)
\ No newline at end of file
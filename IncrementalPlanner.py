@@ -0,0 +1,210 @@
+import heapq
+import math
+from collections import deque
+from GraphVisualizer import GraphVisualizer
+
+INF = float('inf')
+MAX_CHANGES_RATIO = 0.25 # if more than this fraction of edges changed since the last replan, start over
+
+
+class IncrementalPlanner:
+    """Per-player D* Lite search towards a fixed destination.
+
+    The search runs backwards from the destination, so its state stays valid while the player moves.
+    When edge costs change (roadblock reports, congestion multipliers or edges the player blocks itself)
+    only the endpoints of those edges are updated and the repair is limited to the affected region.
+
+    Changed edges are read from GV.edge_change_log, every planner registers in GV.planners and keeps its own cursor
+    into that log (counted from the first change, GV.edge_change_start entries are no longer in the list).
+    Blocked edges are GV.reported_roadblocks plus the edges blocked through BlockEdge.
+    """
+    def __init__(self, GV: GraphVisualizer, goal_node):
+        self.GV = GV
+        self.graph = GV.routing_graph
+        self.goal = self.graph.index_of[goal_node]
+        self.blocked = set() # edge ids only this planner avoids
+        self.expanded_count = 0 # number of nodes expanded by the last replan
+        self.reset()
+        GV.planners.add(self)
+
+    def reset(self):
+        """Discards the search state. The next Replan searches from scratch."""
+        self.g = {}
+        self.rhs = {self.goal: 0}
+        self.open_keys = {}
+        self.priority_queue = []
+        self.km = 0
+        self.last_start = None
+        self.log_cursor = self.GV.edge_change_start + len(self.GV.edge_change_log)
+        self.epoch = self.GV.edge_change_epoch
+        self.pending = set() # edge ids changed since the last replan
+        self.heuristic_scale = self.GV.GetMinCongestionMultiplier()
+        self.push(self.goal)
+
+    def heuristic(self, a: int, b: int) -> float:
+        xs = self.graph.xs
+        ys = self.graph.ys
+        return self.heuristic_scale * math.hypot(xs[a] - xs[b], ys[a] - ys[b])
+
+    def cost(self, u: int, v: int, edge_id: int) -> float:
+        if edge_id in self.blocked or edge_id in self.GV.reported_roadblocks:
+            return INF
+        return self.GV.GetRoutingCost(edge_id)
+
+    def calculate_key(self, s: int) -> tuple:
+        m = min(self.g.get(s, INF), self.rhs.get(s, INF))
+        return (m + self.heuristic(self.last_start, s) + self.km, m) if self.last_start is not None else (m, m)
+
+    def push(self, s: int):
+        key = self.calculate_key(s)
+        self.open_keys[s] = key
+        heapq.heappush(self.priority_queue, (key[0], key[1], s))
+
+    def top_key(self) -> tuple:
+        """Returns the smallest key in the open list, dropping heap entries that are outdated."""
+        priority_queue = self.priority_queue
+        while priority_queue:
+            k1, k2, s = priority_queue[0]
+            if self.open_keys.get(s) == (k1, k2):
+                return (k1, k2)
+            heapq.heappop(priority_queue)
+        return (INF, INF)
+
+    def update_vertex(self, u: int):
+        graph = self.graph
+        if u != self.goal:
+            best = INF
+            g = self.g
+            offsets = graph.offsets_list
+            targets = graph.targets_list
+            for k in range(offsets[u], offsets[u + 1]):
+                v = targets[k]
+                g_v = g.get(v, INF)
+                if g_v == INF:
+                    continue
+                candidate = g_v + self.cost(u, v, graph.edge_ids_list[k])
+                if candidate < best:
+                    best = candidate
+            self.rhs[u] = best
+        self.open_keys.pop(u, None)
+        if self.g.get(u, INF) != self.rhs.get(u, INF):
+            self.push(u)
+
+    def update_neighbors(self, u: int):
+        offsets = self.graph.offsets_list
+        targets = self.graph.targets_list
+        for k in range(offsets[u], offsets[u + 1]):
+            self.update_vertex(targets[k])
+
+    def compute_shortest_path(self, start: int):
+        expanded = 0
+        g = self.g
+        rhs = self.rhs
+        while True:
+            top = self.top_key()
+            start_key = self.calculate_key(start)
+            if not (top < start_key or rhs.get(start, INF) != g.get(start, INF)):
+                break
+            if top == (INF, INF):
+                break
+            _, _, u = heapq.heappop(self.priority_queue)
+            del self.open_keys[u]
+            expanded += 1
+
+            new_key = self.calculate_key(u)
+            if top < new_key:
+                self.push(u)
+            elif g.get(u, INF) > rhs.get(u, INF):
+                g[u] = rhs[u]
+                self.update_neighbors(u)
+            else:
+                g[u] = INF
+                self.update_vertex(u)
+                self.update_neighbors(u)
+        self.expanded_count = expanded
+
+    def collect_changes(self):
+        """Reads the edges changed since the last replan from the GraphVisualizer."""
+        GV = self.GV
+        if self.epoch != GV.edge_change_epoch:
+            self.reset()
+            return
+        log = GV.edge_change_log
+        end = GV.edge_change_start + len(log)
+        if self.log_cursor < end:
+            self.pending.update(log[self.log_cursor - GV.edge_change_start:])
+            self.log_cursor = end
+
+    def BlockEdge(self, edge_id):
+        """Stops this planner from using an edge (e.g. a roadblock the player just saw)."""
+        if edge_id is None or edge_id in self.blocked:
+            return
+        self.blocked.add(edge_id)
+        self.pending.add(edge_id)
+
+    def Replan(self, start_node, retry: bool = True) -> deque:
+        """Repairs the search for the changed edges and returns the path from start_node like Djikstra does.
+        retry: search from scratch once if the path cannot be followed through the search state, see build_path."""
+        graph = self.graph
+        start = graph.index_of[start_node]
+        self.collect_changes()
+
+        if len(self.pending) > max(1, graph.num_edges * MAX_CHANGES_RATIO):
+            self.reset()
+
+        if self.last_start is None:
+            self.last_start = start
+            # keys were calculated without a start, recompute them now that one is known
+            for s in list(self.open_keys):
+                self.push(s)
+        elif start != self.last_start:
+            self.km += self.heuristic(self.last_start, start)
+            self.last_start = start
+
+        edge_u = graph.edge_u
+        edge_v = graph.edge_v
+        for edge_id in self.pending:
+            self.update_vertex(int(edge_u[edge_id]))
+            self.update_vertex(int(edge_v[edge_id]))
+        self.pending.clear()
+
+        self.compute_shortest_path(start)
+        return self.build_path(start, retry)
+
+    def build_path(self, start: int, retry: bool = True) -> deque:
+        """Greedily follows the cheapest neighbor from start to the goal. Unreachable goals return only the goal."""
+        graph = self.graph
+        nodes = graph.node_ids
+        offsets = graph.offsets_list
+        targets = graph.targets_list
+        g = self.g
+        path = deque([nodes[start]])
+        if g.get(start, INF) == INF:
+            return deque([nodes[self.goal]])
+
+        current = start
+        visited = {start}
+        while current != self.goal:
+            best, best_key = None, None
+            for k in range(offsets[current], offsets[current + 1]):
+                v = targets[k]
+                g_v = g.get(v, INF)
+                candidate = self.cost(current, v, graph.edge_ids_list[k]) + g_v
+                if candidate == INF:
+                    continue
+                # Edges that cost nothing make ties, take a node the walk has not been to, then the one closest to the goal
+                key = (candidate, v in visited, g_v)
+                if best is None or key < best_key:
+                    best, best_key = v, key
+            if best is None or best in visited:
+                if retry:
+                    # Costs changed mid-walk and the stored values are no longer consistent, search from scratch
+                    self.reset()
+                    return self.Replan(nodes[start], retry=False)
+                # The walk can still go around in circles over edges that cost nothing, leave it to the plain engine
+                GV = self.GV
+                return GV.router.shortest_path(nodes[start], nodes[self.goal], self.blocked | GV.reported_roadblocks, GV.edge_cost_view)
+            visited.add(best)
+            path.append(nodes[best])
+            current = best
+        return path
@@ -0,0 +1,119 @@
+import os
+import sys
+import argparse
+import numpy as np
+from RoutingGraph import RoutingGraph, RouteEngine
+
+DEFAULT_NUM_LANDMARKS = 16
+
+
+def LandmarksPath(map_path) -> str:
+    """Path of the landmark tables stored next to a map file (map.json -> map.landmarks.npz)."""
+    return os.path.splitext(map_path)[0] + '.landmarks.npz'
+
+
+class LandmarkIndex:
+    """Distances from/to K landmark nodes over the base (Euclidean) weights, used for ALT lower bounds.
+
+    By the triangle inequality, |d(L, t) - d(L, v)| is a lower bound on d(v, t) for every landmark L.
+    Roadblocks only remove edges and congestion multipliers are never below GV.GetMinCongestionMultiplier(),
+    so scaling the bound by that multiplier keeps it admissible however many reports come in.
+
+    forward[k, v] is d(landmark k, v) and backward[k, v] is d(v, landmark k). Roads are undirected, so both are
+    equal today but are kept apart so the bounds stay right if one-way roads are ever added.
+    """
+    def __init__(self, graph: RoutingGraph, landmarks, forward: np.ndarray, backward: np.ndarray):
+        self.graph = graph
+        self.landmarks = list(landmarks)
+        self.forward = forward
+        self.backward = backward
+        # Per node lists of K distances for the search loops
+        self.forward_rows = forward.T.tolist()
+        self.backward_rows = backward.T.tolist()
+
+    @classmethod
+    def Build(cls, graph: RoutingGraph, num_landmarks: int = DEFAULT_NUM_LANDMARKS) -> 'LandmarkIndex':
+        """Picks landmarks by farthest point selection and computes their distance arrays."""
+        engine = RouteEngine(graph)
+        num_landmarks = min(num_landmarks, graph.num_nodes)
+        landmarks = []
+        rows = []
+        # Start from the node farthest away from node 0, then keep adding the node farthest from all landmarks so far
+        dist, _ = engine.shortest_path_tree(graph.node_ids[0], None, graph.edge_weights_list)
+        closest = np.asarray(dist, dtype=np.float64)
+        for _ in range(num_landmarks):
+            candidates = np.where(np.isfinite(closest), closest, -1.0)
+            candidates[landmarks] = -1.0
+            landmark = int(np.argmax(candidates))
+            if candidates[landmark] < 0:
+                break
+            dist, _ = engine.shortest_path_tree(graph.node_ids[landmark], None, graph.edge_weights_list)
+            row = np.asarray(dist, dtype=np.float64)
+            landmarks.append(landmark)
+            rows.append(row)
+            closest = row if len(rows) == 1 else np.minimum(closest, row)
+
+        forward = np.vstack(rows) if rows else np.zeros((0, graph.num_nodes))
+        return cls(graph, landmarks, forward, forward.copy())
+
+    def Save(self, path):
+        np.savez_compressed(path,
+                            fingerprint=np.array(self.graph.fingerprint()),
+                            landmarks=np.asarray(self.landmarks, dtype=np.int32),
+                            forward=self.forward,
+                            backward=self.backward)
+
+    @classmethod
+    def Load(cls, path, graph: RoutingGraph) -> 'LandmarkIndex | None':
+        """Loads saved landmark tables. Returns None if they were built for a different graph."""
+        with np.load(path) as data:
+            if str(data['fingerprint']) != graph.fingerprint():
+                return None
+            return cls(graph, data['landmarks'].tolist(), data['forward'], data['backward'])
+
+    def LowerBound(self, node, target) -> float:
+        """Lower bound on the base distance between two nodes (by node id)."""
+        index_of = self.graph.index_of
+        return self.lower_bound(index_of[node], index_of[target])
+
+    def lower_bound(self, v: int, t: int) -> float:
+        best = 0.0
+        for to_v, to_t in zip(self.forward_rows[v], self.forward_rows[t]):
+            # d(v, t) >= d(L, t) - d(L, v)
+            if to_t - to_v > best and to_v != float('inf'):
+                best = to_t - to_v
+        for from_v, from_t in zip(self.backward_rows[v], self.backward_rows[t]):
+            # d(v, t) >= d(v, L) - d(t, L)
+            if from_v - from_t > best and from_t != float('inf'):
+                best = from_v - from_t
+        return best
+
+
+def LoadLandmarks(map_path, GV) -> LandmarkIndex | None:
+    """Loads the landmark tables stored next to the map if they match the loaded graph."""
+    path = LandmarksPath(map_path)
+    if not os.path.exists(path):
+        return None
+    landmarks = LandmarkIndex.Load(path, GV.routing_graph)
+    if landmarks is None:
+        print(f"Warning: '{path}' was built for a different map and is ignored. Rebuild it with Landmarks.py")
+    return landmarks
+
+
+def main(argv):
+    from GraphVisualizer import LoadGraph
+    parser = argparse.ArgumentParser(description="Build and save ALT landmark tables next to a map.json file.")
+    parser.add_argument('maps', nargs='+', help="map.json files to preprocess")
+    parser.add_argument('-k', '--num-landmarks', type=int, default=DEFAULT_NUM_LANDMARKS, help="number of landmarks to select")
+    args = parser.parse_args(argv)
+    for map_path in args.maps:
+        graph = RoutingGraph(LoadGraph(map_path))
+        landmarks = LandmarkIndex.Build(graph, args.num_landmarks)
+        out_path = LandmarksPath(map_path)
+        landmarks.Save(out_path)
+        print(f"{map_path}: {len(landmarks.landmarks)} landmarks -> {out_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,84 @@
+from array import array
+import numpy as np
+
+
+class NavHistory:
+    """Route updates of every player (the rows of NavHistory.csv), stored compactly.
+
+    Routes are kept as linked cells in two arrays, cell_node and cell_next (-1 ends a route). A route update of a
+    player mostly keeps the end of its previous route (reaching a waypoint drops the first node, a detour replaces the
+    beginning), so a new route reuses the cells of the longest suffix it shares with the previous one and only adds
+    cells for its new prefix. A route that did not change (finish) reuses the previous route as a whole.
+    """
+    def __init__(self):
+        self.cell_node = array('i')
+        self.cell_next = array('i')
+        # One entry per route update
+        self.player = array('i')
+        self.reason = array('B') # index into reasons
+        self.waypoint = array('i')
+        self.route = array('i') # first cell, -1 for an empty route
+        self.times = [] # time strings, consecutive equal ones are the same object
+        self.reasons = []
+        self.reason_codes = {}
+        # Previous route of each player and the cells of its nodes
+        self.last_route = {}
+        self.last_cells = {}
+
+    def __len__(self):
+        return len(self.player)
+
+    def Add(self, player_id, time, reason, current_waypoint, route):
+        """Stores a route update. route is copied, the caller may go on changing it."""
+        code = self.reason_codes.get(reason)
+        if code is None:
+            code = self.reason_codes[reason] = len(self.reasons)
+            self.reasons.append(reason)
+        if self.times and self.times[-1] == time:
+            time = self.times[-1]
+
+        route = list(route)
+        prev_route = self.last_route.get(player_id, [])
+        prev_cells = self.last_cells.get(player_id, [])
+        # Length of the suffix shared with the previous route
+        shared = 0
+        max_shared = min(len(route), len(prev_route))
+        while shared < max_shared and route[-1 - shared] == prev_route[-1 - shared]:
+            shared += 1
+        cells = prev_cells[len(prev_cells) - shared:] if shared else []
+        next_cell = cells[0] if cells else -1
+        prefix = []
+        for node in reversed(route[:len(route) - shared]):
+            next_cell_id = len(self.cell_node)
+            self.cell_node.append(node)
+            self.cell_next.append(next_cell)
+            next_cell = next_cell_id
+            prefix.append(next_cell_id)
+        prefix.reverse()
+        cells = prefix + cells
+        self.last_route[player_id] = route
+        self.last_cells[player_id] = cells
+
+        self.player.append(player_id)
+        self.reason.append(code)
+        self.waypoint.append(current_waypoint)
+        self.route.append(cells[0] if cells else -1)
+        self.times.append(time)
+
+    def Route(self, i) -> list:
+        """Route of update i."""
+        route = []
+        cell = self.route[i]
+        cell_node = self.cell_node
+        cell_next = self.cell_next
+        while cell != -1:
+            route.append(cell_node[cell])
+            cell = cell_next[cell]
+        return route
+
+    def Entries(self):
+        """(player id, time, reason, current waypoint, route) of every update, grouped by player like NavHistory.csv."""
+        if not len(self):
+            return
+        for i in np.argsort(np.frombuffer(self.player, dtype=np.intc), kind='stable').tolist():
+            yield self.player[i], self.times[i], self.reasons[self.reason[i]], self.waypoint[i], self.Route(i)
@@ -0,0 +1,161 @@
+import heapq
+import numpy as np
+
+
+class PlayerStateStore:
+    """Movement state of every player as NumPy arrays (struct of arrays), indexed by player id.
+
+    Player.t and Player.pos read and write these arrays, so the per-player decision code and the vectorized Update
+    share one copy of the state. Most frames a player only moves along its current leg (straight movement from
+    orig to dest), which Update does for all of them at once. Only players that have to decide something (start,
+    arrival at a node, report time penalty, spotting a roadblock) run their Player code, in player id order.
+    """
+    ARRAYS = ('t', 'pos_x', 'pos_y', 'orig_x', 'orig_y', 'dest_x', 'dest_y', 'length', 'speed', 'spotting',
+              'edge', 'checked', 'active', 'scalar')
+
+    def __init__(self, GV, capacity: int = 16):
+        self.GV = GV
+        self.players = []
+        self.t = np.zeros(capacity) # progress along the current leg (0-1)
+        self.pos_x = np.zeros(capacity)
+        self.pos_y = np.zeros(capacity)
+        # Current leg, loaded by LoadLeg whenever the player's own code ran
+        self.orig_x = np.zeros(capacity)
+        self.orig_y = np.zeros(capacity)
+        self.dest_x = np.zeros(capacity)
+        self.dest_y = np.zeros(capacity)
+        self.length = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.spotting = np.zeros(capacity) # roadblock_spotting_position
+        self.edge = np.zeros(capacity, dtype=np.int64) # index into GV.edge_congestion that sets the speed
+        self.checked = np.zeros(capacity, dtype=bool) # CheckedRoadblockOnCurrentRoute
+        self.active = np.zeros(capacity, dtype=bool) # not finished and not failed
+        self.scalar = np.zeros(capacity, dtype=bool) # runs Player.update next frame (first decision, report time penalty)
+
+        # State of the frame being updated, see OnEdgeOccupancyChanged
+        self.moving = None
+        self.prev_t = None
+        self.current_id = -1
+        self.queue = []
+        self.queued = set()
+
+        self.position_log = None # PositionWriter or TraceWriter of the running game, see StartPositionLog
+        self.early_positions = [] # (player id, x, y, time) logged before a log was started
+
+    def Register(self, player):
+        """Adds a player, its id is its index in the arrays."""
+        while player.id >= len(self.t):
+            for name in self.ARRAYS:
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate([array, np.zeros_like(array)]))
+        self.players.append(player)
+        self.speed[player.id] = player.speed
+        self.spotting[player.id] = player.roadblock_spotting_position
+        self.active[player.id] = True
+        self.scalar[player.id] = True
+
+    def LoadLeg(self, player):
+        """Copies the decision state and current leg of a player after its own code ran."""
+        i = player.id
+        self.active[i] = not (player.finished or player.failed)
+        self.checked[i] = player.CheckedRoadblockOnCurrentRoute
+        self.scalar[i] = player.is_initial or player.moveTimeout != 0
+        if self.scalar[i] or not self.active[i]:
+            return
+        orig_pos, dest_pos = player.GetLegPositions()
+        self.orig_x[i], self.orig_y[i] = orig_pos
+        self.dest_x[i], self.dest_y[i] = dest_pos
+        self.length[i] = player.GetLegLength(orig_pos, dest_pos)
+        edge_id = self.GV.GetEdgeId(player.curr_node_id, player.dest_node)
+        self.edge[i] = edge_id if edge_id is not None else self.GV.no_edge
+
+    def Advance(self, ids: np.ndarray):
+        """Moves players along their leg by one frame from prev_t, at the speed set by the current congestion of their edge."""
+        adjusted_speed = self.speed[ids] * self.GV.edge_congestion[self.edge[ids]]
+        length = self.length[ids]
+        delta_t = np.where(length > 0, np.minimum(adjusted_speed / np.maximum(length, 1e-6), 1), 1)
+        t = np.minimum(self.prev_t[ids] + delta_t, 1)
+        self.t[ids] = t
+        orig_x = self.orig_x[ids]
+        orig_y = self.orig_y[ids]
+        self.pos_x[ids] = orig_x + t * (self.dest_x[ids] - orig_x)
+        self.pos_y[ids] = orig_y + t * (self.dest_y[ids] - orig_y)
+        # players that got close enough to spot a roadblock run CheckForRoadblock at their turn
+        for player_id in ids[(t >= self.spotting[ids]) & ~self.checked[ids]].tolist():
+            if player_id not in self.queued:
+                self.queued.add(player_id)
+                heapq.heappush(self.queue, player_id)
+
+    def OnEdgeOccupancyChanged(self, edge_id):
+        """A player entered or left an edge. Players after it in this frame that move along the edge use the new congestion, as in Player.update."""
+        if self.moving is None:
+            return
+        ids = np.flatnonzero(self.moving & (self.edge[:len(self.moving)] == edge_id))
+        ids = ids[ids > self.current_id]
+        if len(ids):
+            self.Advance(ids)
+
+    async def Update(self) -> list:
+        """Advances every unfinished player by one frame, with the same result as running Player.update on each in id order.
+        Returns the players whose decision code ran, only those can have finished or failed."""
+        n = len(self.players)
+        t = self.t[:n]
+        self.moving = self.active[:n] & ~self.scalar[:n] & (t < 1)
+        self.prev_t = t.copy()
+        self.queue = np.flatnonzero(self.active[:n] & ~self.moving).tolist() # sorted, so already a heap
+        self.queued = set(self.queue)
+        movers = np.flatnonzero(self.moving)
+        self.Advance(movers)
+
+        decided = []
+        self.GV.edge_occupancy_listeners.append(self.OnEdgeOccupancyChanged)
+        try:
+            while self.queue:
+                player_id = heapq.heappop(self.queue)
+                self.queued.discard(player_id)
+                player = self.players[player_id]
+                self.current_id = player_id
+                if self.moving[player_id]:
+                    # a later congestion change can slow the player down again before it spots anything
+                    if self.t[player_id] < self.spotting[player_id] or self.checked[player_id]:
+                        continue
+                    self.moving[player_id] = False
+                    player.CheckForRoadblock()
+                else:
+                    await player.update()
+                    decided.append(player)
+                self.LoadLeg(player)
+        finally:
+            self.GV.edge_occupancy_listeners.remove(self.OnEdgeOccupancyChanged)
+            self.moving = None
+            self.current_id = -1
+
+        if len(movers) and self.position_log is not None:
+            self.position_log.LogFrame(movers, self.pos_x[movers], self.pos_y[movers])
+        return decided
+
+    def StartPositionLog(self, position_log):
+        """Logs positions to position_log (PositionWriter or TraceWriter) from now on, closing the previous one."""
+        self.ClosePositionLog()
+        self.position_log = position_log
+        for player_id, pos_x, pos_y, time in self.early_positions:
+            position_log.LogRow(player_id, pos_x, pos_y, time)
+        self.early_positions = []
+
+    def LogPosition(self, player_id, pos_x, pos_y):
+        if self.position_log is not None:
+            self.position_log.LogRow(player_id, pos_x, pos_y)
+        else:
+            # start positions are set before the game (and its log) starts
+            self.early_positions.append((player_id, pos_x, pos_y, self.GV.clock.now()))
+
+    def FlushPositions(self):
+        """Waits until every position logged so far is written."""
+        if self.position_log is not None:
+            self.position_log.Flush()
+
+    def ClosePositionLog(self):
+        """Writes the remaining positions and closes the position log."""
+        if self.position_log is not None:
+            self.position_log.Close()
+            self.position_log = None
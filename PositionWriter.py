@@ -0,0 +1,121 @@
+import csv
+import queue
+import threading
+from abc import ABC, abstractmethod
+
+POSITION_QUEUE_BATCHES = 8 # batches waiting to be written before Write blocks the simulation
+POSITION_BUFFER_ROWS = 5000 # Position.csv rows collected before they are handed to the writer thread
+FLUSH = object() # queue marker, the writer thread flushes its files when it reaches it
+CLOSE = object() # queue marker, the writer thread closes its files and stops
+
+
+class BackgroundWriter(ABC):
+    """Does the file writes of a log on a background thread.
+
+    The simulation hands over whole batches with Write. The queue between them is bounded, so if the disk falls
+    behind Write blocks until a batch has been written (backpressure) instead of collecting data without limit.
+    Subclasses open their files and implement write_batch, flush_files and close_files, which run on the thread.
+    """
+    def __init__(self, path, max_batches: int = POSITION_QUEUE_BATCHES):
+        self.path = path
+        self.queue = queue.Queue(maxsize=max_batches)
+        self.error = None # first exception of the writer thread, reported by Flush/Close
+        self.thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            batch = self.queue.get()
+            try:
+                if batch is CLOSE:
+                    self.close_files()
+                elif self.error is None:
+                    if batch is FLUSH:
+                        self.flush_files()
+                    else:
+                        self.write_batch(batch)
+            except Exception as e:
+                # Not only disk errors (OSError), a batch the subclass cannot pack or format must not stop the thread
+                # either: it keeps taking batches so the simulation never blocks on a dead writer
+                if self.error is None:
+                    self.error = e
+            finally:
+                self.queue.task_done()
+            if batch is CLOSE:
+                return
+
+    def Write(self, batch):
+        """Queues a batch. It is handed over and must not be changed afterwards."""
+        self.queue.put(batch)
+
+    def send_pending(self):
+        """Queues whatever the subclass collected but did not hand over yet."""
+
+    def Flush(self):
+        """Waits until everything logged so far is in the files."""
+        self.send_pending()
+        self.queue.put(FLUSH)
+        self.queue.join()
+        self.report_error()
+
+    def Close(self):
+        """Writes the remaining data, closes the files and stops the thread."""
+        self.send_pending()
+        self.queue.put(CLOSE)
+        self.thread.join()
+        self.report_error()
+
+    def report_error(self):
+        if self.error is not None:
+            print(f"Error: could not write '{self.path}': {type(self.error).__name__}: {self.error}")
+            self.error = None
+
+    @abstractmethod
+    def write_batch(self, batch):
+        """Writes one batch handed over with Write."""
+
+    @abstractmethod
+    def flush_files(self):
+        """Flushes the files to disk."""
+
+    @abstractmethod
+    def close_files(self):
+        """Closes the files, the thread stops afterwards."""
+
+
+class PositionWriter(BackgroundWriter):
+    """Writes Position.csv of one run. The file is opened once and rows are written in batches on a background thread."""
+    def __init__(self, path, clock):
+        self.clock = clock
+        self.rows = [] # rows not yet handed to the thread
+        self.file = open(path, mode='w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(['Player', 'Time', 'posX', 'posY'])
+        super().__init__(path)
+
+    def LogFrame(self, player_ids, xs, ys):
+        """Logs the positions of several players (arrays) at the current time."""
+        time = self.clock.now().strftime('%H:%M:%S.%f')
+        self.rows.extend(zip(player_ids.tolist(), [time] * len(player_ids), xs.tolist(), ys.tolist()))
+        if len(self.rows) >= POSITION_BUFFER_ROWS:
+            self.send_pending()
+
+    def LogRow(self, player_id, x, y, time=None):
+        """Logs the position of one player at the current time, or at time (datetime) if given."""
+        self.rows.append((player_id, (time or self.clock.now()).strftime('%H:%M:%S.%f'), x, y))
+        if len(self.rows) >= POSITION_BUFFER_ROWS:
+            self.send_pending()
+
+    def send_pending(self):
+        if self.rows:
+            self.Write(self.rows)
+            self.rows = []
+
+    def write_batch(self, rows):
+        self.writer.writerows(rows)
+
+    def flush_files(self):
+        self.file.flush()
+
+    def close_files(self):
+        self.file.close()
@@ -1,17 +1,22 @@
 import os
 import csv
+from collections import deque
 from roadblock import Roadblock
 
+REPORT_PANEL_ROWS = 1000 # latest reports kept for the Report History panel, ReportHistory keeps all of them
+
 class ReportManager:
     def __init__(self):
         self.ReportHistory = []
-        self.Reports= [] # used for scroll side bar
+        self.Reports = deque(maxlen=REPORT_PANEL_ROWS) # used for scroll side bar
+        self.report_count = 0 # reports added since the last reset, Reports only has the latest
         self.report_spacing = 25
         self.padding = 10
         self.content_height = len(self.Reports) * self.report_spacing + self.padding
 
     def ResetReportManager(self):
-        self.Reports = []
+        self.Reports.clear()
+        self.report_count = 0
         self.ReportHistory = []
         self.content_height = len(self.Reports) * self.report_spacing + self.padding
 
@@ -30,9 +35,10 @@ class ReportManager:
             self.Reports.append(f"{time}: Player {id} reported roadblock {roadblockIdx} at [{node_a}, {node_b}]")
         else:
             self.Reports.append(f"{time}: Player {id} reported fake roadblock {roadblockIdx} at [{node_a}, {node_b}]")
+        self.report_count += 1
         self.content_height = len(self.Reports) * self.report_spacing + self.padding
     
-    def SaveReportHistory(self, time, roadblock_map: dict[tuple,Roadblock], fake_roadblock_map: dict[tuple, Roadblock]):
+    def SaveReportHistory(self, time, roadblock_map: dict[int, Roadblock], fake_roadblock_map: dict[int, Roadblock]):
         '''Save Report History to CSV File.
         1. Lists all roadblocks by index, node_a, node_b
         2. Lists all fake roadblocks by index, node_a, node_b
@@ -45,14 +51,12 @@ class ReportManager:
             w = csv.writer(file)
 
             w.writerow(['Roadblocks', '', '', 'TimesReported'])
-            for i, roadblock in enumerate(roadblock_map):
-                roadblock_obj = roadblock_map[roadblock]
-                w.writerow([i, roadblock[0], roadblock[1], roadblock_obj.times_reported])
+            for i, roadblock_obj in enumerate(roadblock_map.values()):
+                w.writerow([i, roadblock_obj.node_a, roadblock_obj.node_b, roadblock_obj.times_reported])
             
             w.writerow(['FakeRoadblocks', '', '', 'TimesReported'])
-            for i, roadblock in enumerate(fake_roadblock_map):
-                roadblock_obj = fake_roadblock_map[roadblock]
-                w.writerow([i, roadblock[0], roadblock[1], roadblock_obj.times_reported])
+            for i, roadblock_obj in enumerate(fake_roadblock_map.values()):
+                w.writerow([i, roadblock_obj.node_a, roadblock_obj.node_b, roadblock_obj.times_reported])
 
             w.writerow(['Navigation History'])
             w.writerow(['id',
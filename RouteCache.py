@@ -0,0 +1,88 @@
+from collections import OrderedDict, deque
+
+
+class RouteCache:
+    """Bounded LRU cache of computed routes.
+
+    Every entry is tagged with the cache version it was computed under. Bumping the version invalidates
+    all entries at once (used when an edge gets cheaper, since any route could then be improved).
+    When an edge only gets more expensive or is removed, just the routes crossing that edge are dropped.
+    """
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self.entries = OrderedDict() # key -> (version, route tuple, edge ids on route)
+        self.routes_by_edge = {} # edge id -> set of keys whose route crosses that edge
+        self.version = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key) -> deque | None:
+        """Returns a fresh copy of the cached route, or None if it is missing or stale."""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        version, route, _ = entry
+        if version != self.version:
+            self.remove(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return deque(route)
+
+    def put(self, key, route, edge_ids):
+        """Stores a route together with the edge ids it crosses."""
+        if key in self.entries:
+            self.remove(key)
+        self.entries[key] = (self.version, tuple(route), edge_ids)
+        for edge_id in edge_ids:
+            self.routes_by_edge.setdefault(edge_id, set()).add(key)
+        while len(self.entries) > self.max_size:
+            oldest = next(iter(self.entries))
+            self.remove(oldest)
+            self.evictions += 1
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for edge_id in entry[2]:
+            keys = self.routes_by_edge.get(edge_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.routes_by_edge[edge_id]
+
+    def invalidate_edge(self, edge_id):
+        """Drops every cached route that crosses the given edge."""
+        keys = self.routes_by_edge.pop(edge_id, None)
+        if not keys:
+            return
+        for key in keys:
+            self.remove(key)
+            self.invalidations += 1
+
+    def bump_version(self):
+        """Invalidates every cached route. Stale entries are dropped lazily."""
+        self.version += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.routes_by_edge.clear()
+        self.version += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "version": self.version,
+        }
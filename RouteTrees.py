@@ -0,0 +1,73 @@
+from collections import deque
+
+
+class RouteTrees:
+    """Shared reverse shortest path trees, one per destination.
+
+    Every tree is computed under the global reported roadblocks and current congestion, which is exactly the
+    route the navigation system gives a player following it. Looking up a player's next hop or full path is then
+    a walk along the tree instead of a search. A tree is only recomputed after an edge change can affect it.
+    """
+    def __init__(self, GV):
+        self.GV = GV
+        self.trees = {} # destination node -> (dist list, next hop list, set of tree edge ids)
+        self.searches = 0 # number of trees computed, for profiling
+
+    def Prepare(self, destinations):
+        """Computes the trees for every distinct destination that does not have a valid one yet."""
+        for destination in set(destinations):
+            self.get_tree(destination)
+
+    def get_tree(self, destination) -> tuple:
+        tree = self.trees.get(destination)
+        if tree is None:
+            GV = self.GV
+            graph = GV.routing_graph
+            dist, next_hop = GV.router.shortest_path_tree(destination, GV.reported_roadblocks, GV.edge_cost_view)
+            tree_edges = set()
+            for node, hop in enumerate(next_hop):
+                if hop != -1:
+                    tree_edges.add(GV.GetEdgeId(graph.node_ids[node], graph.node_ids[hop]))
+            tree = (dist, next_hop, tree_edges)
+            self.trees[destination] = tree
+            self.searches += 1
+        return tree
+
+    def GetNextHop(self, start_node, end_node):
+        """Returns the next node on the way to end_node, or None if end_node is reached or unreachable."""
+        graph = self.GV.routing_graph
+        _, next_hop, _ = self.get_tree(end_node)
+        hop = next_hop[graph.index_of[start_node]]
+        return graph.node_ids[hop] if hop != -1 else None
+
+    def GetPath(self, start_node, end_node) -> deque:
+        """Returns the navigation route from start_node to end_node. Unreachable destinations return only end_node like Djikstra."""
+        graph = self.GV.routing_graph
+        dist, next_hop, _ = self.get_tree(end_node)
+        current = graph.index_of[start_node]
+        if dist[current] == float('inf'):
+            return deque([end_node])
+        path = deque()
+        while current != -1:
+            path.append(graph.node_ids[current])
+            current = next_hop[current]
+        return path
+
+    def invalidate_edge(self, edge_id, increased: bool):
+        """A more expensive edge only affects trees that use it. A cheaper edge (u, v) only affects trees it shortens,
+        those where going over it is shorter than the distance stored for u or v."""
+        GV = self.GV
+        if increased:
+            stale = [d for d, tree in self.trees.items() if edge_id in tree[2]]
+        elif edge_id in GV.reported_roadblocks:
+            return # the trees never use a reported edge, whatever it costs
+        else:
+            u = int(GV.routing_graph.edge_u[edge_id])
+            v = int(GV.routing_graph.edge_v[edge_id])
+            cost = GV.edge_cost_view[edge_id]
+            stale = [d for d, (dist, _, _) in self.trees.items() if cost + dist[v] < dist[u] or cost + dist[u] < dist[v]]
+        for destination in stale:
+            del self.trees[destination]
+
+    def clear(self):
+        self.trees.clear()
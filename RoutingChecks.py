@@ -0,0 +1,229 @@
+import os
+import sys
+import math
+import random
+import argparse
+import tempfile
+import numpy as np
+from GraphVisualizer import GraphVisualizer
+from ReportManager import ReportManager
+from ContractionHierarchy import ContractionHierarchy, MAX_QUERY_EXCLUSIONS
+from IncrementalPlanner import IncrementalPlanner
+from Landmarks import LandmarkIndex
+
+DEFAULT_MAP = 'src/ext/map.json'
+DEFAULT_SEED = 1
+DEFAULT_ROUNDS = 200
+MAX_REPORTED_RATIO = 0.05 # share of the edges the checks report as roadblocks
+NUM_DESTINATIONS = 10
+QUERIES_PER_ROUND = 5
+MULTIPLIERS = (0.25, 0.5, 1, 2, 4) # of the base weight, picked by random_change
+
+
+def LoadVisualizer(map_path) -> GraphVisualizer:
+    return GraphVisualizer(map_path, ReportManager(), headless=True)
+
+
+def path_cost(GV: GraphVisualizer, path, blocked_edges: set) -> float:
+    """Cost of a path under the current edge costs. Paths with only the end node (unreachable) or crossing a missing
+    or blocked edge cost inf."""
+    if len(path) < 2:
+        return float('inf')
+    cost = 0.0
+    for node_a, node_b in zip(path, list(path)[1:]):
+        edge_id = GV.GetEdgeId(node_a, node_b)
+        if edge_id is None or edge_id in blocked_edges:
+            return float('inf')
+        cost += GV.edge_cost_view[edge_id]
+    return cost
+
+
+def same_cost(a, b) -> bool:
+    return a == b or math.isclose(a, b, rel_tol=1e-9)
+
+
+def expected_cost(GV: GraphVisualizer, start_node, end_node, blocked_edges: set) -> float:
+    """Cost of the route RouteEngine.shortest_path finds, the reference for every check."""
+    return path_cost(GV, GV.router.shortest_path(start_node, end_node, blocked_edges, GV.edge_cost_view), blocked_edges)
+
+
+def random_blocked_edges(GV: GraphVisualizer, rng: random.Random) -> set:
+    """Reported roadblocks plus a few edges a single player avoids, now and then more than a query may exclude."""
+    count = rng.choice((0, 1, 2, 4, MAX_QUERY_EXCLUSIONS + 1))
+    return GV.reported_roadblocks | set(rng.sample(range(GV.routing_graph.num_edges), count))
+
+
+def random_change(GV: GraphVisualizer, rng: random.Random, multipliers=MULTIPLIERS) -> bool:
+    """Makes one edge cheaper or more expensive than its base weight, or reports it as a roadblock, and propagates
+    the change like GraphVisualizer does during a game. Returns whether the edge became cheaper."""
+    edge_id = rng.randrange(GV.routing_graph.num_edges)
+    if len(GV.reported_roadblocks) < GV.routing_graph.num_edges * MAX_REPORTED_RATIO and rng.random() < 0.1:
+        GV.reported_roadblocks.add(edge_id)
+        GV.MarkEdgeCostChanged(edge_id, True)
+        return False
+    prev_cost = GV.edge_cost_view[edge_id]
+    cost = GV.routing_graph.edge_weights_list[edge_id] * rng.choice(multipliers)
+    if cost == prev_cost:
+        return False
+    GV.edge_costs[edge_id] = cost
+    GV.MarkEdgeCostChanged(edge_id, cost > prev_cost)
+    return cost < prev_cost
+
+
+def CheckRouteTrees(map_path, rng: random.Random, rounds: int) -> int:
+    """Navigation routes from RouteTrees after every change, and the trees each change made it search again.
+    A cheaper edge may only drop the trees whose distances it improves."""
+    GV = LoadVisualizer(map_path)
+    trees = GV.route_trees
+    nodes = list(GV.routing_graph.node_ids)
+    destinations = rng.sample(nodes, NUM_DESTINATIONS)
+    trees.Prepare(destinations)
+    failures = 0
+    searches = [0, 0] # after more expensive, after cheaper changes
+    changes = [0, 0]
+    unneeded = 0
+    for _ in range(rounds):
+        old_trees = dict(trees.trees)
+        cheaper = random_change(GV, rng)
+        before = trees.searches
+        trees.Prepare(destinations)
+        searches[cheaper] += trees.searches - before
+        changes[cheaper] += 1
+        if cheaper:
+            unneeded += sum(1 for d in destinations if trees.trees[d] is not old_trees[d] and trees.trees[d][0] == old_trees[d][0])
+        for _ in range(QUERIES_PER_ROUND):
+            start_node, end_node = rng.choice(nodes), rng.choice(destinations)
+            if start_node == end_node:
+                continue
+            blocked = GV.reported_roadblocks
+            if not same_cost(path_cost(GV, trees.GetPath(start_node, end_node), blocked), expected_cost(GV, start_node, end_node, blocked)):
+                failures += 1
+    print(f"RouteTrees: trees of {NUM_DESTINATIONS} destinations searched again per change: "
+          f"{searches[0] / max(changes[0], 1):.2f} (more expensive or reported), {searches[1] / max(changes[1], 1):.2f} (cheaper), "
+          f"{unneeded} searches that found the same distances, {failures} wrong routes")
+    return failures + unneeded
+
+
+def CheckContractionHierarchy(map_path, rng: random.Random, rounds: int) -> int:
+    """Routes of a contraction hierarchy customized incrementally after every change, and now and then from scratch.
+    A query that excludes edges may fall back (return None), but an answer has to be a shortest path."""
+    GV = LoadVisualizer(map_path)
+    hierarchy = ContractionHierarchy.Build(GV.routing_graph)
+    hierarchy.Attach(GV)
+    GV.contraction_hierarchy = hierarchy # MarkEdgeCostChanged now passes the changed edges on
+    nodes = list(GV.routing_graph.node_ids)
+    failures = 0
+    fallbacks = 0
+    for i in range(rounds):
+        random_change(GV, rng)
+        if i % 50 == 49:
+            GV.ResetRoutingState()
+        for _ in range(QUERIES_PER_ROUND):
+            start_node, end_node = rng.sample(nodes, 2)
+            blocked = random_blocked_edges(GV, rng)
+            path = hierarchy.Query(start_node, end_node, blocked)
+            if path is None:
+                fallbacks += 1
+            elif not same_cost(path_cost(GV, path, blocked), expected_cost(GV, start_node, end_node, blocked)):
+                failures += 1
+    print(f"ContractionHierarchy: {rounds} changes, {rounds * QUERIES_PER_ROUND} queries, {fallbacks} fallbacks, {failures} wrong routes")
+    return failures
+
+
+def CheckIncrementalPlanner(map_path, rng: random.Random, rounds: int) -> int:
+    """Routes of D* Lite planners repaired after every change, for players that move along their route and block
+    edges themselves. Some edges cost nothing (a 0 congestion multiplier), which the path walk has to survive."""
+    GV = LoadVisualizer(map_path)
+    # Only there so the smallest multiplier is 0 and the heuristics stay admissible for edges that cost nothing
+    GV.InitCongestionWeightMap({(0.0, 0.0): 0})
+    nodes = list(GV.routing_graph.node_ids)
+    planners = [IncrementalPlanner(GV, goal) for goal in rng.sample(nodes, NUM_DESTINATIONS)]
+    positions = [rng.choice(nodes) for _ in planners]
+    failures = 0
+    for _ in range(rounds):
+        random_change(GV, rng, (0,) + MULTIPLIERS)
+        for _ in range(QUERIES_PER_ROUND):
+            i = rng.randrange(len(planners))
+            planner = planners[i]
+            goal_node = GV.routing_graph.node_ids[planner.goal]
+            while positions[i] == goal_node:
+                positions[i] = rng.choice(nodes)
+            if rng.random() < 0.2:
+                planner.BlockEdge(rng.randrange(GV.routing_graph.num_edges))
+            path = planner.Replan(positions[i])
+            blocked = planner.blocked | GV.reported_roadblocks
+            if not same_cost(path_cost(GV, path, blocked), expected_cost(GV, positions[i], goal_node, blocked)):
+                failures += 1
+            # the player drives on to the next node of its route, or starts somewhere else if there is none
+            positions[i] = path[1] if len(path) > 1 else rng.choice(nodes)
+    print(f"IncrementalPlanner: {rounds} changes, {rounds * QUERIES_PER_ROUND} replans, {failures} wrong routes")
+    return failures
+
+
+def CheckLandmarks(map_path, rng: random.Random, rounds: int) -> int:
+    """ALT lower bounds against the real base distances, tables that survive Save/Load, and A* routes with the
+    landmark bounds after every change. Costs never drop below the smallest congestion multiplier."""
+    GV = LoadVisualizer(map_path)
+    GV.InitCongestionWeightMap({(0.0, 0.0): min(MULTIPLIERS)}) # the heuristics are scaled by the smallest multiplier
+    graph = GV.routing_graph
+    landmarks = LandmarkIndex.Build(graph)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'map.landmarks.npz')
+        landmarks.Save(path)
+        loaded = LandmarkIndex.Load(path, graph)
+    failures = 0
+    if loaded is None or loaded.landmarks != landmarks.landmarks or not np.array_equal(loaded.forward, landmarks.forward):
+        print("Landmarks: the loaded tables differ from the saved ones")
+        failures += 1
+    nodes = list(graph.node_ids)
+    bound_errors = 0
+    for target in rng.sample(range(graph.num_nodes), NUM_DESTINATIONS):
+        dist, _ = GV.router.shortest_path_tree(graph.node_ids[target], None, graph.edge_weights_list)
+        for v in range(graph.num_nodes):
+            if landmarks.lower_bound(v, target) > dist[v] * (1 + 1e-9):
+                bound_errors += 1
+    settled = [0, 0] # by A* without and with the landmark bounds
+    for _ in range(rounds):
+        random_change(GV, rng)
+        for _ in range(QUERIES_PER_ROUND):
+            start_node, end_node = rng.sample(nodes, 2)
+            blocked = random_blocked_edges(GV, rng)
+            scale = GV.GetMinCongestionMultiplier()
+            GV.router.shortest_path_astar(start_node, end_node, blocked, GV.edge_cost_view, scale)
+            settled[0] += GV.router.settled_count
+            path = GV.router.shortest_path_astar(start_node, end_node, blocked, GV.edge_cost_view, scale, landmarks)
+            settled[1] += GV.router.settled_count
+            if not same_cost(path_cost(GV, path, blocked), expected_cost(GV, start_node, end_node, blocked)):
+                failures += 1
+    print(f"Landmarks: {len(landmarks.landmarks)} landmarks, {bound_errors} lower bounds above the real distance, "
+          f"{rounds * QUERIES_PER_ROUND} A* queries settling {settled[1]} nodes instead of {settled[0]}, {failures} wrong routes")
+    return failures + bound_errors
+
+
+CHECKS = {
+    'trees': CheckRouteTrees,
+    'ch': CheckContractionHierarchy,
+    'dstar': CheckIncrementalPlanner,
+    'alt': CheckLandmarks,
+}
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Compares the routing engines with RouteEngine.shortest_path on a map under random roadblocks and cost changes.")
+    parser.add_argument('--map', default=DEFAULT_MAP, help="map.json file (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="seed of the random changes (default: %(default)s)")
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS, help="changes per check (default: %(default)s)")
+    parser.add_argument('checks', nargs='*', help=f"checks to run: {', '.join(CHECKS)} (default: all)")
+    args = parser.parse_args(argv)
+    for name in args.checks:
+        if name not in CHECKS:
+            print(f"Error: unknown check '{name}', choose from {', '.join(CHECKS)}")
+            return 1
+    failures = 0
+    for name in args.checks or CHECKS:
+        failures += CHECKS[name](args.map, random.Random(args.seed), args.rounds)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,270 @@
+import heapq
+import math
+import hashlib
+from collections import deque
+import numpy as np
+import networkx as nx
+
+
+class RoutingGraph:
+    """Immutable CSR (compressed sparse row) copy of the road graph used for routing.
+
+    Built once from the networkx graph in GraphVisualizer.load_graph. Node ids are mapped to dense
+    indices and every undirected connection gets a single edge id that is shared by both directions.
+    The numpy arrays are the canonical (read-only) representation, the list copies are what the
+    search loops index into since plain list access is much cheaper from Python.
+    """
+    def __init__(self, G: nx.Graph):
+        self.node_ids = list(G.nodes())
+        self.index_of = {node: i for i, node in enumerate(self.node_ids)}
+        self.num_nodes = len(self.node_ids)
+        self.xs = [G.nodes[node]['pos'][0] for node in self.node_ids]
+        self.ys = [G.nodes[node]['pos'][1] for node in self.node_ids]
+
+        # Undirected edge table. edge_lookup maps (node_a, node_b) in either direction to the edge id
+        self.edge_lookup = {}
+        edge_u, edge_v, edge_w = [], [], []
+        for node_a, node_b, weight in G.edges(data='weight'):
+            edge_id = len(edge_u)
+            edge_u.append(self.index_of[node_a])
+            edge_v.append(self.index_of[node_b])
+            edge_w.append(weight)
+            self.edge_lookup[(node_a, node_b)] = edge_id
+            self.edge_lookup[(node_b, node_a)] = edge_id
+        self.num_edges = len(edge_u)
+
+        # Directed arcs grouped by source node. Neighbor order follows G.neighbors() so ties are broken
+        # the same way as the old networkx based search.
+        offsets = [0]
+        targets, weights, edge_ids = [], [], []
+        for node in self.node_ids:
+            for neighbor, attrs in G.adj[node].items():
+                targets.append(self.index_of[neighbor])
+                weights.append(attrs['weight'])
+                edge_ids.append(self.edge_lookup[(node, neighbor)])
+            offsets.append(len(targets))
+
+        self.offsets = self._frozen(offsets, np.int64)
+        self.targets = self._frozen(targets, np.int32)
+        self.weights = self._frozen(weights, np.float64)
+        self.edge_ids = self._frozen(edge_ids, np.int32)
+        self.edge_u = self._frozen(edge_u, np.int32)
+        self.edge_v = self._frozen(edge_v, np.int32)
+        self.edge_weights = self._frozen(edge_w, np.float64)
+
+        self.offsets_list = offsets
+        self.targets_list = targets
+        self.weights_list = weights
+        self.edge_ids_list = edge_ids
+        self.edge_weights_list = edge_w
+
+    @staticmethod
+    def _frozen(values, dtype) -> np.ndarray:
+        arr = np.asarray(values, dtype=dtype)
+        arr.flags.writeable = False
+        return arr
+
+    def fingerprint(self) -> str:
+        """Hash of the topology and base weights, used to detect preprocessed data built for another map."""
+        digest = hashlib.sha1()
+        digest.update(np.int64(self.num_nodes).tobytes())
+        digest.update(self.edge_u.tobytes())
+        digest.update(self.edge_v.tobytes())
+        digest.update(self.edge_weights.tobytes())
+        return digest.hexdigest()
+
+    def get_edge_id(self, node_a, node_b) -> int | None:
+        """Returns the undirected edge id between two nodes, or None if they are not connected."""
+        return self.edge_lookup.get((node_a, node_b))
+
+
+class RouteEngine:
+    """Shortest path search over a RoutingGraph with reusable distance/predecessor buffers.
+
+    Buffers are allocated once per graph. Instead of resetting them on every query, each query gets a new
+    search id and an entry is only valid if its stamp matches the current search id.
+    """
+    def __init__(self, graph: RoutingGraph):
+        self.graph = graph
+        n = graph.num_nodes
+        self.dist = [float('inf')] * n
+        self.prev = [-1] * n
+        self.stamp = [0] * n # search id that last wrote dist/prev
+        self.settled = [0] * n # search id that last settled the node
+        self.search_id = 0
+        self.settled_count = 0 # number of nodes settled by the last query
+
+    def shortest_path(self, start_node, end_node, blocked_edges: set, edge_costs) -> deque:
+        """Returns the shortest path between start_node and end_node as a deque of node ids.
+
+        blocked_edges: set of edge ids that may not be traversed.
+        edge_costs: cost of traversing each edge indexed by edge id (list, array or memoryview), e.g. GV.edge_cost_view.
+        If end_node is unreachable, the path only contains end_node (same as the original Djikstra).
+        """
+        graph = self.graph
+        offsets = graph.offsets_list
+        targets = graph.targets_list
+        edge_ids = graph.edge_ids_list
+        dist = self.dist
+        prev = self.prev
+        stamp = self.stamp
+        settled = self.settled
+
+        self.search_id += 1
+        sid = self.search_id
+        start = graph.index_of[start_node]
+        end = graph.index_of[end_node]
+
+        dist[start] = 0
+        prev[start] = -1
+        stamp[start] = sid
+        priority_queue = [(0, start)]  # (distance, node index)
+        settled_count = 0
+
+        while priority_queue:
+            current_distance, current = heapq.heappop(priority_queue)
+
+            if current == end:
+                break
+
+            if settled[current] == sid:
+                continue
+            settled[current] = sid
+            settled_count += 1
+
+            for k in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[k]
+                if settled[neighbor] == sid:
+                    continue
+                if blocked_edges and edge_ids[k] in blocked_edges:
+                    continue
+
+                new_distance = current_distance + edge_costs[edge_ids[k]]
+
+                if stamp[neighbor] != sid or new_distance < dist[neighbor]:
+                    stamp[neighbor] = sid
+                    dist[neighbor] = new_distance
+                    prev[neighbor] = current
+                    heapq.heappush(priority_queue, (new_distance, neighbor))
+
+        self.settled_count = settled_count
+        return self.build_path(end)
+
+    def shortest_path_astar(self, start_node, end_node, blocked_edges: set, edge_costs, heuristic_scale: float = 1.0, landmarks=None) -> deque:
+        """A* version of shortest_path using the straight-line distance to end_node as heuristic.
+
+        Edge weights are Euclidean distances, so scaling the straight-line distance by the smallest possible
+        congestion multiplier (heuristic_scale) keeps the heuristic admissible and consistent.
+        If a LandmarkIndex is given, the larger of the straight-line and landmark lower bounds is used.
+        """
+        graph = self.graph
+        offsets = graph.offsets_list
+        targets = graph.targets_list
+        edge_ids = graph.edge_ids_list
+        xs = graph.xs
+        ys = graph.ys
+        dist = self.dist
+        prev = self.prev
+        stamp = self.stamp
+        settled = self.settled
+
+        self.search_id += 1
+        sid = self.search_id
+        start = graph.index_of[start_node]
+        end = graph.index_of[end_node]
+        end_x = xs[end]
+        end_y = ys[end]
+        hypot = math.hypot
+
+        dist[start] = 0
+        prev[start] = -1
+        stamp[start] = sid
+        priority_queue = [(0, start)]  # (estimate, node index)
+        settled_count = 0
+
+        while priority_queue:
+            _, current = heapq.heappop(priority_queue)
+
+            if current == end:
+                break
+
+            if settled[current] == sid:
+                continue
+            settled[current] = sid
+            settled_count += 1
+            current_distance = dist[current]
+
+            for k in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[k]
+                if settled[neighbor] == sid:
+                    continue
+                if blocked_edges and edge_ids[k] in blocked_edges:
+                    continue
+
+                new_distance = current_distance + edge_costs[edge_ids[k]]
+
+                if stamp[neighbor] != sid or new_distance < dist[neighbor]:
+                    stamp[neighbor] = sid
+                    dist[neighbor] = new_distance
+                    prev[neighbor] = current
+                    heuristic = hypot(xs[neighbor] - end_x, ys[neighbor] - end_y)
+                    if landmarks is not None:
+                        bound = landmarks.lower_bound(neighbor, end)
+                        if bound > heuristic:
+                            heuristic = bound
+                    heapq.heappush(priority_queue, (new_distance + heuristic_scale * heuristic, neighbor))
+
+        self.settled_count = settled_count
+        return self.build_path(end)
+
+    def shortest_path_tree(self, source_node, blocked_edges: set, edge_costs) -> tuple[list, list]:
+        """Runs a full search from source_node and returns (dist, prev) lists indexed by node index.
+
+        Unreached nodes have an infinite distance and prev -1. Since the graph is undirected, following prev from
+        any node leads back to source_node along a shortest path, which makes it a reverse shortest path tree.
+        """
+        graph = self.graph
+        offsets = graph.offsets_list
+        targets = graph.targets_list
+        edge_ids = graph.edge_ids_list
+        n = graph.num_nodes
+        dist = [float('inf')] * n
+        prev = [-1] * n
+        settled = [False] * n
+
+        source = graph.index_of[source_node]
+        dist[source] = 0
+        priority_queue = [(0, source)]
+
+        while priority_queue:
+            current_distance, current = heapq.heappop(priority_queue)
+            if settled[current]:
+                continue
+            settled[current] = True
+
+            for k in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[k]
+                if settled[neighbor]:
+                    continue
+                if blocked_edges and edge_ids[k] in blocked_edges:
+                    continue
+                new_distance = current_distance + edge_costs[edge_ids[k]]
+                if new_distance < dist[neighbor]:
+                    dist[neighbor] = new_distance
+                    prev[neighbor] = current
+                    heapq.heappush(priority_queue, (new_distance, neighbor))
+
+        return dist, prev
+
+    def build_path(self, end: int) -> deque:
+        """Follows the predecessor chain of the last search back from the end index."""
+        nodes = self.graph.node_ids
+        path = deque()
+        if self.stamp[end] != self.search_id:
+            path.append(nodes[end])
+            return path
+        current = end
+        while current != -1:
+            path.appendleft(nodes[current])
+            current = self.prev[current]
+        return path
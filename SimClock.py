@@ -0,0 +1,70 @@
+import heapq
+import asyncio
+import pygame
+from datetime import datetime, timedelta
+
+TICK_MS = 1000 / 60 # length of one simulation step (a 60 fps frame)
+
+
+class RealClock:
+    """Wall clock, used by GraphVisualizer when it is given no clock. Ticks are pygame.time.get_ticks() and sleeps are real asyncio sleeps."""
+    def get_ticks(self) -> int:
+        return pygame.time.get_ticks()
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def timestamp(self) -> float:
+        return self.now().timestamp()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+
+class SimClock:
+    """Simulated clock of the GUI and headless runs. Time only moves when advance() is called.
+
+    sleep() suspends the caller until the simulated time has passed instead of waiting on the wall clock,
+    so time lags and report penalties cost nothing in real time. now() starts at the time the clock was created.
+    """
+    def __init__(self, start: datetime | None = None):
+        self.start = start if start is not None else datetime.now()
+        self.ticks = 0.0 # simulated milliseconds since start
+        self.timers = [] # heap of (due ms, sequence, future)
+        self.sequence = 0
+
+    def get_ticks(self) -> int:
+        return int(self.ticks)
+
+    def now(self) -> datetime:
+        return self.start + timedelta(milliseconds=self.ticks)
+
+    def timestamp(self) -> float:
+        return self.now().timestamp()
+
+    async def sleep(self, seconds: float):
+        future = asyncio.get_running_loop().create_future()
+        self.sequence += 1
+        heapq.heappush(self.timers, (self.ticks + seconds * 1000, self.sequence, future))
+        await future
+
+    def next_timer(self) -> float | None:
+        """Simulated time (ms) at which the next sleeper is due, or None."""
+        timers = self.timers
+        while timers and timers[0][2].done(): # cancelled sleeps
+            heapq.heappop(timers)
+        return timers[0][0] if timers else None
+
+    def advance(self, ms: float = TICK_MS):
+        """Moves the clock forward and wakes every sleeper that is due.
+        Woken coroutines resume the next time the caller yields to the event loop."""
+        self.advance_to(self.ticks + ms)
+
+    def advance_to(self, ms: float):
+        """Same as advance but moves the clock to an absolute simulated time (ms since start)."""
+        self.ticks = ms
+        timers = self.timers
+        while timers and timers[0][0] <= self.ticks:
+            _, _, future = heapq.heappop(timers)
+            if not future.done():
+                future.set_result(None)
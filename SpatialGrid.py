@@ -0,0 +1,52 @@
+import math
+
+
+class SpatialGrid:
+    """Uniform grid over the plane that finds the items near a rectangle without looking at every item.
+
+    Items are inserted with their bounding box and stored in every cell the box overlaps, Query returns the items of
+    the cells a rectangle overlaps (a superset of the items whose box overlaps it). Used for the nodes and edges of the
+    map (map coordinates) and the drawn players (screen coordinates) by GraphVisualizer.
+    """
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.cells = {} # (column, row) -> list of items
+
+    def cell_range(self, min_x, min_y, max_x, max_y):
+        size = self.cell_size
+        return (math.floor(min_x / size), math.floor(min_y / size),
+                math.floor(max_x / size), math.floor(max_y / size))
+
+    def Insert(self, item, min_x, min_y, max_x, max_y):
+        col1, row1, col2, row2 = self.cell_range(min_x, min_y, max_x, max_y)
+        cells = self.cells
+        for col in range(col1, col2 + 1):
+            for row in range(row1, row2 + 1):
+                cell = cells.get((col, row))
+                if cell is None:
+                    cells[(col, row)] = [item]
+                else:
+                    cell.append(item)
+
+    def Query(self, min_x, min_y, max_x, max_y) -> set:
+        """Items in the cells overlapping the rectangle."""
+        col1, row1, col2, row2 = self.cell_range(min_x, min_y, max_x, max_y)
+        items = set()
+        if (col2 - col1 + 1) * (row2 - row1 + 1) > len(self.cells):
+            # the rectangle covers more cells than are used, go through the used ones
+            for (col, row), cell in self.cells.items():
+                if col1 <= col <= col2 and row1 <= row <= row2:
+                    items.update(cell)
+            return items
+        cells = self.cells
+        for col in range(col1, col2 + 1):
+            for row in range(row1, row2 + 1):
+                cell = cells.get((col, row))
+                if cell is not None:
+                    items.update(cell)
+        return items
+
+    def QueryPoint(self, x, y) -> list:
+        """Items of the cell containing the point."""
+        size = self.cell_size
+        return self.cells.get((math.floor(x / size), math.floor(y / size)), [])
@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from PositionWriter import BackgroundWriter
+
+'''
+Binary trace of a run, an alternative to Position.csv for large runs (GameManager(trace=True), headless.py --trace).
+
+logs/<time>/trace/ holds one raw little endian file per column, so the files can be memory mapped without parsing:
+  positions.player  uint32   player id
+  positions.time    float64  simulated seconds since the trace was opened
+  positions.x/.y    float32  position on the map
+  nav.player        uint32   route updates (the rows of NavHistory.csv)
+  nav.time          float64
+  nav.reason        uint8    index into meta.json "reasons"
+  nav.waypoint      int32    current waypoint, -1 if none
+  nav.offsets       int64    route i is nav.route[offsets[i]:offsets[i + 1]], one more entry than there are updates
+  nav.route         int32    node ids of all updated routes, back to back
+meta.json lists the dtypes, the reasons and the rows written so far.
+Rows are collected in fixed size chunks that the writer thread appends to the files.
+'''
+
+TRACE_CHUNK_ROWS = 65536 # position rows per chunk handed to the writer thread
+NAV_CHUNK_ROWS = 4096 # route updates per chunk
+POSITION_COLUMNS = {'player': '<u4', 'time': '<f8', 'x': '<f4', 'y': '<f4'}
+NAV_COLUMNS = {'player': '<u4', 'time': '<f8', 'reason': 'u1', 'waypoint': '<i4', 'offsets': '<i8', 'route': '<i4'}
+
+
+class TraceWriter(BackgroundWriter):
+    """Writes the binary trace of one run, see the module description. Positions are logged like with PositionWriter."""
+    def __init__(self, directory, clock):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.clock = clock
+        self.start_ticks = clock.get_ticks()
+        self.reasons = [] # reason names, their index is the code in nav.reason
+        self.reason_codes = {}
+        self.files = {}
+        for table, columns in (('positions', POSITION_COLUMNS), ('nav', NAV_COLUMNS)):
+            for name in columns:
+                self.files[f'{table}.{name}'] = open(os.path.join(directory, f'{table}.{name}'), 'wb')
+        self.position_rows = 0
+        self.nav_rows = 0
+        self.route_length = 0
+        self.new_position_chunk()
+        self.new_nav_chunk()
+        super().__init__(directory)
+        self.Write({'nav.offsets': np.zeros(1, dtype=NAV_COLUMNS['offsets'])})
+        self.write_meta()
+
+    def new_position_chunk(self):
+        self.chunk = {name: np.empty(TRACE_CHUNK_ROWS, dtype=dtype) for name, dtype in POSITION_COLUMNS.items()}
+        self.chunk_rows = 0
+
+    def new_nav_chunk(self):
+        self.nav_chunk = {name: [] for name in NAV_COLUMNS}
+
+    def time(self) -> float:
+        return (self.clock.get_ticks() - self.start_ticks) / 1000
+
+    def LogFrame(self, player_ids, xs, ys):
+        """Logs the positions of several players (arrays) at the current time."""
+        time = self.time()
+        start = 0
+        while start < len(player_ids):
+            count = min(len(player_ids) - start, TRACE_CHUNK_ROWS - self.chunk_rows)
+            rows = slice(self.chunk_rows, self.chunk_rows + count)
+            self.chunk['player'][rows] = player_ids[start:start + count]
+            self.chunk['time'][rows] = time
+            self.chunk['x'][rows] = xs[start:start + count]
+            self.chunk['y'][rows] = ys[start:start + count]
+            self.chunk_rows += count
+            start += count
+            if self.chunk_rows == TRACE_CHUNK_ROWS:
+                self.send_positions()
+
+    def LogRow(self, player_id, x, y, time=None):
+        """Logs the position of one player at the current time. Rows with a time (datetime) were logged before the
+        trace was opened, they are at time 0."""
+        i = self.chunk_rows
+        self.chunk['player'][i] = player_id
+        self.chunk['time'][i] = self.time() if time is None else 0
+        self.chunk['x'][i] = x
+        self.chunk['y'][i] = y
+        self.chunk_rows += 1
+        if self.chunk_rows == TRACE_CHUNK_ROWS:
+            self.send_positions()
+
+    def LogRoute(self, player_id, reason, current_waypoint, route, time=None):
+        """Logs a route update (a NavHistory entry) at the current time, or at time (seconds since the trace was opened)."""
+        code = self.reason_codes.get(reason)
+        if code is None:
+            code = self.reason_codes[reason] = len(self.reasons)
+            self.reasons.append(reason)
+            self.write_meta()
+        self.route_length += len(route)
+        chunk = self.nav_chunk
+        chunk['player'].append(player_id)
+        chunk['time'].append(self.time() if time is None else time)
+        chunk['reason'].append(code)
+        chunk['waypoint'].append(-1 if current_waypoint is None else current_waypoint)
+        chunk['offsets'].append(self.route_length)
+        chunk['route'].extend(route)
+        if len(chunk['player']) >= NAV_CHUNK_ROWS:
+            self.send_nav()
+
+    def send_positions(self):
+        if self.chunk_rows:
+            self.Write({f'positions.{name}': column[:self.chunk_rows] for name, column in self.chunk.items()})
+            self.position_rows += self.chunk_rows
+            self.new_position_chunk()
+
+    def send_nav(self):
+        if self.nav_chunk['player']:
+            self.nav_rows += len(self.nav_chunk['player'])
+            self.Write({f'nav.{name}': np.array(values, dtype=NAV_COLUMNS[name]) for name, values in self.nav_chunk.items()})
+            self.new_nav_chunk()
+
+    def send_pending(self):
+        self.send_positions()
+        self.send_nav()
+
+    def write_meta(self, complete=False):
+        meta = {
+            'positions': {'columns': POSITION_COLUMNS, 'rows': self.position_rows},
+            'nav': {'columns': NAV_COLUMNS, 'rows': self.nav_rows},
+            'reasons': self.reasons,
+            'complete': complete,
+        }
+        with open(os.path.join(self.directory, 'meta.json'), 'w') as file:
+            json.dump(meta, file, indent=2)
+
+    def write_batch(self, columns):
+        for name, values in columns.items():
+            values.tofile(self.files[name])
+
+    def flush_files(self):
+        for file in self.files.values():
+            file.flush()
+
+    def close_files(self):
+        for file in self.files.values():
+            file.close()
+
+    def Close(self):
+        super().Close()
+        self.write_meta(complete=True)
+
+
+class Trace:
+    """A trace loaded with LoadTrace. positions and nav map column names to read-only arrays."""
+    def __init__(self, directory, meta, positions, nav):
+        self.directory = directory
+        self.meta = meta
+        self.reasons = meta['reasons']
+        self.positions = positions
+        self.nav = nav
+
+    def Route(self, i) -> np.ndarray:
+        """Updated route of route update i."""
+        offsets = self.nav['offsets']
+        return self.nav['route'][offsets[i]:offsets[i + 1]]
+
+    def PlayerPositions(self, player_id) -> dict:
+        """Position rows of one player."""
+        rows = self.positions['player'] == player_id
+        return {name: column[rows] for name, column in self.positions.items()}
+
+    def SaveNpz(self, path):
+        np.savez(path, **{f'positions_{name}': column for name, column in self.positions.items()},
+                 **{f'nav_{name}': column for name, column in self.nav.items()},
+                 reasons=np.array(self.reasons))
+
+
+def map_column(path, dtype) -> np.ndarray:
+    dtype = np.dtype(dtype)
+    rows = os.path.getsize(path) // dtype.itemsize
+    if rows == 0:
+        return np.empty(0, dtype=dtype) # np.memmap refuses empty files
+    return np.memmap(path, dtype=dtype, mode='r', shape=(rows,))
+
+
+def LoadTrace(directory) -> Trace:
+    """Memory maps the columns of a trace. A trace that was not closed is cut to the rows that are complete in every column."""
+    with open(os.path.join(directory, 'meta.json')) as file:
+        meta = json.load(file)
+    positions, nav = ({name: map_column(os.path.join(directory, f'{table}.{name}'), dtype)
+                       for name, dtype in meta[table]['columns'].items()} for table in ('positions', 'nav'))
+
+    rows = min(len(column) for column in positions.values())
+    positions = {name: column[:rows] for name, column in positions.items()}
+    rows = min(min(len(nav[name]) for name in ('player', 'time', 'reason', 'waypoint')), max(len(nav['offsets']) - 1, 0))
+    for name in ('player', 'time', 'reason', 'waypoint'):
+        nav[name] = nav[name][:rows]
+    nav['offsets'] = nav['offsets'][:rows + 1]
+    nav['route'] = nav['route'][:int(nav['offsets'][-1]) if len(nav['offsets']) else 0]
+    return Trace(directory, meta, positions, nav)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Summarize binary traces (logs/<time>/trace) and convert them to .npz.")
+    parser.add_argument('traces', nargs='+', help="trace directories")
+    parser.add_argument('--npz', help="write the trace to this .npz file (only with one trace)")
+    args = parser.parse_args(argv)
+    if args.npz and len(args.traces) != 1:
+        print("Error: --npz needs exactly one trace")
+        exit(1)
+
+    for directory in args.traces:
+        trace = LoadTrace(directory)
+        positions = trace.positions
+        duration = float(positions['time'].max()) if len(positions['time']) else 0
+        print(f"{directory}: {len(positions['player'])} positions over {duration:.1f} sec, "
+              f"{len(trace.nav['player'])} route updates ({len(trace.nav['route'])} nodes)"
+              f"{'' if trace.meta['complete'] else ', not closed'}")
+        if args.npz:
+            trace.SaveNpz(args.npz)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
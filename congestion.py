@@ -36,7 +36,7 @@ def LoadCongestionInfo(json_path, GV):
             congestion_value = max(0.00001, congestion_value)
             congestion_uuid = str(uuid.uuid4())  # Generate a unique UUID
             congestions.append(Congestion(congestion_uuid, a, b, congestion_value, GV))
-            congestion_map[(a,b)] = congestion_value
+            congestion_map[GV.GetEdgeId(a, b)] = congestion_value
         for (a, b), congestion_weight in data["congestion_weights"]:
             if (a > b) or (a < 0):
                 print(f"Invalid connection weight: (a, b].")
@@ -50,7 +50,5 @@ def LoadCongestionInfo(json_path, GV):
             for i in range(a, b):
                 player_congestion_map[i] = player_congestion
         GV.EnableColorCongestion(data["color_enabled"])
-    GV.InitCongestionMap(congestion_map)
-    GV.InitCongestionWeightMap(congestion_weights_map)
-    GV.InitPlayerCongestionMap(player_congestion_map)
+    GV.InitCongestionMaps(congestion_map, congestion_weights_map, player_congestion_map)
     return congestions
\ No newline at end of file
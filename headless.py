@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import argparse
+import asyncio
+from datetime import datetime
+import main as simulator
+from SimClock import SimClock, TICK_MS
+from EventScheduler import EventScheduler
+from logger import logger, stop_logger, event_fields
+
+DEFAULT_MAX_SECONDS = 3600 # simulated seconds before an unfinished run is stopped
+ENGINES = ('frame', 'event')
+
+
+def UniqueRunName() -> str:
+    '''logs/<time> directory name that is not taken yet. Several headless runs can start within the same second.'''
+    name = datetime.now().strftime("%m%d_%H%M%S")
+    candidate = name
+    i = 1
+    while os.path.exists(os.path.join('logs', candidate)):
+        candidate = f"{name}_{i}"
+        i += 1
+    return candidate
+
+
+async def RunHeadless(setup_path=None, max_seconds=DEFAULT_MAX_SECONDS, tick_ms=TICK_MS, engine='frame', trace=False,
+                      log_console=True, log_events=False) -> 'simulator.GameManager':
+    '''
+    Runs one game without a display on a simulated clock, as fast as the CPU allows.
+    engine 'frame': every call of UpdatePlayers is one 60 fps frame of the GUI. Between frames the clock is advanced by tick_ms,
+    which wakes up time lagged reports and ends report time penalties once their simulated time has passed.
+    engine 'event': the EventScheduler jumps from one player event to the next instead of updating every player every frame.
+    Writes the same logs/<time>/ files as the GUI. trace: positions and route updates go to a binary trace (see Trace.py) instead of Position.csv.
+    log_console: echo the log to the terminal. log_events: also write the log records as JSON lines to events.jsonl.
+    '''
+    clock = SimClock()
+    game_manager = simulator.GameManager(headless=True, clock=clock, setup_path=setup_path, trace=trace,
+                                         log_console=log_console, log_events=log_events)
+    game_manager.time_started = UniqueRunName()
+    game_manager.InitCongestions()
+    game_manager.InitGenerator()
+    game_manager.InitPlayers()
+    game_manager.InitRoadblocks()
+    game_manager.StartGame()
+
+    max_ms = max_seconds * 1000
+    if engine == 'event':
+        scheduler = EventScheduler(game_manager, clock, tick_ms)
+        await scheduler.Run(int(max_ms / tick_ms))
+        game_manager.time = clock.get_ticks()
+    else:
+        frame = 0
+        while game_manager.running and clock.ticks < max_ms:
+            await game_manager.UpdatePlayers()
+            frame += 1
+            clock.advance_to(frame * tick_ms)
+            game_manager.time = clock.get_ticks()
+            # let reports whose time lag just ended finish before the next frame
+            await asyncio.sleep(0)
+
+    if game_manager.running:
+        logger.info("Stopping run after %s simulated seconds with unfinished players", max_seconds, extra=event_fields('stop'))
+        game_manager.running = False
+        game_manager.save_csv_files()
+
+    for player in game_manager.players:
+        await player.cancel_all_tasks()
+    game_manager.player_state.ClosePositionLog()
+    stop_logger()
+    return game_manager
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Run the simulator without a display on a simulated clock.")
+    parser.add_argument('setups', nargs='*', default=[simulator.SETUP_PATH], help="Setup.json files, one run each (default: %(default)s)")
+    parser.add_argument('-n', '--repeat', type=int, default=1, help="number of runs per setup file")
+    parser.add_argument('--max-seconds', type=float, default=DEFAULT_MAX_SECONDS, help="simulated seconds before a run is stopped")
+    parser.add_argument('--tick-ms', type=float, default=TICK_MS, help="simulated milliseconds per frame")
+    parser.add_argument('--engine', choices=ENGINES, default='frame', help="'frame' updates every player every frame, 'event' only runs players when something happens")
+    parser.add_argument('--trace', action='store_true', help="write positions and route updates to logs/<time>/trace/ (binary, see Trace.py) instead of Position.csv")
+    parser.add_argument('-q', '--quiet', action='store_true', help="do not echo the log to the terminal (console.log is still written)")
+    parser.add_argument('--events', action='store_true', help="also write the log as JSON lines (event, player, edge, sim_time) to events.jsonl")
+    args = parser.parse_args(argv)
+
+    for setup_path in args.setups:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            game_manager = asyncio.run(RunHeadless(setup_path, args.max_seconds, args.tick_ms, args.engine, args.trace,
+                                                         not args.quiet, args.events))
+            print(f"{setup_path} -> logs/{game_manager.time_started}: "
+                  f"{game_manager.num_completed} completed, {game_manager.num_failed} failed of {game_manager.num_players} "
+                  f"in {game_manager.time / 1000:.1f} simulated sec ({time.perf_counter() - start:.2f} sec)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,38 +1,110 @@
+import copy
+import json
+import queue
 import logging
+import logging.handlers
+from collections.abc import Collection
 
 # Initialize main logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-current_file_handler = None
-current_console_handler = None
-
-def setup_logger(log_file_path):
-    """Configures the logger to write to both terminal and a log file."""
-    global logger, current_file_handler, current_console_handler
-
-    # Remove existing handlers if they exist
-    if current_file_handler:
-        logger.removeHandler(current_file_handler)
-        current_file_handler.close()
-    if current_console_handler:
-        logger.removeHandler(current_console_handler)
-
-    # Create and configure file handler
-    current_file_handler = logging.FileHandler(log_file_path)
-    file_formatter = logging.Formatter(
-        fmt='%(asctime)s.%(msecs)03d - %(message)s',
-        datefmt='%H:%M:%S'
-    )
-    current_file_handler.setFormatter(file_formatter)
-    current_file_handler.setLevel(logging.INFO)
-
-    if not any(isinstance(h, logging.StreamHandler) for h in logger.handlers):
-        current_console_handler = logging.StreamHandler()
-        current_console_handler.setFormatter(file_formatter)
-        current_console_handler.setLevel(logging.INFO)
-        logger.addHandler(current_console_handler)
-
-    logger.addHandler(current_file_handler)
-
-    return logger
\ No newline at end of file
+current_queue_handler = None
+current_listener = None
+
+LOG_FORMAT = '%(asctime)s.%(msecs)03d - %(message)s'
+LOG_DATEFMT = '%H:%M:%S'
+
+
+def event_fields(event, player=None, edge=None) -> dict:
+    """Structured fields of a log record, pass as extra=: the event type, the player and the edge (id) it is about.
+    The simulated time (sim_time, seconds) is added by ClockFilter."""
+    return {'event': event, 'player': player, 'edge': edge}
+
+
+class ClockFilter(logging.Filter):
+    """Stamps records with the time of a simulation clock (see SimClock.py) instead of the wall clock."""
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def filter(self, record):
+        record.created = self.clock.timestamp()
+        record.msecs = (record.created - int(record.created)) * 1000
+        record.sim_time = self.clock.get_ticks() / 1000
+        return True
+
+
+def snapshot(arg):
+    """Shallow copy of a collection argument, strings, bytes and other values are returned as they are."""
+    if isinstance(arg, Collection) and not isinstance(arg, (str, bytes)):
+        return copy.copy(arg)
+    return arg
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the QueueListener thread without formatting them, that is done by the handlers there.
+    Collections in the arguments (route deques, lists, dicts) are copied since the simulation keeps changing them.
+    The copies keep their type, so they are formatted the same."""
+    def prepare(self, record):
+        if record.args and isinstance(record.args, tuple):
+            record.args = tuple(snapshot(arg) for arg in record.args)
+        return record
+
+
+class EventFormatter(logging.Formatter):
+    """One JSON object per record with its structured fields, for events.jsonl."""
+    def format(self, record):
+        return json.dumps({
+            'sim_time': getattr(record, 'sim_time', None),
+            'event': getattr(record, 'event', None),
+            'player': getattr(record, 'player', None),
+            'edge': getattr(record, 'edge', None),
+            'message': record.getMessage(),
+        })
+
+
+def setup_logger(log_file_path, clock=None, console=True, events_path=None):
+    """Configures the logger to write to a log file and, if console, the terminal. events_path: also write the
+    structured records as JSON lines. If a clock is given, log times are taken from it so they match the timestamps
+    in the other logs.
+    Logging calls only queue the record, the formatting and writing happens on a QueueListener thread."""
+    global current_queue_handler, current_listener
+
+    stop_logger()
+
+    formatter = logging.Formatter(fmt=LOG_FORMAT, datefmt=LOG_DATEFMT)
+    handlers = [logging.FileHandler(log_file_path)]
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    if events_path is not None:
+        events_handler = logging.FileHandler(events_path)
+        events_handler.setFormatter(EventFormatter())
+        handlers.append(events_handler)
+
+    log_queue = queue.SimpleQueue()
+    current_queue_handler = LazyQueueHandler(log_queue)
+    current_queue_handler.setLevel(logging.INFO)
+    # The time has to be taken when the record is made, not when the listener gets to it
+    if clock is not None:
+        current_queue_handler.addFilter(ClockFilter(clock))
+    current_listener = logging.handlers.QueueListener(log_queue, *handlers)
+    current_listener.start()
+    logger.addHandler(current_queue_handler)
+
+    return logger
+
+
+def stop_logger():
+    """Writes the queued records and closes the log files."""
+    global current_queue_handler, current_listener
+    if current_queue_handler is not None:
+        logger.removeHandler(current_queue_handler)
+        current_queue_handler = None
+    if current_listener is not None:
+        current_listener.stop()
+        for handler in current_listener.handlers:
+            handler.close()
+        current_listener = None
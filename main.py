@@ -5,21 +5,24 @@ from GraphVisualizer import GraphVisualizer
 from GameGenerator import GameGenerator
 from settings_utils import merge_settings, process_settings, load_settings
 from player import LoadPlayerInfo, Player
+from PlayerState import PlayerStateStore
+from PositionWriter import PositionWriter
+from Trace import TraceWriter
 from roadblock import LoadRoadblockInfo, Roadblock
 from congestion import LoadCongestionInfo
-from ReportManager import ReportManager
-from logger import logger, setup_logger
+from ReportManager import ReportManager, REPORT_PANEL_ROWS
+from SimClock import SimClock, TICK_MS
+from logger import logger, setup_logger, stop_logger, event_fields
 
 import asyncio
+from collections import deque
 import os
+import time
 import cProfile
 
 
-pygame.init()
-
 # Screen dimensions
 SCREEN_WIDTH, SCREEN_HEIGHT = 1400, 800
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 
 # Colors
 WHITE = (255, 255, 255)
@@ -47,6 +50,11 @@ MAP_HEIGHT = SCREEN_HEIGHT
 
 # Game clock
 clock = pygame.time.Clock()
+RENDER_FPS = 60
+TIME_MULTIPLIERS = (1, 4, 16, None) # simulated time per wall clock time, None runs as many ticks as fit in a frame
+MAX_FRAME_SIM_MS = 1000 / 30 # wall clock time the simulation may take per rendered frame
+ZOOM_STEP = 1.25 # zoom factor of one mouse wheel step or +/- key
+PAN_STEP = 50 # px the arrow keys move the map
 
 GRAPH_FILE_PATH = "src/ext/map.json"
 START_END_PATH = "src/ext/start_end_indices.json"
@@ -57,10 +65,47 @@ CONGESTION_PATH = "src/ext/congestion.json"
 
 
 class GameManager:
-    def __init__(self):
+    def __init__(self, headless=False, clock=None, setup_path=None, trace=False, log_console=True, log_events=False):
+        '''headless: skip the display, images and buttons (see headless.py). clock: SimClock the game runs on, a new one if None.
+        trace: write positions and route updates to a binary trace (see Trace.py) instead of Position.csv.
+        log_console: echo the log to the terminal. log_events: also write the log records as JSON lines to events.jsonl.'''
+        self.headless = headless
+        self.setup_path = setup_path
+        self.trace = trace
+        self.log_console = log_console
+        self.log_events = log_events
+        # The display has to exist before GraphVisualizer loads its images
+        if not headless:
+            self.InitDisplay()
+
         self.RM = ReportManager()
-        self.GV = GraphVisualizer(GRAPH_FILE_PATH, self.RM)
+        self.GV = GraphVisualizer(GRAPH_FILE_PATH, self.RM, clock if clock is not None else SimClock(), headless)
+
+        # Initialize game state
+        self.running = False
+        self.time = 0 # simulated ms since the game started
+        self.time_multiplier = TIME_MULTIPLIERS[0]
+        self.sim_lag = 0 # simulated ms that are due but not run yet, see SimulateFrame
+        self.clock = pygame.time.Clock()
 
+        # Game Related information
+        self.num_players = 0
+        self.num_completed = 0
+        self.num_failed = 0
+        self.time_started = datetime.now().strftime("%m%d_%H%M%S")
+
+        self.selected_player: Player | None = None
+
+        self.scroll_y = 0
+        self.scroll_speed = 15
+        self.can_scroll = False
+        self.report_rows = deque(maxlen=REPORT_PANEL_ROWS) # rendered text of RM.Reports
+        self.rendered_reports = 0 # RM.report_count when report_rows was last updated
+
+        self.next_report_y = 25
+
+    def InitDisplay(self):
+        pygame.init()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("Simulator")
 
@@ -80,28 +125,15 @@ class GameManager:
         self.play_button_rect = self.images['play'].get_rect(topleft=(10, 10))
         self.pause_button_rect = self.images['pause'].get_rect(topleft=(70, 10))
         self.stop_button_rect = self.images['stop'].get_rect(topleft=(130, 10))
+        self.speed_button_rect = pygame.Rect(190, 10, 100, 50)
 
-        # Initialize game state
-        self.running = False
-        self.time = 0
-        self.clock = pygame.time.Clock()
-
-        # Game Related information
-        self.num_players = 0
-        self.num_completed = 0
-        self.num_failed = 0
-        self.time_started = datetime.now().strftime("%m%d_%H%M%S")
-
-        self.selected_player: Player | None = None
-
-        self.scroll_y = 0
-        self.scroll_speed = 15
-        self.can_scroll = False
-
-        self.next_report_y = 25
+        padding = 10
+        self.map_rect = pygame.Rect(MAP_X + padding, MAP_Y + padding, MAP_WIDTH - 2 * padding, MAP_HEIGHT - 2 * padding)
+        self.panning = False # the map is dragged with the right mouse button
 
     def InitGenerator(self):
-        self.Generator = SetupGenerator()
+        self.Generator = SetupGenerator(self.setup_path)
+        self.GV.SetRoutingMode(self.Generator.RoutingMode)
 
     def ResetGenerator(self):
         self.Generator = None 
@@ -109,10 +141,13 @@ class GameManager:
     
     def InitPlayers(self):
         self.players = []
-        self.players = LoadPlayerInfo(START_END_PATH, self.time_started, self.GV, self.Generator)
+        self.player_state = PlayerStateStore(self.GV)
+        self.players = LoadPlayerInfo(START_END_PATH, self.time_started, self.GV, self.Generator, self.player_state)
 
         # add self.players to GV
         self.GV.InitPlayerReferences(self.players)
+        # compute the navigation trees for every destination up front
+        self.GV.route_trees.Prepare(player.end for player in self.players)
 
         
         self.num_players = len(self.players)
@@ -121,22 +156,51 @@ class GameManager:
         
     async def UpdatePlayers(self):
         """Update players' status and move finished/failed players to their respective lists."""
-        self.finished_players = [player for player in self.players if player.finished]
-        self.failed_players = [player for player in self.players if player.failed]
-        unfinished_players = [player for player in self.players if not player.finished and not player.failed]
-
-        # Gather all player updates
-        await asyncio.gather(*[player.update() for player in unfinished_players])
+        # Players that only move along their edge are advanced together, the others run Player.update
+        decided_players = await self.player_state.Update()
+        # let reports created during this frame start their time lag now instead of after the next clock step
+        await asyncio.sleep(0)
 
         # Check for finished or failed players after updates
-        for player in unfinished_players:
-            if player.finished:
-                self.num_completed += 1
-                self.finished_players.append(player)
-            elif player.failed:
-                self.num_failed += 1
-                self.failed_players.append(player)
-        
+        for player in decided_players:
+            self.RecordPlayerResult(player)
+        self.CheckGameOver()
+
+    async def SimulateTick(self):
+        '''One step of the simulation: updates the players, then moves the clock on by TICK_MS, like a headless frame.'''
+        await self.UpdatePlayers()
+        self.GV.clock.advance(TICK_MS)
+        self.time += TICK_MS
+        # let reports whose time lag just ended finish before the next tick
+        await asyncio.sleep(0)
+
+    async def SimulateFrame(self, frame_ms):
+        '''Runs the ticks that became due during a rendered frame of frame_ms wall clock ms at the time multiplier.
+        Every tick is TICK_MS of simulated time whatever the frame rate or multiplier, so they do not change the results.
+        Ticks that do not fit in MAX_FRAME_SIM_MS are dropped, the simulation then runs slower than asked.'''
+        if self.time_multiplier is None:
+            self.sim_lag = float('inf')
+        else:
+            self.sim_lag += frame_ms * self.time_multiplier
+        start = time.perf_counter()
+        while self.running and self.sim_lag >= TICK_MS:
+            await self.SimulateTick()
+            self.sim_lag -= TICK_MS
+            if (time.perf_counter() - start) * 1000 >= MAX_FRAME_SIM_MS:
+                break
+        self.sim_lag = min(self.sim_lag, TICK_MS)
+
+    def RecordPlayerResult(self, player):
+        '''Counts a player that just finished or failed.'''
+        if player.finished:
+            self.num_completed += 1
+            self.finished_players.append(player)
+        elif player.failed:
+            self.num_failed += 1
+            self.failed_players.append(player)
+
+    def CheckGameOver(self):
+        '''Stops the game and saves the logs once every player finished or failed.'''
         if len(self.finished_players) + len(self.failed_players) == self.num_players and self.running:
             self.running = False
             self.save_csv_files()
@@ -149,9 +213,37 @@ class GameManager:
         self.finished_players.clear()
         self.failed_players.clear()
         self.num_players = 0
+        self.player_state.ClosePositionLog()
         self.players.clear()
         self.InitPlayers()
 
+    def StartGame(self):
+        '''Starts logging to logs/<time_started>/ and lets the players move.'''
+        self.running = True
+
+        # Set up logger for the game, replacing the one of the previous game
+        directory = os.path.join('logs', self.time_started)
+        os.makedirs(directory, exist_ok=True)
+
+        log_file_name = 'console.log'
+        log_file_path = os.path.join(directory, log_file_name)
+        events_path = os.path.join(directory, 'events.jsonl') if self.log_events else None
+        setup_logger(log_file_path, self.GV.clock, self.log_console, events_path)
+        # A resumed game keeps writing to the log it started
+        if self.player_state.position_log is None:
+            self.player_state.StartPositionLog(self.OpenPositionLog(directory))
+
+        for player in self.players:
+            player.start_game()
+
+    def OpenPositionLog(self, directory):
+        '''Position.csv, or the binary trace that also gets the NavHistory entries.'''
+        if not self.trace:
+            return PositionWriter(os.path.join(directory, 'Position.csv'), self.GV.clock)
+        trace = TraceWriter(os.path.join(directory, 'trace'), self.GV.clock)
+        self.Generator.StartNavTrace(trace)
+        return trace
+
     def get_clicked_player(self, mouse_pos) -> Player:
         for player in self.players:
             player_pos = player.pos
@@ -186,6 +278,11 @@ class GameManager:
         self.screen.blit(self.images['pause'], self.pause_button_rect)
         self.screen.blit(self.images['stop'], self.stop_button_rect)
 
+        pygame.draw.rect(self.screen, GRAY, self.speed_button_rect)
+        speed = f"{self.time_multiplier}x" if self.time_multiplier is not None else "max"
+        speed_text = FONT.render(f"Speed: {speed}", True, BLACK)
+        self.screen.blit(speed_text, speed_text.get_rect(center=self.speed_button_rect.center))
+
     def draw_status_panel(self):
         margin = 10
         padding = 10
@@ -196,7 +293,7 @@ class GameManager:
         outer_width = (HISTORY_PANEL_WIDTH/ 2) - 2 * margin
         outer_height = STATUS_PANEL_HEIGHT - 2 * margin
 
-        pygame.draw.rect(screen, GRAY, (outer_x, outer_y, outer_width, outer_height))
+        pygame.draw.rect(self.screen, GRAY, (outer_x, outer_y, outer_width, outer_height))
 
         text_x = outer_x + padding
         text_y = outer_y + half_padding
@@ -204,10 +301,22 @@ class GameManager:
         status_text = FONT.render("Status:", True, BLACK)
         completed_text = FONT.render(f"Number of people completed: {self.num_completed}/{self.num_players}", True, BLACK)
 
-        screen.blit(status_text, (text_x, text_y))
-        screen.blit(completed_text, (text_x, text_y + 50))
+        self.screen.blit(status_text, (text_x, text_y))
+        self.screen.blit(completed_text, (text_x, text_y + 50))
+
+    def update_report_rows(self):
+        """Renders the reports added since the last frame, each report is rendered once."""
+        if self.rendered_reports > self.RM.report_count:
+            # the reports were reset
+            self.report_rows.clear()
+            self.rendered_reports = 0
+        new_reports = min(self.RM.report_count - self.rendered_reports, len(self.RM.Reports))
+        for i in range(len(self.RM.Reports) - new_reports, len(self.RM.Reports)):
+            self.report_rows.append(FONT.render(self.RM.Reports[i], True, BLACK))
+        self.rendered_reports = self.RM.report_count
 
     def draw_report_history(self):
+        """Draws the Report History panel. Only the rows within the panel at the current scroll position are drawn."""
         margin = 10
         padding = 10
         outer_x = margin
@@ -215,30 +324,32 @@ class GameManager:
         outer_width = HISTORY_PANEL_WIDTH - 2 * margin
         outer_height = SCREEN_HEIGHT - 180 - 2 * margin
 
-        pygame.draw.rect(screen, GRAY, (outer_x, outer_y, outer_width, outer_height))
+        pygame.draw.rect(self.screen, GRAY, (outer_x, outer_y, outer_width, outer_height))
 
         title_text = TITLE_FONT.render("Report History", True, BLACK)
         title_height = title_text.get_height()
 
-        reports_height = len(self.RM.Reports) * self.RM.report_spacing
+        self.update_report_rows()
+        spacing = self.RM.report_spacing
+        reports_height = len(self.report_rows) * spacing
         self.RM.content_height = title_height + 10 + reports_height + 2 * padding
 
         self.can_scroll = self.RM.content_height > outer_height
 
-        content_surface = pygame.Surface((outer_width, self.RM.content_height))
-        content_surface.fill(GRAY)
+        # Content y coordinates are shifted by scroll_y and cut to the panel
+        content_y = outer_y + self.scroll_y
+        clip = self.screen.get_clip()
+        self.screen.set_clip(pygame.Rect(outer_x, outer_y, outer_width, outer_height).clip(clip))
 
-        content_surface.blit(title_text, (padding, padding))
+        self.screen.blit(title_text, (outer_x + padding, content_y + padding))
 
-        text_y = padding + title_height + 10
-        for report in self.RM.Reports:
-            text = FONT.render(report, True, BLACK)
-            content_surface.blit(text, (padding, text_y))
-            text_y += self.RM.report_spacing
+        rows_y = content_y + padding + title_height + 10
+        first = max(0, (outer_y - rows_y) // spacing)
+        last = min(len(self.report_rows), (outer_y + outer_height - rows_y) // spacing + 1)
+        for i in range(first, last):
+            self.screen.blit(self.report_rows[i], (outer_x + padding, rows_y + i * spacing))
 
-        screen.blit(content_surface, 
-                    (outer_x, outer_y),
-                    (0, -self.scroll_y, outer_width, outer_height))
+        self.screen.set_clip(clip)
 
     def draw_target_player(self):
         '''If a player is picked, it will display information about them.'''
@@ -251,7 +362,7 @@ class GameManager:
         outer_width = (HISTORY_PANEL_WIDTH/ 2) - 2 * margin
         outer_height = (STATUS_PANEL_HEIGHT - 2 * margin) * 2
 
-        pygame.draw.rect(screen, GRAY, (outer_x, outer_y, outer_width, outer_height))
+        pygame.draw.rect(self.screen, GRAY, (outer_x, outer_y, outer_width, outer_height))
 
         text_x = outer_x + padding
         text_y = outer_y + half_padding
@@ -269,17 +380,9 @@ class GameManager:
             # All information for player decisions
             player_data = self.selected_player.Gen.Players[self.selected_player.id]
 
-            next_nav_idx = player_data["follows_navigation_idx"]
-            if next_nav_idx < len(player_data["follows_navigation"]):
-                next_nav_text += f" {player_data['follows_navigation'][next_nav_idx]}"
-
-            next_report_roadblock_idx = player_data["reports_roadblock_if_roadblock_idx"]
-            if next_report_roadblock_idx < len(player_data["reports_roadblock_if_roadblock"]):
-                next_report_roadblock_text += f" {player_data['reports_roadblock_if_roadblock'][next_report_roadblock_idx]}"
-
-            next_report_no_roadblock_idx = player_data["reports_roadblock_no_roadblock_idx"]
-            if next_report_no_roadblock_idx < len(player_data["reports_roadblock_no_roadblock"]):
-                next_report_no_roadblock_text += f" {player_data['reports_roadblock_no_roadblock'][next_report_no_roadblock_idx]}" 
+            next_nav_text += f" {player_data['follows_navigation'].Peek()}"
+            next_report_roadblock_text += f" {player_data['reports_roadblock_if_roadblock'].Peek()}"
+            next_report_no_roadblock_text += f" {player_data['reports_roadblock_no_roadblock'].Peek()}"
 
         follow_player = FONT.render(follow_player_text, True, BLACK)
         player_speed = FONT.render(speed_text, True, BLACK)
@@ -288,32 +391,35 @@ class GameManager:
         next_report_roadblock = FONT.render(next_report_roadblock_text, True, BLACK)
         next_report_no_roadblock = FONT.render(next_report_no_roadblock_text, True, BLACK)
 
-        screen.blit(follow_player, (text_x, text_y))
-        screen.blit(player_speed, (text_x, text_y + 25))
-        screen.blit(dest_node, (text_x, text_y + 50))
-        screen.blit(next_nav, (text_x, text_y + 75))
-        screen.blit(next_report_roadblock, (text_x, text_y + 100))
-        screen.blit(next_report_no_roadblock, (text_x, text_y + 125))
+        self.screen.blit(follow_player, (text_x, text_y))
+        self.screen.blit(player_speed, (text_x, text_y + 25))
+        self.screen.blit(dest_node, (text_x, text_y + 50))
+        self.screen.blit(next_nav, (text_x, text_y + 75))
+        self.screen.blit(next_report_roadblock, (text_x, text_y + 100))
+        self.screen.blit(next_report_no_roadblock, (text_x, text_y + 125))
 
     def draw_map(self):
-        padding = 10
-        map_rect = pygame.Rect(MAP_X + padding, MAP_Y + padding, MAP_WIDTH - 2 * padding, MAP_HEIGHT - 2 * padding)
-        pygame.draw.rect(screen, BROWN, map_rect)
+        map_rect = self.map_rect
+        pygame.draw.rect(self.screen, BROWN, map_rect)
+        # The whole map reaches a little over the border of map_rect, zoomed in or moved it is cut there
+        if self.GV.camera_center is None:
+            self.screen.set_clip(pygame.Rect(MAP_X, MAP_Y, MAP_WIDTH, MAP_HEIGHT))
+        else:
+            self.screen.set_clip(map_rect)
         # Add any extra drawing here (Order Matters!)
         if self.selected_player:
-            self.GV.draw_player_path(screen, self.selected_player, map_rect)
-        self.GV.draw_graph(screen, map_rect)
-        self.GV.draw_roadblocks(screen, self.roadblocks, map_rect, self.selected_player)
-        self.GV.draw_players(screen, self.players, map_rect)
+            self.GV.draw_player_path(self.screen, self.selected_player, map_rect)
+        self.GV.draw_graph(self.screen, map_rect)
+        self.GV.draw_roadblocks(self.screen, self.roadblocks, map_rect, self.selected_player)
+        self.GV.draw_players(self.screen, self.players, map_rect)
+        self.screen.set_clip(None)
 
     def draw_timer(self):
-        if self.running:
-            self.time += clock.get_time()  # Add time for each frame when running
-
-        timer_text = FONT.render(f"Time: {self.time // 1000} sec", True, BLACK)
-        screen.blit(timer_text, (20, 120))
+        timer_text = FONT.render(f"Time: {int(self.time // 1000)} sec", True, BLACK)
+        self.screen.blit(timer_text, (20, 120))
 
     def save_csv_files(self):
+        self.player_state.FlushPositions()
         self.Generator.SaveDecisionCsv(self.time_started)
         self.Generator.SaveSetupCsv(self.time_started)
         self.Generator.SaveCongestion(self.time_started, self.congestions, self.GV)
@@ -321,6 +427,7 @@ class GameManager:
 
         self.Generator.SaveNavHistory(self.time_started)
         self.RM.SaveReportHistory(self.time_started, self.GV.roadblock_map, self.GV.fake_roadblock_map)
+        logger.info("Route cache stats: %s", self.GV.route_cache.stats(), extra=event_fields('cache_stats'))
 
     async def handle_events(self):
         margin = 10
@@ -328,12 +435,45 @@ class GameManager:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return False
+            if event.type == pygame.KEYDOWN:
+                # Keys 1-4 select the time multiplier
+                if pygame.K_1 <= event.key < pygame.K_1 + len(TIME_MULTIPLIERS):
+                    self.time_multiplier = TIME_MULTIPLIERS[event.key - pygame.K_1]
+                # Arrow keys move the map, +/- zoom, Home shows the whole map
+                elif event.key == pygame.K_LEFT:
+                    self.GV.PanMap(PAN_STEP, 0)
+                elif event.key == pygame.K_RIGHT:
+                    self.GV.PanMap(-PAN_STEP, 0)
+                elif event.key == pygame.K_UP:
+                    self.GV.PanMap(0, PAN_STEP)
+                elif event.key == pygame.K_DOWN:
+                    self.GV.PanMap(0, -PAN_STEP)
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    self.GV.ZoomMap(ZOOM_STEP)
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    self.GV.ZoomMap(1 / ZOOM_STEP)
+                elif event.key == pygame.K_HOME:
+                    self.GV.ResetCamera()
+            if event.type == pygame.MOUSEBUTTONUP and event.button == 3:
+                self.panning = False
+            if event.type == pygame.MOUSEMOTION and self.panning:
+                self.GV.PanMap(*event.rel)
             # Check for button clicks
             if event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_pos = pygame.mouse.get_pos()
-
-                for rect, player in self.GV.player_rects:
-                    if rect.collidepoint(mouse_pos):
+                mouse_pos = event.pos
+
+                if self.map_rect.collidepoint(mouse_pos):
+                    # the mouse wheel zooms the map, the right button drags it
+                    if event.button in (4, 5):
+                        self.GV.ZoomMap(ZOOM_STEP if event.button == 4 else 1 / ZOOM_STEP, mouse_pos)
+                        continue
+                    if event.button == 3:
+                        self.panning = True
+                        continue
+
+                if event.button == 1:
+                    player = self.GV.PickPlayer(mouse_pos)
+                    if player is not None:
                         if self.selected_player == player:
                             self.selected_player = None
                         else: 
@@ -342,27 +482,13 @@ class GameManager:
 
                 if self.play_button_rect.collidepoint(mouse_pos):
                     if not self.running:
-                        self.running = True
-                        
-                        # Clear previous handlers
-                        for handler in logger.handlers[:]:
-                            logger.removeHandler(handler)
-                            handler.close()
-        
-
-                        # Set up logger for the game
-                        directory = os.path.join('logs', self.time_started)
-                        os.makedirs(directory, exist_ok=True)
-
-                        log_file_name = 'console.log'
-                        log_file_path = os.path.join(directory, log_file_name)
-                        setup_logger(log_file_path)
-
-                        for player in self.players:
-                            player.start_game()
+                        self.StartGame()
 
                 elif self.pause_button_rect.collidepoint(mouse_pos):
                     self.running = False
+                elif self.speed_button_rect.collidepoint(mouse_pos):
+                    i = TIME_MULTIPLIERS.index(self.time_multiplier)
+                    self.time_multiplier = TIME_MULTIPLIERS[(i + 1) % len(TIME_MULTIPLIERS)]
                 elif self.stop_button_rect.collidepoint(mouse_pos):
                     self.save_csv_files()                    
                     
@@ -387,7 +513,7 @@ class GameManager:
     
     
     async def update(self):
-        screen.fill(WHITE)
+        self.screen.fill(WHITE)
         self.draw_buttons()
         self.draw_status_panel()
         self.draw_map()  # needs to be in front of report history for draw order (Black boxes in report history)
@@ -396,13 +522,13 @@ class GameManager:
         self.draw_timer()
 
         if self.running:
-            await self.UpdatePlayers()
+            await self.SimulateFrame(clock.get_time())
 
         return await self.handle_events()
     
 
-def SetupGenerator() -> GameGenerator:
-    settings = merge_settings(SETUP_PATH, DEFAULT_SETUP)
+def SetupGenerator(setup_path=None) -> GameGenerator:
+    settings = merge_settings(setup_path or SETUP_PATH, DEFAULT_SETUP)
     merged_settings = process_settings(settings)
     start_end_json = load_settings(START_END_PATH)
     Generator = GameGenerator(merged_settings, start_end_json)
@@ -424,10 +550,12 @@ async def async_main():
     while playing:
         playing = await game_manager.update()
         pygame.display.flip()
-        clock.tick(60)
+        clock.tick(RENDER_FPS)
 
     profiler.disable()
     profiler.print_stats(sort='cumulative')
+    game_manager.player_state.ClosePositionLog()
+    stop_logger()
 
     pygame.quit()
     sys.exit()
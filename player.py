@@ -1,13 +1,12 @@
 import json
-import pygame
 from Djikstra import Djikstra
+from IncrementalPlanner import IncrementalPlanner
 import math
-import csv
-from datetime import datetime
 import os
 from GameGenerator import GameGenerator
 from GraphVisualizer import GraphVisualizer
-from logger import logger
+from PlayerState import PlayerStateStore
+from logger import logger, event_fields
 
 import asyncio
 
@@ -15,7 +14,7 @@ CHECK_DISTANCE = 0.4 # value must be below 0.5 (for roadblock detection purposes
 MIN_DISTANCE_UNITS = 5 # distance a player travels
 
 class Player:
-    def __init__(self, player_id, start_node, end_node, graph_visualizer : GraphVisualizer, gen : GameGenerator, speed, time):
+    def __init__(self, player_id, start_node, end_node, graph_visualizer : GraphVisualizer, gen : GameGenerator, speed, time, state : PlayerStateStore):
         
         self.id = player_id
         self.start = start_node
@@ -23,6 +22,11 @@ class Player:
         self.GV = graph_visualizer # map_drawer.py
         self.Gen = gen
         self.directory_time = time
+        self.state = state # t and pos are kept in the PlayerStateStore arrays
+        self.speed = speed
+        self.roadblock_spotting_position = CHECK_DISTANCE
+        state.Register(self)
+
         # initialize position to start position
         self.pos = self.get_start_pos()
         self.t = 0 # used for interpolation
@@ -32,16 +36,10 @@ class Player:
         self.failed = False # Indicates when a player cannot progress the game and is in a failed state
         self.moveTimeout = 0 # Duration left of a player timeout (Used for ReportTimePenalty)
 
-        self.speed = speed
-
-        self.position_buffer = []  # Buffer to store position logs
-        self.buffer_size = 100  # Number of logs to batch before writing
-
         self.RoadblockOnPrevRoute = False
         self.CheckedRoadblockOnCurrentRoute = False
         self.ReportIfRoadblock = False
 
-        self.roadblock_spotting_position = CHECK_DISTANCE
         self.min_spotting_distance = MIN_DISTANCE_UNITS
 
         self.traveled_distance = 0
@@ -49,11 +47,13 @@ class Player:
         self.false_roadblocks = set() # personal list of roadblocks that were falsely reported by player
 
         self.curr_node_id = start_node 
+        self._path = None
         self.path = Djikstra(self.curr_node_id, self.end, self.GV)
+        self.planner = None # incremental search used to reroute around reported roadblocks, created on first use
 
-        self.Gen.add_to_nav_history(self.id, datetime.now().strftime('%H:%M:%S.%f'), "Initial", self.curr_node_id, self.path)
+        self.Gen.add_to_nav_history(self.id, self.GV.clock.now().strftime('%H:%M:%S.%f'), "Initial", self.curr_node_id, self.path)
         self.dest_node = self.path[1]
-        self.curr_edge = (self.curr_node_id, self.dest_node)
+        self.curr_edge_id = self.GV.GetEdgeId(self.curr_node_id, self.dest_node)
 
 
         self.is_initial = True
@@ -66,13 +66,8 @@ class Player:
         # set up the directory file
         self.directory_path = os.path.join('logs', self.directory_time)
         os.makedirs(self.directory_path, exist_ok=True)
-
-        self.position_csv = os.path.join(self.directory_path, 'Position.csv')
-        with open(self.position_csv, mode='w', newline='') as file:
-            w = csv.writer(file)
-            w.writerow(['Player', 'Time', 'posX', 'posY'])
             
-        logger.info(f"player {self.id} started at {self.start}")
+        logger.info("player %s started at %s", self.id, self.start, extra=event_fields('start', self.id))
         
     def __repr__(self):
         return (f"Player(ID: {self.id}, "
@@ -81,6 +76,39 @@ class Player:
                 f"End: {self.end}) "
                 )
     
+    @property
+    def t(self):
+        """Progress (0-1) along the current movement."""
+        return self.state.t.item(self.id)
+
+    @t.setter
+    def t(self, t):
+        self.state.t[self.id] = t
+
+    @property
+    def pos(self):
+        return (self.state.pos_x.item(self.id), self.state.pos_y.item(self.id))
+
+    @pos.setter
+    def pos(self, pos):
+        self.state.pos_x[self.id], self.state.pos_y[self.id] = pos
+
+    @property
+    def path(self):
+        """Remaining route (deque of node ids). Assigning a new path updates GV.route_index, use PopPathNode to shorten it."""
+        return self._path
+
+    @path.setter
+    def path(self, path):
+        self.GV.IndexPlayerRoute(self.id, self._path, path)
+        self._path = path
+
+    def PopPathNode(self):
+        """Removes the node the player left from the front of its path."""
+        node = self._path.popleft()
+        if self._path:
+            self.GV.RemovePlayerRouteEdge(self.id, self.GV.GetEdgeId(node, self._path[0]))
+
     def get_start_pos(self):
         """Get the start position from the GraphVisualizer."""
         return self.GV.get_pos(self.start)
@@ -114,60 +142,25 @@ class Player:
         """Set the current node id of the player."""
         if not self.is_initial:
             if self.curr_node_id == node_id:
-                logger.info(f"Player {self.id} has detoured back to {node_id}")
+                logger.info("Player %s has detoured back to %s", self.id, node_id, extra=event_fields('detour_back', self.id, self.curr_edge_id))
             else:
-                logger.info(f"Player {self.id} has moved to {node_id}")
+                logger.info("Player %s has moved to %s", self.id, node_id, extra=event_fields('move', self.id, self.curr_edge_id))
         self.curr_node_id = node_id
 
     def log_position(self):
-        """Log the current position to a buffer and write to CSV in batches."""
+        """Log the current position to the position log of the PlayerStateStore."""
         pos_x, pos_y = self.pos
-        time = datetime.now().strftime('%H:%M:%S.%f')
-        self.position_buffer.append([self.id, time, pos_x, pos_y])
-
-        if len(self.position_buffer) >= self.buffer_size:
-            self._flush_buffer()
-        
-    def _flush_buffer(self):
-        """Write the buffer to the CSV file and clear the buffer."""
-        with open(self.position_csv, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerows(self.position_buffer)
-        self.position_buffer.clear()
-
-    def __del__(self):
-        """Ensure the buffer is flushed when the Player object is destroyed."""
-        if self.position_buffer:
-            self._flush_buffer()
-
+        self.state.LogPosition(self.id, pos_x, pos_y)
 
     def player_finish(self):
         self.finished = True
         self.curr_node_id = self.end
-        self.GV.ChangePlayerEdgeLocation(None, self.curr_edge)
-        self.Gen.add_to_nav_history(self.id, datetime.now().strftime('%H:%M:%S.%f'), "Finish", self.curr_node_id, self.path)
+        self.GV.ChangePlayerEdgeLocation(None, self.curr_edge_id)
+        self.Gen.add_to_nav_history(self.id, self.GV.clock.now().strftime('%H:%M:%S.%f'), "Finish", self.curr_node_id, self.path)
 
     def player_failed(self):
         self.failed = True
-        self.Gen.add_to_nav_history(self.id, datetime.now().strftime('%H:%M:%S.%f'), "Failed", self.curr_node_id, [])
-    
-    def calculate_direction(self, curr_pos, dest_pos):
-        """Calculate the direction angle from curr_pos to dest_pos."""
-        x1, y1 = curr_pos
-        x2, y2 = dest_pos
-
-        angle_radians = math.atan2(y2 - y1, x2 - x1)
-        angle_degrees = math.degrees(angle_radians)
-        
-        # adjust the angle to be positive
-        rotation_angle = angle_degrees
-        if rotation_angle < 0:
-            rotation_angle += 360
-
-        # Adjust so that the image's 0 degrees is upwards
-        rotation_angle = (450 - rotation_angle) % 360
-        
-        return rotation_angle
+        self.Gen.add_to_nav_history(self.id, self.GV.clock.now().strftime('%H:%M:%S.%f'), "Failed", self.curr_node_id, [])
     
     def SetPlayerPath(self) -> bool:
         '''Returns whether the Player has finished or not'''
@@ -179,9 +172,9 @@ class Player:
             self.CheckedRoadblockOnCurrentRoute = False
             self.traveled_distance = 0  # reset back to zero
 
-            # update curr_edge
-            self.curr_edge = (self.curr_node_id, self.dest_node)
-            self.GV.ChangePlayerEdgeLocation(self.curr_edge, None)
+            # update curr_edge_id
+            self.curr_edge_id = self.GV.GetEdgeId(self.curr_node_id, self.dest_node)
+            self.GV.ChangePlayerEdgeLocation(self.curr_edge_id, None)
 
             return False
         else:
@@ -193,24 +186,25 @@ class Player:
         # Do not add to navHistory if we already reported returning from a roadblock and this is not the initial report
         # Add to navhistory the desired system path (not the deviated self.path)
         if not self.is_initial and not self.RoadblockOnPrevRoute:
-            self.Gen.add_to_nav_history(self.id, datetime.now().strftime('%H:%M:%S.%f'), "Waypoint Reached", self.curr_node_id, self.path)
+            self.Gen.add_to_nav_history(self.id, self.GV.clock.now().strftime('%H:%M:%S.%f'), "Waypoint Reached", self.curr_node_id, self.path)
 
         if self.RoadblockOnPrevRoute and not self.ReportIfRoadblock:
-            logger.info(f"Player {self.id} is deviating due to a non-reported roadblock. Skipping navigation check (p_u).")
+            logger.info("Player %s is deviating due to a non-reported roadblock. Skipping navigation check (p_u).", self.id, extra=event_fields('deviate_roadblock', self.id))
             return
 
         follow_nav = self.Gen.GetNextFollowNavigation(self.id)
         if follow_nav:
             self.deviates = False
             if not self.RoadblockOnPrevRoute: # do not generate a new path if we already have inside of OnPlayerReturnsFromRoadblock
-                self.path = Djikstra(self.curr_node_id, self.end, self.GV, None, None, True)
+                # Navigation route under all reported roadblocks, shared by every player heading to the same end node
+                self.path = self.GV.route_trees.GetPath(self.curr_node_id, self.end)
         else:
-            logger.info(f"Player {self.id} decides to deviate from navigation")
+            logger.info("Player %s decides to deviate from navigation", self.id, extra=event_fields('deviate', self.id))
             # If a player is returning to their origin node (due to roadblock)
             # player will find its own path given its known roadblocks, the path it does not want to take, and will still traverse path that it knows are false roadblocks
             self.deviates = True
-            next_path = (self.curr_node_id, self.path[1]) if (len(self.path) > 1) else None
-            self.path = Djikstra(self.curr_node_id, self.end, self.GV, self.known_roadblocks, {next_path})
+            next_edge = self.GV.GetEdgeId(self.curr_node_id, self.path[1]) if (len(self.path) > 1) else None
+            self.path = Djikstra(self.curr_node_id, self.end, self.GV, self.known_roadblocks, {next_edge} if next_edge is not None else None)
 
     def CheckForFailure(self) -> bool:        
         '''
@@ -225,9 +219,9 @@ class Player:
         if (len(self.path) == 1):
             if self.path[0] != self.curr_node_id:
                 if (self.deviates):
-                    logger.info(f"Player {self.id} failed to find a different path to destination while deviating from the navigator")
+                    logger.info("Player %s failed to find a different path to destination while deviating from the navigator", self.id, extra=event_fields('fail', self.id))
                 if (not self.deviates):
-                    logger.info(f"Player {self.id} failed to proceed while trusting the navigator (navigator reported no viable path)")
+                    logger.info("Player %s failed to proceed while trusting the navigator (navigator reported no viable path)", self.id, extra=event_fields('fail', self.id))
                 self.player_failed()
                 return True
         return False
@@ -237,90 +231,100 @@ class Player:
         # If player reported roadblock, Djikstra will automatically find best path for player
         # Will try and avoid any paths reported already
         if self.ReportIfRoadblock:
-            logger.info(f"System finding new route for player {self.id} due to roadblock report")
-            # system needs to know about curr_edge in case there is a timelag delay. 
+            logger.info("System finding new route for player %s due to roadblock report", self.id, extra=event_fields('reroute', self.id, self.curr_edge_id))
+            # system needs to know about curr_edge_id in case there is a timelag delay. 
             # For example, if a player reports, the system locally needs to find a new path that avoids the roadblock,
-            #   but system does not update GV.reported_roadblocks until AFTER timelag finishes. self.curr_edge is a work_around for this
-            self.path = Djikstra(self.curr_node_id, self.end, self.GV, None, {self.curr_edge}, True)
+            #   but system does not update GV.reported_roadblocks until AFTER timelag finishes. self.curr_edge_id is a work_around for this
+            # The planner keeps its search state between reports, so only the region around the changed edges is searched again
+            if self.planner is None:
+                self.planner = IncrementalPlanner(self.GV, self.end)
+            self.planner.BlockEdge(self.curr_edge_id)
+            self.path = self.planner.Replan(self.curr_node_id)
             self.deviates = False
-            logger.info(f"New path: {self.path}")
-            self.Gen.add_to_nav_history(self.id, datetime.now().strftime('%H:%M:%S.%f'), "Detour from Reported Roadblock", self.curr_node_id, self.path.copy()) 
+            logger.info("New path: %s", self.path, extra=event_fields('new_path', self.id))
+            self.Gen.add_to_nav_history(self.id, self.GV.clock.now().strftime('%H:%M:%S.%f'), "Detour from Reported Roadblock", self.curr_node_id, self.path) 
         else:
             # Player did not report. Player will need to find next best path given its own knowledge.
-            logger.info(f"Player {self.id} decides to not report roadblock between {self.curr_edge}. Detouring")
+            logger.info("Player %s decides to not report roadblock between %s. Detouring", self.id, self.GV.GetEdgeNodes(self.curr_edge_id), extra=event_fields('detour', self.id, self.curr_edge_id))
             self.path = Djikstra(self.curr_node_id, self.end, self.GV, self.known_roadblocks)
             self.deviates = True
-            self.Gen.add_to_nav_history(self.id, datetime.now().strftime('%H:%M:%S.%f'), "Detoured from Non-Reported Roadblock", self.curr_node_id, self.path.copy())
+            self.Gen.add_to_nav_history(self.id, self.GV.clock.now().strftime('%H:%M:%S.%f'), "Detoured from Non-Reported Roadblock", self.curr_node_id, self.path)
         
     def CheckForReportTimePenalty(self, id):
         if self.Gen.ReportTimePenalties[id] > 0:
-            logger.info(f"Player {id} experiencing a time penalty of {self.Gen.ReportTimePenalties[id]} seconds")
-            self.moveTimeout = pygame.time.get_ticks() + (self.Gen.ReportTimePenalties[id] * 1000) # convert to ms
+            logger.info("Player %s experiencing a time penalty of %s seconds", id, self.Gen.ReportTimePenalties[id], extra=event_fields('penalty', id))
+            self.moveTimeout = self.GV.clock.get_ticks() + (self.Gen.ReportTimePenalties[id] * 1000) # convert to ms
 
     def isPlayerTimedOut(self) -> bool:
         '''Check if the player currently is not allowed to move due to a ReportTimePenalty'''
         if self.moveTimeout != 0:
-            if pygame.time.get_ticks() < self.moveTimeout:
+            if self.GV.clock.get_ticks() < self.moveTimeout:
                 return True
             else:
-                logger.info(f"Player {self.id} time penalty has ended.")
+                logger.info("Player %s time penalty has ended.", self.id, extra=event_fields('penalty_end', self.id))
                 self.moveTimeout = 0 
                 return False
         return False
     
-    def is_player_affected_by_roadblock(self, roadblock):
-        """Check if the player's path includes the given roadblock."""
-        if not isinstance(roadblock, tuple) or len(roadblock) != 2:
-            raise ValueError("Roadblock must be a tuple of two elements (node1, node2).")
-        for i in range(len(self.path) - 1):
-            curr_node = self.path[i]
-            next_node = self.path[i + 1]
-            if (curr_node, next_node) == roadblock or (next_node, curr_node) == roadblock:
-                return True
-        return False
+    def is_player_affected_by_roadblock(self, edge_id):
+        """Check if the player's path includes the given roadblock edge id."""
+        return self.id in self.GV.route_index.get(edge_id, ())
 
         
-    async def update(self):
-        """Update the position and direction over time. Checks for Roadblock."""
-        # Has player reached a dest_node by their .t value exceededing the normalized progress (1 is max)
-        # If initial, still need to check if the player will deviate or not
-        
-        if self.isPlayerTimedOut():
-            return
-
-        if self.t >= 1:
-            if self.dest_node != self.curr_node_id:
-                self.path.popleft() # delete prev node from current path
-            if len(self.path) > 1:
-                # A player should not be considered on any edge
-                self.GV.ChangePlayerEdgeLocation(None, self.curr_edge)
-                self.set_curr_node_id(self.dest_node)
-                if self.RoadblockOnPrevRoute:
-                    self.OnPlayerReturnsFromRoadblock()
-                self.CheckPlayerFollowsNav()
-                if self.CheckForFailure():
-                    return
-            if self.SetPlayerPath():
-                return
-        elif self.is_initial:
+    def ArriveAtNode(self) -> bool:
+        """Called once the player reached dest_node (t >= 1). Picks the next edge. Returns True if the player finished or failed."""
+        if self.dest_node != self.curr_node_id:
+            self.PopPathNode() # delete prev node from current path
+        if len(self.path) > 1:
+            # A player should not be considered on any edge
+            self.GV.ChangePlayerEdgeLocation(None, self.curr_edge_id)
+            self.set_curr_node_id(self.dest_node)
+            if self.RoadblockOnPrevRoute:
+                self.OnPlayerReturnsFromRoadblock()
             self.CheckPlayerFollowsNav()
-            self.set_curr_node_id(self.path[0])
-            if self.SetPlayerPath():
-                return
-            self.is_initial = False
+            if self.CheckForFailure():
+                return True
+        return self.SetPlayerPath()
+
+    def StartInitialRoute(self) -> bool:
+        """Decides whether to follow the initial navigation and puts the player on its first edge. Returns True if the player already finished."""
+        self.CheckPlayerFollowsNav()
+        self.set_curr_node_id(self.path[0])
+        if self.SetPlayerPath():
+            return True
+        self.is_initial = False
+        return False
 
+    def GetLegPositions(self) -> tuple:
+        """Returns the (origin, destination) positions of the current movement. The origin is the roadblock position when returning from one."""
         # Mark location of where player started from (node or roadblock)
         orig_pos = self.GV.get_pos(self.curr_node_id) if not self.RoadblockOnPrevRoute else self.roadblock_position
         dest_pos = self.GV.get_pos(self.dest_node)
 
         if orig_pos is None or dest_pos is None:
             raise ValueError("Node positions not found!")
-
-        x2, y2 = orig_pos
-        x1, y1 = dest_pos
-
-        # Calculate distance between the current and destination node
-        distance = math.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2)
+        return orig_pos, dest_pos
+
+    def GetLegLength(self, orig_pos, dest_pos) -> float:
+        """Length of the current movement. Movements along a whole edge read it from GV.edge_geometry."""
+        if self.RoadblockOnPrevRoute:
+            # Returning from the roadblock only covers part of the edge
+            return math.sqrt((dest_pos[0] - orig_pos[0]) ** 2 + (dest_pos[1] - orig_pos[1]) ** 2)
+        return self.GV.edge_geometry[(self.curr_node_id, self.dest_node)][0]
+
+    def GetLegRotation(self) -> float:
+        """Sprite rotation of the current movement from GV.edge_geometry."""
+        if self.RoadblockOnPrevRoute:
+            # Back along the current edge towards curr_node_id
+            node_a, node_b = self.GV.GetEdgeNodes(self.curr_edge_id)
+            other_node = node_b if node_a == self.curr_node_id else node_a
+            return self.GV.edge_geometry[(other_node, self.curr_node_id)][3]
+        return self.GV.edge_geometry[(self.curr_node_id, self.dest_node)][3]
+
+    def GetProgressPerTick(self, orig_pos, dest_pos) -> float:
+        """Normalized progress (t) the player makes along the current movement in one tick."""
+        # Distance between the current and destination node (or roadblock position)
+        distance = self.GetLegLength(orig_pos, dest_pos)
 
         # calculate speed of player (if there are congestions)
         congestion_value = self.GV.GetCongestion(self.curr_node_id, self.dest_node)  # Range: 0.1 - 1.0
@@ -328,68 +332,93 @@ class Player:
 
         # Calculate delta_t based on desired speed (time increment that determines how much progress was made in current tick)
         if distance > 0:
-            delta_t = min(adjusted_speed / max(distance, 1e-6), 1)
-        else:
-            delta_t = 1  # Edge case handling
+            return min(adjusted_speed / max(distance, 1e-6), 1)
+        return 1  # Edge case handling
 
-        # Update position
-        self.t = min(self.t + delta_t, 1)
+    def MoveTo(self, t, orig_pos, dest_pos):
+        """Sets the progress along the current movement and the interpolated position."""
+        x2, y2 = orig_pos
+        x1, y1 = dest_pos
+        self.t = t
         interpolated_x = x2 + self.t * (x1 - x2)
         interpolated_y = y2 + self.t * (y1 - y2)
         self.set_pos((interpolated_x, interpolated_y))
 
+    def CheckForRoadblock(self):
+        """Called once per edge when the player is close enough to spot a roadblock. Turns around and/or reports."""
+        _, exists = self.GV.HasRoadblock(self.curr_node_id, self.dest_node)
+        if exists and not self.RoadblockOnPrevRoute:
+            logger.info("Player %s found roadblock between %s and %s. Returning to current node.", self.id, self.curr_node_id, self.dest_node, extra=event_fields('roadblock', self.id, self.curr_edge_id))
+            # Detour back to current node
+            self.known_roadblocks.add(self.GV.GetEdgeId(self.curr_node_id, self.dest_node))
+            self.ReportIfRoadblock = self.Gen.GetNextReportsRoadblockIfRoadblock(self.id)
+            if self.ReportIfRoadblock:
+                timelag = 0
+                if self.Gen.settings['TimeLagActivated']:
+                    timelag = self.Gen.GetNextTimeLag(self.id)
+                    task = asyncio.create_task(
+                        self.GV.ReportRoadblock(self.id, self.curr_node_id, self.dest_node, logger, timelag)
+                    )
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+                    logger.info("Player %s reporting roadblock between %s and %s with a time lag of %s seconds", self.id, self.curr_node_id, self.dest_node, timelag, extra=event_fields('report', self.id, self.curr_edge_id))
+                else:
+                    self.GV.ReportRoadblock(self.id, self.curr_node_id, self.dest_node, logger)
+                    logger.info("Player %s reported roadblock between %s and %s", self.id, self.curr_node_id, self.dest_node, extra=event_fields('report', self.id, self.curr_edge_id))
+                self.CheckForReportTimePenalty(self.id)
+
+            self.set_direction(self.GV.edge_geometry[(self.dest_node, self.curr_node_id)][3]) # face back to the current node
+            self.dest_node = self.curr_node_id  # Set destination to current node
+            self.roadblock_position = self.get_pos()  # Store the roadblock position
+            self.RoadblockOnPrevRoute = True # used to make sure the player does not report the same roadblock twice. Updates to false when player reaches a new node 
+            self.CheckedRoadblockOnCurrentRoute = True
+            self.t = 0
+        elif not self.CheckedRoadblockOnCurrentRoute:
+            ReportRoadblockIfNoRoadblock = self.Gen.GetNextReportsRoadblockIfNoRoadblock(self.id)
+            if ReportRoadblockIfNoRoadblock:
+                timelag = 0
+                if self.Gen.settings['TimeLagActivated']:
+                    timelag = self.Gen.GetNextTimeLag(self.id)
+                    task = asyncio.create_task(
+                        self.GV.ReportRoadblock(self.id, self.curr_node_id, self.dest_node, logger, timelag)                            
+                    )
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+                    logger.info("Player %s false reporting roadblock between %s and %s with a time lag of %s seconds", self.id, self.curr_node_id, self.dest_node, timelag, extra=event_fields('false_report', self.id, self.curr_edge_id))
+                else:  
+                    self.GV.ReportRoadblock(self.id, self.curr_node_id, self.dest_node, logger)
+                    logger.info("Player %s false reported a roadblock between %s and %s", self.id, self.curr_node_id, self.dest_node, extra=event_fields('false_report', self.id, self.curr_edge_id))
+                self.false_roadblocks.add(self.GV.GetEdgeId(self.curr_node_id, self.dest_node))
+                self.CheckForReportTimePenalty(self.id)
+            self.CheckedRoadblockOnCurrentRoute = True
+
+    async def update(self):
+        """Update the position and direction over time. Checks for Roadblock."""
+        # Has player reached a dest_node by their .t value exceededing the normalized progress (1 is max)
+        # If initial, still need to check if the player will deviate or not
+        
+        if self.isPlayerTimedOut():
+            return
+
+        if self.t >= 1:
+            if self.ArriveAtNode():
+                return
+        elif self.is_initial:
+            if self.StartInitialRoute():
+                return
+
+        orig_pos, dest_pos = self.GetLegPositions()
+
+        # Update position
+        self.MoveTo(min(self.t + self.GetProgressPerTick(orig_pos, dest_pos), 1), orig_pos, dest_pos)
 
         # Determine when to check (whichever comes first - position or progress)
         should_check = (self.t >= self.roadblock_spotting_position) and not self.CheckedRoadblockOnCurrentRoute
 
         if should_check:
-            _, exists = self.GV.HasRoadblock(self.curr_node_id, self.dest_node)
-            if exists and not self.RoadblockOnPrevRoute:
-                logger.info(f"Player {self.id} found roadblock between {self.curr_node_id} and {self.dest_node}. Returning to current node.")
-                # Detour back to current node
-                self.known_roadblocks.add((self.curr_node_id, self.dest_node))
-                self.ReportIfRoadblock = self.Gen.GetNextReportsRoadblockIfRoadblock(self.id)
-                if self.ReportIfRoadblock:
-                    timelag = 0
-                    if self.Gen.settings['TimeLagActivated']:
-                        timelag = self.Gen.GetNextTimeLag(self.id)
-                        task = asyncio.create_task(
-                            self.GV.ReportRoadblock(self.id, self.curr_node_id, self.dest_node, logger, timelag)
-                        )
-                        self.tasks.add(task)
-                        task.add_done_callback(self.tasks.discard)
-                        logger.info(f"Player {self.id} reporting roadblock between {self.curr_node_id} and {self.dest_node} with a time lag of {timelag} seconds")
-                    else:
-                        self.GV.ReportRoadblock(self.id, self.curr_node_id, self.dest_node, logger)
-                        logger.info(f"Player {self.id} reported roadblock between {self.curr_node_id} and {self.dest_node}")
-                    self.CheckForReportTimePenalty(self.id)
-
-                self.dest_node = self.curr_node_id  # Set destination to current node
-                self.roadblock_position = self.get_pos()  # Store the roadblock position
-                self.set_direction(self.calculate_direction(self.pos, orig_pos))
-                self.RoadblockOnPrevRoute = True # used to make sure the player does not report the same roadblock twice. Updates to false when player reaches a new node 
-                self.CheckedRoadblockOnCurrentRoute = True
-                self.t = 0
-            elif not self.CheckedRoadblockOnCurrentRoute:
-                ReportRoadblockIfNoRoadblock = self.Gen.GetNextReportsRoadblockIfNoRoadblock(self.id)
-                if ReportRoadblockIfNoRoadblock:
-                    timelag = 0
-                    if self.Gen.settings['TimeLagActivated']:
-                        timelag = self.Gen.GetNextTimeLag(self.id)
-                        task = asyncio.create_task(
-                            self.GV.ReportRoadblock(self.id, self.curr_node_id, self.dest_node, logger, timelag)                            
-                        )
-                        self.tasks.add(task)
-                        task.add_done_callback(self.tasks.discard)
-                        logger.info(f"Player {self.id} false reporting roadblock between {self.curr_node_id} and {self.dest_node} with a time lag of {timelag} seconds")
-                    else:  
-                        self.GV.ReportRoadblock(self.id, self.curr_node_id, self.dest_node, logger)
-                        logger.info(f"Player {self.id} false reported a roadblock between {self.curr_node_id} and {self.dest_node}")
-                    self.false_roadblocks.add((self.curr_node_id, self.dest_node))
-                    self.CheckForReportTimePenalty(self.id)
-                self.CheckedRoadblockOnCurrentRoute = True
+            self.CheckForRoadblock()
         else:
-            self.set_direction(self.calculate_direction(orig_pos, dest_pos))
+            self.set_direction(self.GetLegRotation())
         
     async def cancel_all_tasks(self):
         """Cancel all active tasks."""
@@ -399,7 +428,7 @@ class Player:
         self.tasks.clear()  # Clear the set
 
 
-def LoadPlayerInfo(json_path, time, GV, Gen: GameGenerator) -> list[Player]:
+def LoadPlayerInfo(json_path, time, GV, Gen: GameGenerator, state: PlayerStateStore) -> list[Player]:
     ''' Generates player array based on start_end_indices.json file.'''
     players = []
     with open(json_path, 'r') as file:
@@ -407,6 +436,6 @@ def LoadPlayerInfo(json_path, time, GV, Gen: GameGenerator) -> list[Player]:
         for i, (start, end) in enumerate(data["start_end_indices"]):
             player_index = i
             speed = Gen.players_speeds[i]
-            players.append(Player(player_index, start, end, GV, Gen, speed, time))
+            players.append(Player(player_index, start, end, GV, Gen, speed, time, state))
     return players
 
@@ -8,6 +8,7 @@ class Roadblock:
         self.graph_visualizer = graph_visualizer
         self.node_a = node_a
         self.node_b = node_b
+        self.edge_id = self.graph_visualizer.GetEdgeId(node_a, node_b)
         self.pos = self.graph_visualizer.get_connection_midpoint(node_a, node_b)
         self.reported = False # whether this roadblock has been reported by a player
         self.real = real # whether or not this roadblock is real
@@ -44,7 +45,7 @@ def LoadRoadblockInfo(json_path, GV) -> list[Roadblock]:
                 exit(1)
             roadblock = Roadblock(a, b, GV, True)
             roadblocks.append(roadblock)
-            roadblock_map[(a, b)] = roadblock
+            roadblock_map[roadblock.edge_id] = roadblock
     GV.InitRoadblockMap(roadblock_map)
     GV.InitRoadblocks(roadblocks)
     return roadblocks
\ No newline at end of file
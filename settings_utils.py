@@ -1,5 +1,10 @@
 import json
 
+# Searches the Djikstra routes fall back to when neither the route cache nor the contraction hierarchy answers
+ROUTING_DJIKSTRA = 'Djikstra'
+ROUTING_ASTAR = 'AStar' # goal directed, see RouteEngine.shortest_path_astar
+ROUTING_MODES = (ROUTING_DJIKSTRA, ROUTING_ASTAR)
+
 
 def load_settings(filename):
     """Load settings from a JSON file."""
@@ -47,6 +52,8 @@ def process_settings(settings):
     if settings.get("IsAIControlled", True):
         ValidateAISettings(settings)
 
+    isValidRoutingMode(settings)
+
     # Replace None with 'None' for Setup.csv record
     processed_settings = {key: (value if value is not None else 'None')
                           for key, value in settings.items()}
@@ -70,6 +77,17 @@ def isValidReportTimePenaltyValues(settings) -> bool:
         exit(1)
 
 
+def isValidRoutingMode(settings) -> bool:
+    try:
+        routing_mode = settings.get("RoutingMode", ROUTING_DJIKSTRA)
+        if routing_mode not in ROUTING_MODES:
+            raise ValueError(
+                f"RoutingMode: {routing_mode} must be one of {', '.join(ROUTING_MODES)}.")
+    except ValueError as e:
+        print(e)
+        exit(1)
+
+
 def isValidTimeLagValues(settings) -> bool:
     try:
         time_lag = int(settings["TimeLag"]['mean'])